@@ -3,6 +3,10 @@ ASGI config for MM project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+In the Docker image it is served by uvicorn (docker/supervisord.conf, program
+"asgi") and nginx routes only the long-lived SSE stream /api/live/ here; the rest
+of the site stays on gunicorn (MM.wsgi).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
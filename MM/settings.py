@@ -146,6 +146,25 @@ if os.getenv("DB_ENGINE", "").lower() == "postgresql":
     }
 # если DB_ENGINE не задан — останется  блок с SQLite без изменений
 
+# ── Кэш ─────────────────────────────────────────────────────────────────────
+# Общий для всех воркеров gunicorn без внешних сервисов: файловый кэш на локальном диске.
+# (LocMemCache у каждого процесса свой — каталог ISS и страницы теплокарты грелись бы по N раз.)
+CACHE_DIR = Path(os.getenv("DJANGO_CACHE_DIR", BASE_DIR / ".cache"))
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CACHE_DIR / "django",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+# Межпроцессные блокировки single-flight (mm08.services.single_flight)
+SINGLE_FLIGHT_DIR = CACHE_DIR / "locks"
+# Доска котировок от поллера (manage.py poll_quotes), читается веб-воркерами через mmap
+QUOTES_DIR = CACHE_DIR / "quotes"
+QUOTES_POLL_SEC = float(os.getenv("QUOTES_POLL_SEC", "5"))
+QUOTES_STALE_SEC = float(os.getenv("QUOTES_STALE_SEC", "60"))  # старше — страница обновит доску сама (нет поллера)
+
 # ── Валидаторы паролей ──────────────────────────────────────────────────────
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -177,7 +196,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"  # тип авто-поля
 # === DRF: права и аутентификация по умолчанию =================================
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",  # JSON рендерер по умолчанию
+        "mm08.renderers.FastJSONRenderer",  # JSON рендерер по умолчанию (orjson, если установлен)
         "rest_framework.renderers.BrowsableAPIRenderer",  # удобный UI при разработке
     ],
     # ✅ Глобальные классы аутентификации
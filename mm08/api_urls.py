@@ -19,5 +19,10 @@ urlpatterns = [
     path("moex/meta/",            api_views.api_moex_meta,            name="moex_meta"),             # мета-инфо МОЕХ  
     path("moex/options/",         api_views.api_moex_options,         name="moex_options"),          # опционы МОЕХ  
     path("moex/instrument-info/", api_views.api_moex_instrument_info, name="moex_instrument_info"),  # инфо по инструменту  
+    path("moex/catalog/",         api_views.api_moex_catalog,         name="moex_catalog"),          # каталог доски МОЕХ  
+    path("quotes/",               api_views.api_quotes,               name="quotes"),                # котировки от поллера  
+    path("heat/frames/",          api_views.api_heat_frames,          name="heat_frames"),           # кадры ряда за день  
+    path("heat/frames/at/",       api_views.api_heat_frame_at,        name="heat_frame_at"),         # кадр на момент T  
+    path("live/",                 api_views.api_live,                 name="live"),                  # SSE: живые дельты (ASGI)  
     path("", include(router.urls)),  # подключаем все ViewSet’ы  
 ]
\ No newline at end of file
@@ -8,21 +8,45 @@
 from __future__ import annotations  # поддержка современных аннотаций
 
 # ===== БАЗОВЫЕ ИМПОРТЫ =========================================================
-from datetime import datetime  # для парсинга дат
-from typing import Any, Dict, Optional  # типы для подсказок
-
-from django.http import JsonResponse  # возврат JSON
-from django.utils.dateparse import parse_datetime  # парсинг ISO-дат
+import base64  # кодирование курсора
+import json  # полезная нагрузка курсора
+import tempfile  # буфер бинарной выгрузки
+from datetime import date, datetime  # для парсинга дат
+from typing import Any, Dict, Optional, Tuple  # типы для подсказок
+
+from django.db.models import Q  # условие keyset-пагинации
+from django.core.handlers.asgi import ASGIRequest  # живой канал — только под ASGI
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse  # возврат файла / JSON / потока
+from django.utils import timezone  # локальная зона для собранных баров
+from django.utils.http import quote_etag  # ETag доски котировок
+from django.utils.dateparse import parse_date, parse_datetime  # парсинг ISO-дат
 from django.shortcuts import get_object_or_404  # 404-хелпер
 from django.views.decorators.http import require_GET  # ограничим методы на функциях
 
 from rest_framework import viewsets, mixins  # базовые классы DRF
 from rest_framework.decorators import action  # экшены у ViewSet
 from rest_framework.response import Response  # DRF-ответ
-from rest_framework.pagination import PageNumberPagination  # пагинация DRF
+from rest_framework.exceptions import NotFound  # битый курсор
+from rest_framework.pagination import BasePagination, PageNumberPagination  # пагинация DRF
+from rest_framework.utils.urls import remove_query_param, replace_query_param  # ссылки next/previous
 
 # ===== НАШИ МОДЕЛИ И СЕРИАЛИЗАТОРЫ ============================================
 from .models import Instrument, Candle, HeatSnapshot, HeatTile   # модели
+from .services.candle_export import export_npz  # бинарная выгрузка свечей
+from .services.snapshot_cache import (  # conditional GET для снапшотов
+    PAST_MAX_AGE,
+    conditional_response,
+    is_past,
+    query_tag,
+    snapshot_etag,
+    snapshot_state,
+)
+from .services.api_rows import CANDLE_COLUMNS, TILE_COLUMNS, candle_columns, candle_rows, tile_rows  # быстрый путь списков
+from .services.resample import bars_columns, get_bars, parse_interval  # ресемплинг свечей
+from .services.heatmap import BOARD_MAP  # поддерживаемые доски
+from .services.quotes import current_board  # доска котировок от поллера
+from .services.heat_frames import frame_at, frame_times  # внутридневной ряд теплокарты
+from .services.live import event_stream, get_feed, live_topics  # SSE: дельты котировок и теплокарты
 from .serializers import (
     InstrumentSerializer,   # сериализатор инструмента  
     CandleSerializer,       # сериализатор свечей       
@@ -51,22 +75,36 @@ class HeatSnapshotViewSet(viewsets.ViewSet,
     serializer_class = HeatSnapshotSerializer                              # сериализатор по умолчанию 
     # pagination_class = DefaultPagination  # ← включаем пагинацию для списка снапшотов 
 
+    def _conditional(self, request, pk, render):
+        """ETag/Last-Modified по (updated_at, числу плиток); 304 — без выборки плиток."""
+        state = snapshot_state(pk) if str(pk).isdigit() else None      # один лёгкий запрос  
+        if state is None:
+            raise Http404
+        # JSON и browsable API — разные представления одного URL
+        etag = snapshot_etag(pk, state, f"{query_tag(request)}-{request.accepted_renderer.format}")
+        return conditional_response(request, etag, state[0], render,
+                                    max_age=PAST_MAX_AGE if is_past(state) else None)
+
     @action(detail=True, methods=["get"])
     def tiles(self, request, pk: int | str | None = None) -> Response:
         """Отдать все плитки для конкретного снапшота (pk из URL)."""
-        snapshot = get_object_or_404(HeatSnapshot, pk=pk)              # получаем снапшот  
-        qs = snapshot.tiles.all().order_by("-change_pct")               # берём связанные плитки  
-        page = self.paginate_queryset(qs)                               # применяем пагинацию  
-        if page is not None:                                            # если есть страница  
-            ser = HeatTileSerializer(page, many=True)                   # сериализуем страницу  
-            return self.get_paginated_response(ser.data)                # отдаём с метаданными пагинации  
-        ser = HeatTileSerializer(qs, many=True)                         # сериализуем без пагинации  
-        return Response(ser.data)                                       # обычный ответ  
+        def render() -> Response:
+            qs = (HeatTile.objects.filter(snapshot_id=pk)               # плитки снапшота без JOIN  
+                  .order_by("-change_pct")
+                  .values_list(*TILE_COLUMNS))                          # быстрый путь: кортежи вместо моделей  
+            page = self.paginate_queryset(qs)                           # применяем пагинацию  
+            if page is not None:                                        # если есть страница  
+                return self.get_paginated_response(tile_rows(page))     # отдаём с метаданными пагинации  
+            return Response(tile_rows(qs))                              # обычный ответ  
+        return self._conditional(request, pk, render)
 
     def retrieve(self, request, *args: Any, **kwargs: Any) -> Response:
         """Переопределяем retrieve, чтобы отдавать снапшот сразу с 'tiles' (удобно в UI)."""
         self.serializer_class = HeatSnapshotWithTilesSerializer         # временно меняем сериализатор  
-        return super().retrieve(request, *args, **kwargs)               # зовём базовую реализацию  
+        return self._conditional(
+            request, kwargs.get("pk"),
+            lambda: super(HeatSnapshotViewSet, self).retrieve(request, *args, **kwargs),  # базовая реализация  
+        )
 
 class HeatTileViewSet(viewsets.ViewSet,
                       mixins.ListModelMixin,
@@ -76,14 +114,23 @@ class HeatTileViewSet(viewsets.ViewSet,
     """Класс выдаёт плитки теплокарты; аналогично — read-only публично."""
     authentication_classes = [SessionAuthentication, TokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    queryset = HeatTile.objects.select_related("snapshot").all().order_by("-change_pct")  # оптимизация связей  # ← комментарий
+    queryset = HeatTile.objects.all().order_by("-change_pct")  # snapshot_id берём из самой плитки, JOIN не нужен
     serializer_class = HeatTileSerializer  
 
+    def list(self, request, *args: Any, **kwargs: Any) -> Response:
+        """Быстрый путь списка: values_list → dict той же формы, что у HeatTileSerializer."""
+        qs = self.filter_queryset(self.get_queryset()).values_list(*TILE_COLUMNS)
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            return self.get_paginated_response(tile_rows(page))
+        return Response(tile_rows(qs))
+
 
 
 
 # ===== СЕРВИСЫ ДЛЯ MOEX (КАТАЛОГ И МЕТАДАННЫЕ) ================================
 from .services.moex_catalog import get_moex_info, get_moex_list  # инфо и списки
+from .services.instrument_search import clamp_limit, iter_ranked, search_catalog, search_instruments  # type-ahead
 from .services.moex_meta import (  # справочники + проверка валидности связки
     get_markets,
     get_boards,
@@ -115,14 +162,115 @@ class DefaultPagination(viewsets.ViewSet, PageNumberPagination):
     max_page_size = 500
 
 
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация по (dt, id), новые — первыми.
+    Страница — WHERE (dt, id) < (последний ключ) ORDER BY dt DESC, id DESC LIMIT n+1:
+    без COUNT(*) и без OFFSET, цена любой страницы — O(page_size) по индексу (instrument, interval, dt).
+    Курсоры next/previous непрозрачные (base64 от ключа и направления).
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    ordering = ("dt", "id")
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params.get(self.page_size_query_param) or self.page_size)
+        except ValueError:
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, obj, reverse: bool) -> str:
+        dt_key, id_key = self.get_key(obj)
+        key = {"d": dt_key.isoformat(), "i": id_key, "r": int(reverse)}
+        raw = base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, raw.rstrip("="))
+
+    def get_key(self, obj) -> tuple:
+        """Ключ строки: у кортежей values_list — первые две колонки, у моделей — атрибуты."""
+        if isinstance(obj, tuple):
+            return obj[0], obj[1]
+        return getattr(obj, self.ordering[0]), getattr(obj, self.ordering[1])
+
+    def decode_cursor(self, request) -> Optional[tuple]:
+        raw = request.query_params.get(self.cursor_query_param)
+        if not raw:
+            return None
+        try:
+            key = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+            dt_key = parse_datetime(key["d"])
+            cursor = dt_key, int(key["i"]), bool(key["r"])
+        except (ValueError, TypeError, KeyError):
+            raise NotFound("Invalid cursor")
+        if dt_key is None:  # строка не похожа на дату — иначе Q(dt__lt=None) и 500
+            raise NotFound("Invalid cursor")
+        return cursor
+
+    def paginate_queryset(self, queryset, request, view=None):
+        size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        cursor = self.decode_cursor(request)
+        d_field, i_field = self.ordering
+
+        if cursor is None:
+            reverse = False
+            qs = queryset.order_by(f"-{d_field}", f"-{i_field}")
+        else:
+            dt_key, id_key, reverse = cursor
+            if reverse:
+                # назад: берём ключи больше первого на текущей странице и разворачиваем
+                cond = Q(**{f"{d_field}__gt": dt_key}) | Q(**{d_field: dt_key, f"{i_field}__gt": id_key})
+                qs = queryset.filter(cond).order_by(d_field, i_field)
+            else:
+                cond = Q(**{f"{d_field}__lt": dt_key}) | Q(**{d_field: dt_key, f"{i_field}__lt": id_key})
+                qs = queryset.filter(cond).order_by(f"-{d_field}", f"-{i_field}")
+
+        rows = list(qs[: size + 1])
+        more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, more
+        else:
+            self.has_next, self.has_previous = more, cursor is not None
+        self.page = rows
+        return rows
+
+    def get_next_link(self) -> Optional[str]:
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data) -> Response:
+        return Response({"next": self.get_next_link(), "previous": self.get_previous_link(), "results": data})
+
+
 # ==============================================================================
 #                          VIEWSET ДЛЯ ИНСТРУМЕНТОВ
 # ==============================================================================
 class InstrumentViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
-    """Список/деталь инструментов."""
+    """Список/деталь инструментов; ?search= — type-ahead по ticker/secid/shortname (+ ?limit=)."""
     serializer_class = InstrumentSerializer
     queryset = Instrument.objects.all().order_by("ticker")
 
+    def list(self, request, *args, **kwargs):
+        query = (request.GET.get("search") or "").strip()
+        if not query:
+            return super().list(request, *args, **kwargs)
+        # индекс в памяти вместо icontains-скана; из БД — только найденные строки по pk
+        ids = search_instruments(query, clamp_limit(request.GET.get("limit")))
+        objects = iter_ranked(Instrument.objects.in_bulk(ids), ids)
+        return Response(self.get_serializer(objects, many=True).data)
+
 
 # ==============================================================================
 #                              VIEWSET ДЛЯ СВЕЧЕЙ
@@ -133,7 +281,7 @@ class CandleViewSet(viewsets.ViewSet, mixins.ListModelMixin, viewsets.GenericVie
     authentication_classes = [SessionAuthentication, TokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     serializer_class = CandleSerializer
-    pagination_class = DefaultPagination
+    pagination_class = KeysetPagination  # глубокие страницы без COUNT(*)/OFFSET
 
     def get_queryset(self):
         """
@@ -175,24 +323,109 @@ class CandleViewSet(viewsets.ViewSet, mixins.ListModelMixin, viewsets.GenericVie
             except Exception:
                 pass
 
+        # --- Фильтр по интервалу (M1/H1/D1 или минуты) ---
+        minutes = parse_interval(self.request.GET.get("interval"))
+        if minutes:
+            qs = qs.filter(interval=minutes)
+
         return qs.order_by("-dt")
 
     @action(detail=False, methods=["get"])
     def latest(self, request):
-        """Вернуть последние N свечей. Параметры: ?instrument=..., ?limit= (<=500)."""
+        """
+        Вернуть последние N свечей. Параметры: ?instrument=..., ?limit= (<=500), ?interval=.
+        Если для инструмента такой интервал не хранится — собираем его из более мелкого.
+        ?layout=columns — как у графика: {"ticker", "interval", "count", "layout", "columns": {"t", "o", ...}},
+        t в epoch-секундах; тикер и интервал один раз сверху, поэтому нужен ?instrument (интервал по умолчанию M1).
+        """
         instrument = request.GET.get("instrument")
+        columns = (request.GET.get("layout") or "").lower() == "columns"
         limit_s = request.GET.get("limit") or "100"
         try:
             limit = max(1, min(int(limit_s), 500))
         except Exception:
             limit = 100
 
+        interval_s = request.GET.get("interval") or ("M1" if columns else "")
+        minutes = parse_interval(interval_s)
+        if columns and not (instrument and minutes):
+            return Response({"error": "layout=columns needs ?instrument and a valid ?interval"}, status=400)
+        if instrument and minutes:
+            inst = get_object_or_404(Instrument, ticker=instrument)
+            if not Candle.objects.filter(instrument=inst, interval=minutes).exists():
+                if columns:
+                    return Response(self._columns(inst.ticker, interval_s, self._resampled_columns(inst, minutes, limit)))
+                return Response(self._resampled(inst, minutes, limit))
+
         qs = self.get_queryset()
         if instrument:
             qs = qs.filter(instrument__ticker=instrument)
-        qs = qs[:limit]
-        serializer = self.get_serializer(qs, many=True)
-        return Response(serializer.data)
+        if columns:
+            qs = qs.filter(interval=minutes)  # ?interval по умолчанию M1 не попал в get_queryset
+        rows = qs.values_list(*CANDLE_COLUMNS)[:limit]
+        if columns:
+            return Response(self._columns(instrument, interval_s, candle_columns(rows)))
+        return Response(candle_rows(rows))
+
+    @staticmethod
+    def _columns(ticker: str, interval: str, data: Dict[str, list]) -> Dict[str, Any]:
+        return {"ticker": ticker, "interval": interval, "count": len(data["t"]), "layout": "columns", "columns": data}
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """
+        Бинарная выгрузка диапазона свечей одним файлом .npz (столбцы NumPy).
+        Параметры: ?tickers=SBER,GAZP (обязательно), ?interval= (по умолчанию M1),
+        ?date_from= / ?date_to= (YYYY-MM-DD), ?compress=1 — сжать zip.
+        """
+        tickers = [t.strip().upper() for t in (request.GET.get("tickers") or "").split(",") if t.strip()]
+        minutes = parse_interval(request.GET.get("interval") or "M1")
+        if not tickers or minutes is None:
+            return Response({"error": "tickers and a valid interval are required"}, status=400)
+        try:
+            date_from = date.fromisoformat(request.GET["date_from"]) if request.GET.get("date_from") else None
+            date_to = date.fromisoformat(request.GET["date_to"]) if request.GET.get("date_to") else None
+        except ValueError:
+            return Response({"error": "date_from/date_to must be YYYY-MM-DD"}, status=400)
+
+        tmp = tempfile.TemporaryFile()  # файл закроет FileResponse после отдачи
+        export_npz(tmp, tickers, minutes, date_from=date_from, date_to=date_to,
+                   compress=request.GET.get("compress") == "1")
+        tmp.seek(0)
+        return FileResponse(tmp, as_attachment=True, filename=f"candles_{minutes}.npz",
+                            content_type="application/octet-stream")
+
+    def list(self, request, *args: Any, **kwargs: Any) -> Response:
+        """Быстрый путь списка: values_list → dict той же формы, что у CandleSerializer."""
+        qs = self.filter_queryset(self.get_queryset()).values_list(*CANDLE_COLUMNS)
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            return self.get_paginated_response(candle_rows(page))
+        return Response(candle_rows(qs))
+
+    def _resampled(self, inst: Instrument, minutes: int, limit: int):
+        """Собранные на лету бары в том же формате, что и сохранённые (новые — первыми)."""
+        bars = get_bars(inst.id, minutes, limit=limit)
+        if bars is None:
+            return []
+        tz = timezone.get_current_timezone()
+        candles = [
+            Candle(instrument=inst, interval=minutes, dt=datetime.fromtimestamp(t, tz),
+                   open=o, high=h, low=l, close=c, volume=v)
+            for t, o, h, l, c, v in zip(
+                bars["ts"].tolist(), bars["open"].tolist(), bars["high"].tolist(),
+                bars["low"].tolist(), bars["close"].tolist(), bars["volume"].tolist(),
+            )
+        ]
+        candles.reverse()
+        return self.get_serializer(candles, many=True).data
+
+    def _resampled_columns(self, inst: Instrument, minutes: int, limit: int) -> Dict[str, list]:
+        """Собранные на лету бары столбцами, новые — первыми (как у сохранённых)."""
+        bars = get_bars(inst.id, minutes, limit=limit)
+        if bars is None:
+            return {k: [] for k in "tohlcv"}
+        return bars_columns({k: v[::-1] for k, v in bars.items()})
 
 
 # ==============================================================================
@@ -252,26 +485,32 @@ def api_moex_meta(request):
     return JsonResponse(data, json_dumps_params={"ensure_ascii": False})
 
 
+def _catalog_board(request) -> Tuple[str, str, str]:
+    """engine/market/board из query; пропущенные market/board — по умолчанию для engine."""
+    engine = (request.GET.get("engine") or "stock").strip().lower()
+    default_market, default_board = get_defaults(engine)
+    market = (request.GET.get("market") or default_market).strip().lower()
+    board = (request.GET.get("board") or default_board).strip().upper()
+    return engine, market, board
+
+
 @require_GET
 def api_moex_catalog(request):
     """
-    Каталог MOEX:
-      - если передан ?secid= или ?ticker= → get_moex_info(...)
-      - иначе список через get_moex_list(...), поддерживает ?engine=&market=&board=&search=&limit=
+    Каталог MOEX доски (?engine=&market=&board=, по умолчанию stock/shares/TQBR):
+      - если передан ?secid= или ?ticker= → get_moex_info(...) (404, если нет на доске)
+      - иначе список через get_moex_list(...) (?limit=); ?search= — ранжированный поиск по каталогу
     """
-    secid = (request.GET.get("secid") or "").strip()
-    ticker = (request.GET.get("ticker") or "").strip()
-
-    if secid or ticker:
-        try:
-            info = get_moex_info(secid=secid, ticker=ticker)
-        except Exception as e:
-            return JsonResponse({"error": f"moex_info failed: {e}"}, status=500, json_dumps_params={"ensure_ascii": False})
+    engine, market, board = _catalog_board(request)
+    secid = (request.GET.get("secid") or request.GET.get("ticker") or "").strip()
+
+    if secid:
+        info = get_moex_info(engine, market, board, secid)
+        if info is None:
+            return JsonResponse({"error": f"{secid.upper()} not found on {board}"}, status=404,
+                                json_dumps_params={"ensure_ascii": False})
         return JsonResponse(info, json_dumps_params={"ensure_ascii": False})
 
-    engine = (request.GET.get("engine") or "").strip()
-    market = (request.GET.get("market") or "").strip()
-    board = (request.GET.get("board") or "").strip()
     search = (request.GET.get("search") or "").strip()
     limit_s = (request.GET.get("limit") or "").strip()
 
@@ -281,37 +520,137 @@ def api_moex_catalog(request):
     except Exception:
         limit = 100
 
-    try:
-        result = get_moex_list(engine=engine, market=market, board=board, search=search, limit=limit)
-    except Exception as e:
-        return JsonResponse({"error": f"moex_list failed: {e}"}, status=500, json_dumps_params={"ensure_ascii": False})
-
-    return JsonResponse(result, json_dumps_params={"ensure_ascii": False})
+    if search:
+        result = search_catalog(engine, market, board, search, limit)
+    else:
+        result = [{"secid": s, "label": label} for s, label in get_moex_list(engine, market, board)[:limit]]
+    return JsonResponse(result, safe=False, json_dumps_params={"ensure_ascii": False})
 
 
 @require_GET
 def api_moex_instrument_info(request):
     """
-    Информация по инструменту MOEX по ?secid= или ?ticker= (прямой прокси на get_moex_info).
+    Информация по инструменту MOEX по ?secid= или ?ticker= (+ ?engine=&market=&board=)
+    — прямой прокси на get_moex_info.
     """
-    secid = (request.GET.get("secid") or "").strip()
-    ticker = (request.GET.get("ticker") or "").strip()
+    secid = (request.GET.get("secid") or request.GET.get("ticker") or "").strip()
 
-    if not secid and not ticker:
+    if not secid:
         return JsonResponse(
             {"error": "Either 'secid' or 'ticker' must be provided"},
             status=400,
             json_dumps_params={"ensure_ascii": False},
         )
 
-    try:
-        info = get_moex_info(secid=secid, ticker=ticker)
-    except Exception as e:
-        return JsonResponse({"error": f"moex_info failed: {e}"}, status=500, json_dumps_params={"ensure_ascii": False})
-
+    engine, market, board = _catalog_board(request)
+    info = get_moex_info(engine, market, board, secid)
+    if info is None:
+        return JsonResponse({"error": f"{secid.upper()} not found on {board}"}, status=404,
+                            json_dumps_params={"ensure_ascii": False})
     return JsonResponse(info, json_dumps_params={"ensure_ascii": False})
 
 
+@require_GET
+def api_quotes(request):
+    """
+    Последние котировки доски от поллера (manage.py poll_quotes): ?board=TQBR|RFUD, ?secid=SBER,GAZP.
+    Читается из общей mmap-доски — без запроса к ISS; ETag меняется с каждой записью поллера.
+    """
+    board = (request.GET.get("board") or "TQBR").strip().upper()
+    if board not in BOARD_MAP:
+        return JsonResponse({"error": f"Unsupported board: {board}"}, status=400)
+    quotes = current_board(board)
+    if quotes is None:
+        return JsonResponse({"error": f"No quotes for {board} yet"}, status=503)
+
+    wanted = {s.strip().upper() for s in (request.GET.get("secid") or "").split(",") if s.strip()}
+
+    def render() -> JsonResponse:
+        rows = [r for r in quotes.rows if r["SECID"] in wanted] if wanted else quotes.rows
+        return JsonResponse(
+            {"board": board, "ts": quotes.ts.isoformat(), "count": len(rows), "rows": rows},
+            json_dumps_params={"ensure_ascii": False},
+        )
+
+    etag = quote_etag(f"q{board}-{int(quotes.ts.timestamp() * 1_000_000)}{query_tag(request)}")
+    return conditional_response(request, etag, quotes.ts, render)
+
+
+def _frames_board(request) -> Optional[str]:
+    board = (request.GET.get("board") or "TQBR").strip().upper()
+    return board if board in BOARD_MAP else None
+
+
+@require_GET
+def api_heat_frames(request):
+    """Моменты кадров внутридневного ряда доски за день: ?board=TQBR, ?date=YYYY-MM-DD (по умолчанию сегодня)."""
+    board = _frames_board(request)
+    if board is None:
+        return JsonResponse({"error": "Unsupported board"}, status=400)
+    raw = (request.GET.get("date") or "").strip()
+    day = parse_date(raw) if raw else timezone.localdate()
+    if day is None:
+        return JsonResponse({"error": "Bad date, expected YYYY-MM-DD"}, status=400)
+    frames = [{"ts": ts.isoformat(), "key": key} for ts, key in frame_times(board, day)]
+    return JsonResponse({"board": board, "date": day.isoformat(), "count": len(frames), "frames": frames})
+
+
+@require_GET
+def api_heat_frame_at(request):
+    """
+    Состояние доски на момент T — последний кадр с ts ≤ T: ?board=TQBR, ?at=ISO-время
+    (по умолчанию — самый свежий кадр). Наивное время — в зоне проекта.
+    """
+    board = _frames_board(request)
+    if board is None:
+        return JsonResponse({"error": "Unsupported board"}, status=400)
+    at = None
+    raw = (request.GET.get("at") or "").strip()
+    if raw:
+        at = parse_datetime(raw.replace(" ", "+"))  # «+03:00» в query string приходит пробелом
+        if at is None:
+            return JsonResponse({"error": "Bad at, expected ISO datetime"}, status=400)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+
+    frame = frame_at(board, at)
+    if frame is None:
+        return JsonResponse({"error": f"No frames for {board} at {raw or 'now'}"}, status=404)
+
+    def render() -> JsonResponse:
+        rows = frame.rows()
+        return JsonResponse(
+            {"board": board, "at": at.isoformat() if at else None, "ts": frame.ts.isoformat(),
+             "count": len(rows), "rows": rows},
+            json_dumps_params={"ensure_ascii": False},
+        )
+
+    etag = quote_etag(f"f{board}-{int(frame.ts.timestamp() * 1_000_000)}{query_tag(request)}")
+    return conditional_response(request, etag, frame.ts, render)
+
+
+@require_GET
+async def api_live(request):
+    """
+    SSE-поток живых обновлений: ?board=TQBR|RFUD, ?channels=quotes,heatmap.
+    Сначала полное состояние, дальше — только изменившиеся тикеры [тикер, last, change_pct].
+    Держит соединение открытым, поэтому обслуживается ASGI-сервером (MM/asgi.py), не gunicorn.
+    """
+    channels = (request.GET.get("channels") or "quotes,heatmap").replace(" ", "").split(",")
+    try:
+        topics = live_topics((request.GET.get("board") or "TQBR").strip(), channels)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400, json_dumps_params={"ensure_ascii": False})
+    if not isinstance(request, ASGIRequest):
+        # sync-воркер WSGI повис бы на бесконечном потоке
+        return JsonResponse({"error": "Live stream is served by the ASGI app only"}, status=501)
+
+    response = StreamingHttpResponse(event_stream(get_feed(), topics), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: не буферизовать события
+    return response
+
+
 @require_GET
 def api_moex_options(request):
     """
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class Mm08Config(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "mm08"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from .models import Instrument
+        from .services.instrument_search import on_instrument_changed
+
+        # индекс поиска инструментов: версия сдвигается на любое изменение таблицы
+        post_save.connect(on_instrument_changed, sender=Instrument, dispatch_uid="mm08_instrument_search")
+        post_delete.connect(on_instrument_changed, sender=Instrument, dispatch_uid="mm08_instrument_search")
@@ -0,0 +1,27 @@
+# mm08/management/commands/bench_api.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from mm08.services.api_bench import run_api_bench
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк списков API: стоимость строки через DRF-сериализаторы и через быстрый путь "
+        "(values_list + orjson). Данные генерируются и откатываются. Пример: --rows 20000"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000, help="Сколько свечей и плиток сгенерировать")
+
+    def handle(self, *args, **opt):
+        results = run_api_bench(rows=max(1, opt["rows"]))
+
+        self.stdout.write(f"{'variant':<20}{'rows':>8}{'wall, ms':>12}{'us/row':>10}{'queries':>10}{'peak, KB':>12}")
+        for r in results:
+            self.stdout.write(
+                f"{r['stage']:<20}{r['rows']:>8}{r['wall_ms']:>12}{r['us_per_row']:>10}"
+                f"{r['queries']:>10}{r['peak_kb']:>12}"
+            )
+        self.stdout.write(self.style.SUCCESS("Готово."))
@@ -0,0 +1,34 @@
+# mm08/management/commands/bench_ingest.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mm08.services.iss_cassette import CassetteMiss
+from mm08.services.ingest_bench import STAGES, run_stages
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк загрузки на записанных ответах ISS (без биржи). "
+        "Пример: --cassette bench/tqbr.json [--record] [--stages build_snapshot,load_moex]"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cassette", type=str, required=True, help="JSON-файл кассеты ISS")
+        parser.add_argument("--record", action="store_true", help="Дописать недостающие ответы из живого ISS")
+        parser.add_argument("--stages", type=str, default="", help=f"Через запятую: {','.join(STAGES)}")
+        parser.add_argument("--keep", action="store_true", help="Не откатывать записанное стадиями в БД")
+
+    def handle(self, *args, **opt):
+        stages = [s.strip() for s in (opt.get("stages") or "").split(",") if s.strip()] or None
+        try:
+            results = run_stages(opt["cassette"], stages=stages, record=opt["record"], keep=opt["keep"])
+        except (CassetteMiss, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"{'stage':<16}{'rows':>8}{'wall, ms':>12}{'queries':>10}{'peak, KB':>12}")
+        for r in results:
+            self.stdout.write(
+                f"{r['stage']:<16}{r['rows']:>8}{r['wall_ms']:>12}{r['queries']:>10}{r['peak_kb']:>12}"
+            )
+        self.stdout.write(self.style.SUCCESS("Готово."))
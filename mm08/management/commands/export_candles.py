@@ -0,0 +1,40 @@
+import datetime as dt
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mm08.services.candle_export import EXPORT_CHUNK, export_npz
+from mm08.services.resample import parse_interval
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгрузка свечей в .npz (по массиву NumPy на столбец) для ноутбуков: "
+        "np.load(path) → instrument, t, open, high, low, close, volume, tickers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tickers", required=True, help="Список через запятую: SBER,GAZP,GMKN")
+        parser.add_argument("--interval", default="M1", help="M1/M10/H1/D1 или минуты")
+        parser.add_argument("--from", dest="date_from", default="")
+        parser.add_argument("--to", dest="date_till", default="")
+        parser.add_argument("--out", required=True, help="Путь к .npz")
+        parser.add_argument("--chunk", type=int, default=EXPORT_CHUNK, help="Строк за одно чтение из БД")
+        parser.add_argument("--compress", action="store_true", help="Сжать zip (медленнее, меньше файл)")
+
+    def handle(self, *args, **opts):
+        tickers = [t.strip().upper() for t in opts["tickers"].split(",") if t.strip()]
+        if not tickers:
+            raise CommandError("Не переданы тикеры")
+        interval = parse_interval(opts["interval"])
+        if interval is None:
+            raise CommandError(f"Неизвестный интервал: {opts['interval']}")
+        try:
+            date_from = dt.date.fromisoformat(opts["date_from"]) if opts["date_from"] else None
+            date_till = dt.date.fromisoformat(opts["date_till"]) if opts["date_till"] else None
+        except ValueError:
+            raise CommandError("Даты должны быть в формате YYYY-MM-DD")
+
+        with open(opts["out"], "wb") as fh:
+            rows = export_npz(fh, tickers, interval, date_from=date_from, date_to=date_till,
+                              chunk_size=max(1, opts["chunk"]), compress=opts["compress"])
+        self.stdout.write(self.style.SUCCESS(f"Выгружено {rows} свечей → {opts['out']}"))
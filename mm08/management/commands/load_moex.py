@@ -1,62 +1,116 @@
 import logging
-from typing import Optional
+import time
+from typing import Dict, Optional, Set
 
 from django.core.management.base import BaseCommand, CommandParser
 from django.db import transaction
 
-from mm08.models import Instrument
+from mm08.models import IngestCheckpoint
+from mm08.services.instrument_sync import sync_instruments
 from mm08.services.moex_iss import MoexISSClient, InstrumentRowMapper
 
 logger = logging.getLogger(__name__)
 
+JOB = "load_moex"
+# Поля Instrument, которые приходят из ISS и сверяются при апсерте
+SYNC_FIELDS = ("secid", "shortname", "engine", "market", "board", "lot_size", "is_active")
+
 
 class Command(BaseCommand):
-    help = "Загрузка/обновление инструментов из ISS в модель Instrument (ticker=SECID)."
+    help = (
+        "Загрузка/обновление инструментов из ISS в модель Instrument (ticker=SECID). "
+        "Пишет пачками с коммитом на каждую пачку; --resume продолжает с сохранённого места."
+    )
 
     def add_arguments(self, parser: CommandParser) -> None:
         parser.add_argument("--engine", type=str, default=None)
         parser.add_argument("--market", type=str, default=None)
         parser.add_argument("--board", type=str, default=None)
         parser.add_argument("--batch", type=int, default=100, help="Печать прогресса каждые N записей")
+        parser.add_argument("--chunk", type=int, default=500, help="Размер пачки апсерта (одна транзакция)")
+        parser.add_argument("--resume", action="store_true", help="Продолжить с последней точки возобновления")
 
-    @transaction.atomic
     def handle(self, *args, **opts):
         engine: Optional[str] = opts.get("engine")
         market: Optional[str] = opts.get("market")
         board: Optional[str] = opts.get("board")
         batch: int = int(opts.get("batch") or 100)
+        chunk_size: int = max(1, int(opts.get("chunk") or 500))
+
+        checkpoint, _ = IngestCheckpoint.objects.get_or_create(
+            job=JOB, engine=engine or "", market=market or "", board=board or "",
+        )
+        if opts.get("resume") and not checkpoint.finished and checkpoint.cursor:
+            start, saved = checkpoint.cursor, checkpoint.rows
+            self.stdout.write(f"→ Продолжаем {engine}/{market}/{board} с позиции {start} (уже сохранено {saved})")
+        else:
+            start, saved = 0, 0
+            self.stdout.write(f"→ Загружаем {engine}/{market}/{board} ...")
 
         # Клиент без пауз — чтобы не вис
         client = MoexISSClient(timeout=10, pause_sec=0.0)
 
-        self.stdout.write(f"→ Загружаем {engine}/{market}/{board} ...")
-        saved = 0
+        read = 0
         skipped = 0
+        repeated = 0
         saw_first_page = False
+        pending: Dict[str, Dict] = {}
+        # SECID, уже записанные в этом запуске: страницы ISS могут перекрываться,
+        # и повтор не должен ни писаться второй раз, ни попадать в счётчик сохранённых
+        flushed: Set[str] = set()
+        cursor = start
+        started = time.perf_counter()
 
-        for i, rec in enumerate(client.iter_securities(engine=engine, market=market, board=board), start=1):
+        def flush() -> None:
+            """Апсерт накопленной пачки и сдвиг точки возобновления — в одной транзакции."""
+            nonlocal saved
+            with transaction.atomic():
+                sync_instruments(pending, update_fields=SYNC_FIELDS)
+                saved += len(pending)
+                flushed.update(pending)
+                checkpoint.cursor, checkpoint.rows, checkpoint.finished = cursor, saved, False
+                checkpoint.save(update_fields=["cursor", "rows", "finished", "updated_at"])
+            pending.clear()
+
+        for offset, records in client.iter_pages(engine=engine, market=market, board=board, start=start):
             if not saw_first_page:
                 self.stdout.write("  ✓ получили первую страницу от ISS")
                 saw_first_page = True
 
-            secid = (rec.get("SECID") or rec.get("secid") or "").strip().upper()
-            if not secid:
-                skipped += 1
-                if i % batch == 0:
-                    self.stdout.write(f"  ...прочитано {i}, сохранено {saved}, пропущено {skipped}")
-                continue
+            for i, rec in enumerate(records):
+                read += 1
+                cursor = offset + i + 1
+                secid = (rec.get("SECID") or rec.get("secid") or "").strip().upper()
+                if not secid:
+                    skipped += 1
+                elif secid in flushed:
+                    repeated += 1
+                else:
+                    # ticker — уникальный ключ инструмента
+                    pending[secid] = InstrumentRowMapper.to_instrument_defaults(rec)
+                    if len(pending) >= chunk_size:
+                        flush()
+
+                if read % batch == 0:
+                    rate = read / max(time.perf_counter() - started, 1e-9)
+                    self.stdout.write(
+                        f"  ...прочитано {read}, сохранено {saved}, пропущено {skipped} ({rate:.0f} строк/с)"
+                    )
 
-            ticker = secid  # твой уникальный ключ — ticker
-            defaults = InstrumentRowMapper.to_instrument_defaults(rec)
-            Instrument.objects.update_or_create(ticker=ticker, defaults=defaults)
-            saved += 1
+        if pending:
+            flush()
 
-            if i % batch == 0:
-                self.stdout.write(f"  ...прочитано {i}, сохранено {saved}, пропущено {skipped}")
+        checkpoint.cursor, checkpoint.rows, checkpoint.finished = cursor, saved, True
+        checkpoint.save(update_fields=["cursor", "rows", "finished", "updated_at"])
 
         if not saw_first_page:
             self.stdout.write(self.style.WARNING("! От ISS не пришло ни одной строки (проверь фильтры)"))
 
-        msg = f"Готово: сохранено/обновлено {saved}, пропущено {skipped}."
+        elapsed = time.perf_counter() - started
+        rate = read / elapsed if elapsed > 0 else 0.0
+        msg = (
+            f"Готово: сохранено/обновлено {saved}, пропущено {skipped}, повторов {repeated}; "
+            f"прочитано {read} за {elapsed:.1f} с ({rate:.0f} строк/с)."
+        )
         logger.info(msg)
         self.stdout.write(self.style.SUCCESS(msg))
@@ -1,10 +1,12 @@
+import datetime as dt
+
 from django.core.management.base import BaseCommand, CommandError
-from django.core.management import call_command
-from django.db import transaction
+
+from mm08.services.candles import ISS_INTERVALS, load_candles
 
 
 class Command(BaseCommand):
-    help = "Пакетная загрузка нескольких тикеров через вызовы load_moex"
+    help = "Пакетная загрузка свечей ISS для нескольких тикеров (параллельно, идемпотентно)"
 
     def add_arguments(self, parser):
         parser.add_argument("--tickers", required=True, help="Список через запятую: SBER,GAZP,GMKN")
@@ -14,28 +16,30 @@ class Command(BaseCommand):
         parser.add_argument("--engine", default="stock")
         parser.add_argument("--market", default="shares")
         parser.add_argument("--board", default="TQBR")
+        parser.add_argument("--workers", type=int, default=4, help="Сколько запросов к ISS одновременно")
 
-    @transaction.atomic
     def handle(self, *args, **opts):
         tickers = [t.strip().upper() for t in opts["tickers"].split(",") if t.strip()]
         if not tickers:
             raise CommandError("Не переданы тикеры")
+        if opts["interval"] not in ISS_INTERVALS:
+            raise CommandError(f"Интервал должен быть одним из: {', '.join(map(str, ISS_INTERVALS))}")
 
-        date_from = opts["date_from"]
-        date_till = opts["date_till"]
+        try:
+            date_from = dt.date.fromisoformat(opts["date_from"])
+            date_till = dt.date.fromisoformat(opts["date_till"])
+        except ValueError as e:
+            raise CommandError(f"Дата в формате YYYY-MM-DD: {e}")
 
-        for t in tickers:
-            self.stdout.write(self.style.NOTICE(f"==> {t}"))
-            call_command(
-                "load_moex",
-                "--ticker", t,
-                "--from", date_from,
-                "--to", date_till,
-                "--interval", str(opts["interval"]),
-                "--engine", opts["engine"],
-                "--market", opts["market"],
-                "--board", opts["board"],
-                "--shortname", t,
-            )
+        def progress(ticker, c_from, c_till, n):
+            self.stdout.write(f"  {ticker} {c_from}..{c_till}: {n} свечей")
 
+        saved = load_candles(
+            tickers, date_from, date_till, opts["interval"],
+            engine=opts["engine"], market=opts["market"], board=opts["board"],
+            max_workers=opts["workers"], on_progress=progress,
+        )
+
+        for t in tickers:
+            self.stdout.write(self.style.NOTICE(f"==> {t}: {saved[t]}"))
         self.stdout.write(self.style.SUCCESS("Пакетная загрузка завершена ✅"))
@@ -0,0 +1,55 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from mm08.services.heatmap import BOARD_MAP
+from mm08.services.heat_frames import record_board
+from mm08.services.quotes import fetch_quotes, write_board
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Поллер котировок: раз в --interval секунд тянет доски из ISS и пишет их "
+        "в общую доску (QUOTES_DIR), которую веб-воркеры читают через mmap, "
+        "и дописывает кадр во внутридневной ряд теплокарты (HeatFrame)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--boards", default="TQBR,RFUD", help="Доски через запятую")
+        parser.add_argument("--interval", type=float, default=None,
+                            help="Период опроса, сек (по умолчанию QUOTES_POLL_SEC)")
+        parser.add_argument("--once", action="store_true", help="Один проход и выход")
+        parser.add_argument("--no-frames", action="store_true", help="Не писать кадры HeatFrame")
+
+    def handle(self, *args, **opts):
+        boards = [b.strip().upper() for b in opts["boards"].split(",") if b.strip()]
+        unknown = [b for b in boards if b not in BOARD_MAP]
+        if unknown:
+            raise CommandError(f"Неизвестные доски: {', '.join(unknown)}")
+        interval = opts["interval"] or settings.QUOTES_POLL_SEC
+
+        while True:
+            started = time.monotonic()
+            for board in boards:
+                try:
+                    table = fetch_quotes(board)
+                    write_board(board, table)
+                except Exception:
+                    # сбой ISS не роняет поллер: читатели видят прошлую доску до следующего прохода
+                    logger.exception("Quote poll failed for %s", board)
+                    continue
+                n = len(table)
+                if not opts["no_frames"]:
+                    try:
+                        record_board(board, table)
+                    except Exception:
+                        logger.exception("Frame record failed for %s", board)
+                if opts["once"]:
+                    self.stdout.write(self.style.SUCCESS(f"{board}: {n} котировок"))
+            if opts["once"]:
+                break
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from mm08.services.jobs import STALE_AFTER_SEC, requeue_stale, run_pending, worker_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Воркер очереди фоновых задач (пересборка снапшотов теплокарты). "
+        "Запускается отдельным процессом рядом с gunicorn; воркеров может быть несколько."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Выполнить то, что в очереди, и выйти")
+        parser.add_argument("--poll", type=float, default=1.0, help="Пауза между опросами пустой очереди, сек")
+        parser.add_argument("--stale", type=int, default=STALE_AFTER_SEC,
+                            help="Через сколько секунд задача в running считается брошенной")
+
+    def handle(self, *args, **opts):
+        worker = worker_name()
+        self.stdout.write(f"Воркер {worker} запущен")
+        while True:
+            close_old_connections()  # долгоживущий процесс: не держим протухшее соединение
+            requeued = requeue_stale(opts["stale"])
+            if requeued:
+                self.stdout.write(self.style.WARNING(f"Возвращено в очередь брошенных задач: {requeued}"))
+            done = run_pending(worker)
+            if done:
+                self.stdout.write(self.style.SUCCESS(f"Выполнено задач: {done}"))
+            if opts["once"]:
+                break
+            if not done:
+                time.sleep(opts["poll"])
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mm08.models import Instrument
+from mm08.services.candles import ISS_INTERVALS, sync_candles
+
+
+class Command(BaseCommand):
+    help = (
+        "Инкрементальная догрузка свечей: только бары новее последнего сохранённого "
+        "(плюс небольшое перекрытие). Без --tickers — все активные инструменты доски."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tickers", default="", help="Список через запятую: SBER,GAZP,GMKN")
+        parser.add_argument("--interval", type=int, default=1)
+        parser.add_argument("--engine", default="stock")
+        parser.add_argument("--market", default="shares")
+        parser.add_argument("--board", default="TQBR")
+        parser.add_argument("--overlap", type=int, default=2, help="Сколько последних баров перекачать заново")
+        parser.add_argument("--days", type=int, default=30, help="Глубина первой загрузки для новых рядов")
+        parser.add_argument("--workers", type=int, default=4, help="Сколько запросов к ISS одновременно")
+
+    def handle(self, *args, **opts):
+        if opts["interval"] not in ISS_INTERVALS:
+            raise CommandError(f"Интервал должен быть одним из: {', '.join(map(str, ISS_INTERVALS))}")
+
+        tickers = [t.strip().upper() for t in opts["tickers"].split(",") if t.strip()]
+        if not tickers:
+            tickers = list(
+                Instrument.objects.filter(board=opts["board"].upper(), is_active=True)
+                .order_by("ticker").values_list("ticker", flat=True)
+            )
+        if not tickers:
+            raise CommandError(f"Нет активных инструментов на доске {opts['board']}")
+
+        saved = sync_candles(
+            tickers, opts["interval"],
+            engine=opts["engine"], market=opts["market"], board=opts["board"].upper(),
+            overlap_bars=opts["overlap"], initial_days=opts["days"], max_workers=opts["workers"],
+        )
+        total = sum(saved.values())
+        self.stdout.write(self.style.SUCCESS(f"Синхронизация завершена: {len(tickers)} рядов, {total} свечей ✅"))
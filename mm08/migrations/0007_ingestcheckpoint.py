@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mm08", "0006_alter_heatsnapshot_date"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngestCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="Создано",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Изменено"),
+                ),
+                ("job", models.CharField(max_length=32)),
+                ("engine", models.CharField(blank=True, default="", max_length=20)),
+                ("market", models.CharField(blank=True, default="", max_length=20)),
+                ("board", models.CharField(blank=True, default="", max_length=20)),
+                ("cursor", models.PositiveIntegerField(default=0)),
+                ("rows", models.PositiveIntegerField(default=0)),
+                ("finished", models.BooleanField(default=False)),
+            ],
+            options={
+                "verbose_name": "Точка возобновления загрузки",
+                "verbose_name_plural": "Точки возобновления загрузки",
+                "unique_together": {("job", "engine", "market", "board")},
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mm08", "0007_ingestcheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CandleSeries",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="Создано",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Изменено"),
+                ),
+                (
+                    "interval",
+                    models.IntegerField(
+                        choices=[
+                            (1, "1 мин"),
+                            (10, "10 мин"),
+                            (60, "1 час"),
+                            (1440, "1 день"),
+                        ],
+                        default=1,
+                    ),
+                ),
+                ("last_dt", models.DateTimeField(blank=True, null=True)),
+                (
+                    "instrument",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="candle_series",
+                        to="mm08.instrument",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ряд свечей",
+                "verbose_name_plural": "Ряды свечей",
+                "unique_together": {("instrument", "interval")},
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-17 05:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mm08", "0009_refreshjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HeatFrame",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("board", models.CharField(default="TQBR", max_length=16)),
+                ("ts", models.DateTimeField()),
+                ("is_key", models.BooleanField(default=False)),
+                ("size", models.PositiveIntegerField(default=0)),
+                ("data", models.BinaryField()),
+            ],
+            options={
+                "verbose_name": "Кадр теплокарты",
+                "verbose_name_plural": "Кадры теплокарты",
+                "ordering": ["board", "ts"],
+                "indexes": [
+                    models.Index(
+                        fields=["board", "is_key", "ts"], name="heatframe_board_key_ts"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("board", "ts"), name="heatframe_board_ts"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -84,6 +84,88 @@ class Candle(TimeStampedModel):       # ← наследуемся
         return f"{self.instrument.ticker} {self.dt} [{self.get_interval_display()}]"
     
 
+class CandleSeries(TimeStampedModel):
+    """Ряд свечей (инструмент × интервал) с отметкой последнего загруженного бара."""
+    instrument = models.ForeignKey(Instrument, on_delete=models.CASCADE, related_name="candle_series")
+    interval = models.IntegerField(choices=Candle.Interval.choices, default=Candle.Interval.M1)
+    last_dt = models.DateTimeField(null=True, blank=True)   # high-water mark: dt последнего бара
+
+    class Meta:
+        verbose_name = "Ряд свечей"
+        verbose_name_plural = "Ряды свечей"
+        unique_together = (("instrument", "interval"),)
+
+    def __str__(self) -> str:
+        return f"{self.instrument.ticker} [{self.get_interval_display()}] → {self.last_dt}"
+
+
+class IngestCheckpoint(TimeStampedModel):
+    """Точка возобновления загрузки из ISS: до какого offset'а данные уже сохранены."""
+    job = models.CharField(max_length=32)                    # load_moex, …
+    engine = models.CharField(max_length=20, blank=True, default="")
+    market = models.CharField(max_length=20, blank=True, default="")
+    board = models.CharField(max_length=20, blank=True, default="")
+    cursor = models.PositiveIntegerField(default=0)          # следующий start для ISS
+    rows = models.PositiveIntegerField(default=0)            # сохранено строк к этому моменту
+    finished = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = "Точка возобновления загрузки"
+        verbose_name_plural = "Точки возобновления загрузки"
+        unique_together = (("job", "engine", "market", "board"),)
+
+    def __str__(self) -> str:
+        scope = "/".join(p for p in (self.engine, self.market, self.board) if p) or "*"
+        return f"{self.job} {scope} @ {self.cursor}"
+
+
+class RefreshJob(TimeStampedModel):
+    """Фоновая задача (очередь в БД): сборка снапшота теплокарты вне веб-воркера."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "В очереди"
+        RUNNING = "running", "Выполняется"
+        DONE = "done", "Готово"
+        FAILED = "failed", "Ошибка"
+
+    kind = models.CharField(max_length=32, default="heatmap")
+    board = models.CharField(max_length=16, default="TQBR")
+    label = models.CharField(max_length=32, blank=True, default="")
+    date = models.DateField(null=True, blank=True)                    # пусто — «сегодня» на момент запуска
+    dedup_key = models.CharField(max_length=100)                      # одинаковые задачи в работе не дублируются
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.QUEUED, db_index=True)
+    progress = models.PositiveSmallIntegerField(default=0)            # 0..100
+    stage = models.CharField(max_length=64, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+    worker = models.CharField(max_length=64, blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)            # сколько раз задачу брал воркер
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    snapshot = models.ForeignKey("HeatSnapshot", null=True, blank=True, on_delete=models.SET_NULL, related_name="jobs")
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="refresh_jobs"
+    )
+
+    ACTIVE = (Status.QUEUED, Status.RUNNING)
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ["-created_at"]
+        constraints = [
+            # не больше одной активной задачи на ключ — дедупликация на уровне БД
+            models.UniqueConstraint(
+                fields=["dedup_key"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="refreshjob_one_active_per_key",
+            ),
+        ]
+        indexes = [models.Index(fields=["status", "created_at"], name="refreshjob_status_created")]
+
+    def __str__(self) -> str:
+        return f"#{self.pk} {self.dedup_key} [{self.status}]"
+
+
 # --- HEATMAP (теплокарта) ------------------------------------------------------
 from decimal import Decimal
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -146,3 +228,29 @@ class HeatTile(models.Model):
         v = float(self.change_pct) if self.change_pct is not None else 0.0
         v = max(min(v, 10.0), -10.0)
         return int(round(v / 2.0))
+
+
+class HeatFrame(models.Model):
+    """
+    Кадр внутридневного ряда теплокарты: состояние доски на момент ts.
+    Ключевой кадр хранит всю доску, остальные — только изменившиеся бумаги
+    (упаковка и восстановление — mm08/services/heat_frames.py).
+    """
+    board = models.CharField(max_length=16, default="TQBR")
+    ts = models.DateTimeField()
+    is_key = models.BooleanField(default=False)
+    size = models.PositiveIntegerField(default=0)  # бумаг в кадре (у дельты — изменившихся)
+    data = models.BinaryField()
+
+    class Meta:
+        verbose_name = "Кадр теплокарты"
+        verbose_name_plural = "Кадры теплокарты"
+        ordering = ["board", "ts"]
+        constraints = [
+            # заодно индекс (board, ts) для «кадр на момент T»
+            models.UniqueConstraint(fields=["board", "ts"], name="heatframe_board_ts"),
+        ]
+        indexes = [models.Index(fields=["board", "is_key", "ts"], name="heatframe_board_key_ts")]
+
+    def __str__(self) -> str:
+        return f"{self.board} {self.ts:%Y-%m-%d %H:%M:%S} {'key' if self.is_key else 'Δ'}{self.size}"
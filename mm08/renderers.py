@@ -0,0 +1,36 @@
+# MM/mm08/renderers.py
+# ─────────────────────────────────────────────────────────────────────────────
+# Путь и имя файла: MM/mm08/renderers.py
+# Назначение: быстрый JSON-рендерер DRF (orjson, если установлен)
+# ─────────────────────────────────────────────────────────────────────────────
+
+from rest_framework.renderers import JSONRenderer  # базовый рендерер DRF
+from rest_framework.utils.encoders import JSONEncoder  # типы DRF: Decimal, lazy-строки, datetime
+
+# orjson — необязательная зависимость: без него работаем как обычный JSONRenderer
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson: тот же JSON, но кодирование в несколько раз быстрее.
+    Чего orjson не умеет сам (Decimal, lazy-строки, datetime в формате DRF) — отдаём
+    стандартному энкодеру DRF. Для ?indent= и без orjson — базовая реализация.
+    """
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(
+            data,
+            default=self._encoder.default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # как и JSONRenderer: U+2028/U+2029 экранируем, чтобы JSON оставался валидным JavaScript
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
@@ -27,7 +27,7 @@ class CandleSerializer(serializers.ModelSerializer):
 
 class HeatTileSerializer(serializers.ModelSerializer):
     """Сериализатор плитки теплокарты (одна бумага в снапшоте)."""
-    snapshot_id = serializers.IntegerField(source="snapshot.id", read_only=True)  # отдаём ID снапшота  
+    snapshot_id = serializers.IntegerField(read_only=True)  # ID снапшота прямо из FK-колонки, без JOIN  
 
     class Meta:
         model = HeatTile
@@ -0,0 +1,74 @@
+# Project/mm08/services/api_bench.py
+from __future__ import annotations
+import datetime as dt
+from decimal import Decimal
+from typing import Callable, Dict, List, Union
+
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from mm08.models import Candle, HeatSnapshot, HeatTile, Instrument
+from mm08.renderers import FastJSONRenderer
+from mm08.serializers import CandleSerializer, HeatTileSerializer
+from .api_rows import CANDLE_COLUMNS, TILE_COLUMNS, candle_rows, tile_rows
+from .bench import rolled_back
+from .ingest_bench import measure
+
+BENCH_LABEL = "api-bench"
+
+
+def _seed(rows: int) -> None:
+    """rows свечей и rows плиток в отдельном инструменте/снапшоте."""
+    inst = Instrument.objects.create(ticker="BENCH", secid="BENCH", shortname="bench")
+    start = timezone.make_aware(dt.datetime(2025, 1, 6, 10, 0))
+    Candle.objects.bulk_create(
+        [
+            Candle(instrument=inst, interval=1, dt=start + dt.timedelta(minutes=i),
+                   open=100.0, high=101.0, low=99.0, close=100.5, volume=i)
+            for i in range(rows)
+        ],
+        batch_size=500,
+    )
+    snap = HeatSnapshot.objects.create(board="BENCH", label=BENCH_LABEL)
+    HeatTile.objects.bulk_create(
+        [
+            HeatTile(snapshot=snap, ticker=f"T{i:05d}", shortname=f"Tile {i}",
+                     last=Decimal("123.456789"), change_pct=Decimal(i % 200 - 100) / 10)
+            for i in range(rows)
+        ],
+        batch_size=500,
+    )
+
+
+def _variants(rows: int) -> Dict[str, Callable[[], int]]:
+    candles = Candle.objects.filter(instrument__ticker="BENCH").order_by("-dt")
+    tiles = HeatTile.objects.filter(snapshot__label=BENCH_LABEL).order_by("-change_pct")
+    slow, fast = JSONRenderer(), FastJSONRenderer()
+
+    def run(render, build) -> int:
+        data = build()
+        render.render(data)
+        return len(data)
+
+    return {
+        "candles/serializer": lambda: run(
+            slow, lambda: CandleSerializer(candles.select_related("instrument")[:rows], many=True).data),
+        "candles/fast": lambda: run(fast, lambda: candle_rows(candles.values_list(*CANDLE_COLUMNS)[:rows])),
+        "tiles/serializer": lambda: run(slow, lambda: HeatTileSerializer(tiles[:rows], many=True).data),
+        "tiles/fast": lambda: run(fast, lambda: tile_rows(tiles.values_list(*TILE_COLUMNS)[:rows])),
+    }
+
+
+def run_api_bench(rows: int = 5000) -> List[Dict[str, Union[str, int, float]]]:
+    """
+    Стоимость строки списка свечей/плиток: DRF ModelSerializer + JSONRenderer
+    против values_list + FastJSONRenderer. Тестовые данные откатываются.
+    """
+    results: List[Dict[str, Union[str, int, float]]] = []
+    with rolled_back():
+        _seed(rows)
+        for name, fn in _variants(rows).items():
+            r = measure(name, fn)
+            r["us_per_row"] = round(r["wall_ms"] * 1000 / max(int(r["rows"]), 1), 2)
+            results.append(r)
+    return results
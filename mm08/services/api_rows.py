@@ -0,0 +1,85 @@
+# Project/mm08/services/api_rows.py
+from __future__ import annotations
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from django.utils import timezone
+
+from mm08.models import HeatTile
+
+# Быстрый путь для read-only списков API: values_list → dict той же формы,
+# что у CandleSerializer / HeatTileSerializer, без экземпляров моделей и полей DRF.
+
+# Первые две колонки — ключ keyset-пагинации (dt, id)
+CANDLE_COLUMNS = ("dt", "id", "instrument__ticker", "interval", "open", "high", "low", "close", "volume")
+TILE_COLUMNS = ("id", "snapshot_id", "ticker", "shortname", "engine", "market", "board", "last", "change_pct")
+
+_LAST_EXP = Decimal(1).scaleb(-HeatTile._meta.get_field("last").decimal_places)
+_PCT_EXP = Decimal(1).scaleb(-HeatTile._meta.get_field("change_pct").decimal_places)
+
+
+def format_dt(value) -> Optional[str]:
+    """Как serializers.DateTimeField: текущая зона, ISO 8601, UTC — с суффиксом Z."""
+    if value is None:
+        return None
+    s = timezone.localtime(value).isoformat()
+    return s[:-6] + "Z" if s.endswith("+00:00") else s
+
+
+def format_decimal(value: Optional[Decimal], exp: Decimal) -> Optional[str]:
+    """Как serializers.DecimalField(coerce_to_string=True): строка с фиксированным числом знаков."""
+    return None if value is None else "{:f}".format(value.quantize(exp))
+
+
+def candle_rows(rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Строки values_list(*CANDLE_COLUMNS) → формат CandleSerializer."""
+    return [
+        {
+            "instrument": ticker,
+            "dt": format_dt(dt),
+            "interval": interval,
+            "open": o,
+            "high": h,
+            "low": l,
+            "close": c,
+            "volume": v,
+        }
+        for dt, _id, ticker, interval, o, h, l, c, v in rows
+    ]
+
+
+def tile_rows(rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Строки values_list(*TILE_COLUMNS) → формат HeatTileSerializer."""
+    return [
+        {
+            "id": pk,
+            "snapshot_id": snapshot_id,
+            "ticker": ticker,
+            "shortname": shortname,
+            "engine": engine,
+            "market": market,
+            "board": board,
+            "last": format_decimal(last, _LAST_EXP),
+            "change_pct": format_decimal(change_pct, _PCT_EXP),
+        }
+        for pk, snapshot_id, ticker, shortname, engine, market, board, last, change_pct in rows
+    ]
+
+
+def candle_columns(rows: Iterable[Sequence[Any]]) -> Dict[str, list]:
+    """
+    Строки values_list(*CANDLE_COLUMNS) одного инструмента и интервала → столбцы (?layout=columns)
+    в именах графика (ChartDataView): t — epoch-секунды, o/h/l/c/v — по массиву на поле.
+    """
+    rows = list(rows)
+    if not rows:
+        return {k: [] for k in "tohlcv"}
+    dts, _ids, _tickers, _intervals, o, h, l, c, v = zip(*rows)
+    return {
+        "t": [int(d.timestamp()) for d in dts],
+        "o": list(o),
+        "h": list(h),
+        "l": list(l),
+        "c": list(c),
+        "v": list(v),
+    }
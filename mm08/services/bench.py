@@ -0,0 +1,22 @@
+# Project/mm08/services/bench.py
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.db import transaction
+
+
+class Rollback(Exception):
+    """Служебное исключение: откатить транзакцию замера."""
+
+
+@contextmanager
+def rolled_back(keep: bool = False) -> Iterator[None]:
+    """Транзакция, которая после блока откатывается (keep=True — фиксируется): замеры не оставляют данных."""
+    try:
+        with transaction.atomic():
+            yield
+            if not keep:
+                raise Rollback
+    except Rollback:
+        pass
@@ -0,0 +1,88 @@
+# Project/mm08/services/board_reference.py
+from __future__ import annotations
+import logging
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .iss_client import board_securities_path, fan_out_pages, get_client, iss_cursor
+from .single_flight import single_flight
+
+logger = logging.getLogger(__name__)
+
+# Справочная часть доски (блок securities: SECID, SHORTNAME, LOTSIZE, BOARDID) за день
+# почти не меняется, поэтому живёт в общем кэше сутки, а частые обновления тянут
+# с ISS только marketdata с проекцией колонок (iss.only=marketdata).
+
+REF_COLUMNS = ("SECID", "SHORTNAME", "LOTSIZE", "BOARDID")
+REF_CACHE_KEY = "iss:ref:{engine}:{market}:{board}:{day}"  # день в ключе — новая справка с началом торгового дня
+REF_TTL_SEC = 24 * 3600
+REF_STALE_SEC = 3600
+# Если в marketdata есть бумага, которой нет в справке (листинг днём), — перечитать справку,
+# но не чаще раза в столько секунд
+REF_RECHECK_SEC = 10 * 60
+
+# {SECID: {"SHORTNAME": ..., "LOTSIZE": ..., "BOARDID": ...}}
+BoardReference = Dict[str, Dict]
+
+
+def _ref_key(engine: str, market: str, board: str) -> str:
+    return REF_CACHE_KEY.format(engine=engine, market=market, board=board, day=timezone.localdate().isoformat())
+
+
+def fetch_reference(engine: str, market: str, board: str) -> BoardReference:
+    """Блок securities доски со всех страниц (курсор — как у fetch_board_all)."""
+    path = board_securities_path(engine, market, board)
+
+    def page(start: int) -> Tuple[List[str], List[list], Tuple[List[str], List[list]]]:
+        tables = get_client().get_tables(
+            path, ("securities", "securities.cursor"),
+            columns={"securities": REF_COLUMNS}, params={"start": str(start)},
+        )
+        return (*tables["securities"], tables["securities.cursor"])
+
+    cols, rows, cursor = page(0)
+    total, _ = iss_cursor(cursor, len(rows))
+    pages = [(cols, rows)]
+    if rows:
+        pages += [p[:2] for p in fan_out_pages(page, range(len(rows), total, len(rows)))]
+
+    ref: BoardReference = {}
+    for cols, rows in pages:
+        for row in rows:
+            rec = dict(zip(cols, row))
+            secid = rec.pop("SECID", None)
+            if secid and secid not in ref:
+                ref[secid] = rec
+    return ref
+
+
+def board_reference(engine: str, market: str, board: str, *, require: Iterable[str] = ()) -> BoardReference:
+    """
+    Справка доски из общего кэша (сутки, один процесс ходит в ISS — single-flight).
+    require — SECID из свежего marketdata: если каких-то нет в справке, она перечитывается.
+    """
+    key = _ref_key(engine, market, board)
+
+    def fill() -> Tuple[float, BoardReference]:
+        return time.time(), fetch_reference(engine, market, board)
+
+    fetched_at, ref = single_flight(key, fill, ttl=REF_TTL_SEC, stale_ttl=REF_STALE_SEC)
+    missing = set(require) - ref.keys()
+    if missing and time.time() - fetched_at > REF_RECHECK_SEC:
+        logger.info("Board reference %s misses %d securities, refetching", board, len(missing))
+        cache.delete(key)
+        fetched_at, ref = single_flight(key, fill, ttl=REF_TTL_SEC, stale_ttl=REF_STALE_SEC)
+    return ref
+
+
+def fetch_marketdata(
+    engine: str, market: str, board: str, columns: Sequence[str]
+) -> Tuple[List[str], List[list]]:
+    """Только marketdata доски с проекцией колонок — весь сетевой трафик частого обновления."""
+    tables = get_client().get_tables(
+        board_securities_path(engine, market, board), ("marketdata",), columns={"marketdata": columns}
+    )
+    return tables["marketdata"]
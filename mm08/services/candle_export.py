@@ -0,0 +1,108 @@
+# Project/mm08/services/candle_export.py
+from __future__ import annotations
+import datetime as dt
+import shutil
+import tempfile
+import zipfile
+from typing import BinaryIO, Dict, List, Optional, Sequence
+
+import numpy as np
+from django.utils import timezone
+
+from mm08.models import Candle, Instrument
+
+EXPORT_CHUNK = 50_000
+
+# Столбцы .npz: имя → dtype. instrument — индекс в массиве tickers, t — epoch-секунды UTC начала бара
+EXPORT_DTYPES: Dict[str, np.dtype] = {
+    "instrument": np.dtype(np.int32),
+    "t": np.dtype(np.int64),
+    "open": np.dtype(np.float64),
+    "high": np.dtype(np.float64),
+    "low": np.dtype(np.float64),
+    "close": np.dtype(np.float64),
+    "volume": np.dtype(np.int64),
+}
+
+
+def _day_bounds(date_from: Optional[dt.date], date_to: Optional[dt.date]):
+    lo = timezone.make_aware(dt.datetime.combine(date_from, dt.time.min)) if date_from else None
+    hi = timezone.make_aware(dt.datetime.combine(date_to, dt.time.max)) if date_to else None
+    return lo, hi
+
+
+def export_npz(
+    dest: BinaryIO,
+    tickers: Sequence[str],
+    interval: int,
+    *,
+    date_from: Optional[dt.date] = None,
+    date_to: Optional[dt.date] = None,
+    chunk_size: int = EXPORT_CHUNK,
+    compress: bool = False,
+) -> int:
+    """
+    Выгрузить свечи (tickers × interval × [date_from, date_to]) в dest как .npz
+    (np.load(dest) → массивы EXPORT_DTYPES + tickers).
+
+    Строки читаются курсором БД пачками по chunk_size и сразу дописываются
+    в побайтовые временные файлы по столбцам; затем столбцы собираются в zip
+    с заголовками .npy. В памяти держится одна пачка — объём выгрузки не важен.
+    Возвращает число строк.
+    """
+    ids: Dict[int, int] = {}
+    names: List[str] = []
+    for pk, ticker in Instrument.objects.filter(ticker__in=list(tickers)).order_by("ticker").values_list("id", "ticker"):
+        ids[pk] = len(names)
+        names.append(ticker)
+
+    qs = Candle.objects.filter(instrument_id__in=list(ids), interval=interval)
+    lo, hi = _day_bounds(date_from, date_to)
+    if lo:
+        qs = qs.filter(dt__gte=lo)
+    if hi:
+        qs = qs.filter(dt__lte=hi)
+    rows = qs.order_by("instrument_id", "dt").values_list(
+        "instrument_id", "dt", "open", "high", "low", "close", "volume"
+    ).iterator(chunk_size=chunk_size)
+
+    spill = {name: tempfile.TemporaryFile() for name in EXPORT_DTYPES}
+    try:
+        total = 0
+        chunk: list = []
+
+        def flush() -> None:
+            inst, when, o, h, l, c, v = zip(*chunk)
+            cols = {
+                "instrument": [ids[i] for i in inst],
+                "t": [int(d.timestamp()) for d in when],
+                "open": o, "high": h, "low": l, "close": c, "volume": v,
+            }
+            for name, values in cols.items():
+                np.asarray(values, dtype=EXPORT_DTYPES[name]).tofile(spill[name])
+            chunk.clear()
+
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                total += len(chunk)
+                flush()
+        if chunk:
+            total += len(chunk)
+            flush()
+
+        method = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        with zipfile.ZipFile(dest, "w", compression=method, allowZip64=True) as zf:
+            for name, dtype in EXPORT_DTYPES.items():
+                with zf.open(f"{name}.npy", "w", force_zip64=True) as out:
+                    np.lib.format.write_array_header_1_0(
+                        out, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (total,)}
+                    )
+                    spill[name].seek(0)
+                    shutil.copyfileobj(spill[name], out, 1 << 20)
+            with zf.open("tickers.npy", "w") as out:
+                np.lib.format.write_array(out, np.asarray(names, dtype=str))
+        return total
+    finally:
+        for f in spill.values():
+            f.close()
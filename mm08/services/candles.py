@@ -0,0 +1,293 @@
+# Project/mm08/services/candles.py
+from __future__ import annotations
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from mm08.models import Candle, CandleSeries, Instrument
+from .instrument_sync import sync_instruments
+from .iss_client import DEFAULT_MAX_WORKERS, IssClient, get_client
+
+# Интервал модели (минуты) → код интервала ISS
+ISS_INTERVALS: Dict[int, int] = {
+    Candle.Interval.M1: 1,
+    Candle.Interval.M10: 10,
+    Candle.Interval.H1: 60,
+    Candle.Interval.D1: 24,
+}
+
+# Сколько дней в одном запросе диапазона (~2000 баров, т.е. несколько страниц ISS)
+CHUNK_DAYS: Dict[int, int] = {
+    Candle.Interval.M1: 2,
+    Candle.Interval.M10: 20,
+    Candle.Interval.H1: 120,
+    Candle.Interval.D1: 3650,
+}
+
+CANDLE_COLUMNS = ("begin", "open", "high", "low", "close", "volume")
+
+# Один бар ISS: (begin, open, high, low, close, volume)
+Bar = Tuple[str, float, float, float, float, int]
+
+
+def date_chunks(date_from: dt.date, date_till: dt.date, interval: int) -> List[Tuple[dt.date, dt.date]]:
+    """Разбить [date_from, date_till] на куски по CHUNK_DAYS[interval] дней (границы включительно)."""
+    step = dt.timedelta(days=CHUNK_DAYS.get(interval, 30))
+    out: List[Tuple[dt.date, dt.date]] = []
+    cur = date_from
+    while cur <= date_till:
+        end = min(cur + step - dt.timedelta(days=1), date_till)
+        out.append((cur, end))
+        cur = end + dt.timedelta(days=1)
+    return out
+
+
+def candles_path(engine: str, market: str, board: str, secid: str) -> str:
+    return f"/engines/{engine}/markets/{market}/boards/{board}/securities/{secid}/candles.json"
+
+
+def fetch_candles(
+    engine: str,
+    market: str,
+    board: str,
+    secid: str,
+    date_from: dt.date,
+    date_till: dt.date,
+    interval: int,
+    *,
+    since: Optional[dt.datetime] = None,
+    client: Optional[IssClient] = None,
+) -> List[Bar]:
+    """
+    Все бары по бумаге за диапазон: ISS отдаёт candles страницами (обычно по 500),
+    курсора нет — идём по start, пока страница не пустая.
+    since внутри диапазона уходит в ISS как from с временем — бары до него не качаем.
+    """
+    if interval not in ISS_INTERVALS:
+        raise ValueError(f"Unsupported interval: {interval}")
+    client = client or get_client()
+    path = candles_path(engine, market, board, secid)
+    start_from = date_from.isoformat()
+    if since is not None and timezone.localtime(since).date() >= date_from:
+        # ISS понимает from="YYYY-MM-DD HH:MM:SS" во времени биржи (= TIME_ZONE проекта)
+        start_from = timezone.localtime(since).strftime("%Y-%m-%d %H:%M:%S")
+
+    bars: List[Bar] = []
+    start = 0
+    while True:
+        tables = client.get_tables(
+            path,
+            ("candles",),
+            columns={"candles": CANDLE_COLUMNS},
+            params={
+                "from": start_from,
+                "till": date_till.isoformat(),
+                "interval": str(ISS_INTERVALS[interval]),
+                "start": str(start),
+            },
+        )
+        cols, rows = tables["candles"]
+        if not rows:
+            break
+        pos = [cols.index(c) for c in CANDLE_COLUMNS]
+        bars.extend(tuple(row[i] for i in pos) for row in rows)
+        start += len(rows)
+    return bars
+
+
+def _parse_begin(value: str) -> dt.datetime:
+    # ISS отдаёт время биржи (Europe/Moscow = TIME_ZONE проекта) без зоны
+    return timezone.make_aware(dt.datetime.fromisoformat(value))
+
+
+def upsert_candles(
+    instrument_id: int,
+    interval: int,
+    bars: Sequence[Bar],
+    *,
+    since: Optional[dt.datetime] = None,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Идемпотентный апсерт по уникальному ключу (instrument, dt, interval)
+    + сдвиг high-water mark ряда. Бары раньше since (если задан) пропускаем.
+    """
+    objs = []
+    for begin, o, h, l, c, v in bars:
+        when = _parse_begin(begin)
+        if since is not None and when < since:
+            continue
+        objs.append(Candle(
+            instrument_id=instrument_id,
+            interval=interval,
+            dt=when,
+            open=o, high=h, low=l, close=c,
+            volume=int(v or 0),
+        ))
+    if not objs:
+        return 0
+    Candle.objects.bulk_create(
+        objs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["instrument", "dt", "interval"],
+        update_fields=["open", "high", "low", "close", "volume", "updated_at"],
+    )
+    bump_high_water_mark(instrument_id, interval, max(o.dt for o in objs))
+    return len(objs)
+
+
+def bump_high_water_mark(instrument_id: int, interval: int, newest: dt.datetime) -> None:
+    """
+    Отметка ряда только растёт: переписываем, если новый бар позже сохранённого.
+    updated_at трогаем при любой записи — это версия ряда для кэша ресемплинга.
+    """
+    series, created = CandleSeries.objects.get_or_create(
+        instrument_id=instrument_id, interval=interval, defaults={"last_dt": newest},
+    )
+    if not created:
+        if series.last_dt is None or series.last_dt < newest:
+            series.last_dt = newest
+        series.save(update_fields=["last_dt", "updated_at"])
+
+
+def high_water_marks(instrument_ids: Sequence[int], interval: int) -> Dict[int, dt.datetime]:
+    """
+    {instrument_id: last_dt} одним запросом; для рядов без отметки (загружены до её появления)
+    берём MAX(dt) по самим свечам.
+    """
+    marks = dict(
+        CandleSeries.objects
+        .filter(instrument_id__in=instrument_ids, interval=interval, last_dt__isnull=False)
+        .values_list("instrument_id", "last_dt")
+    )
+    missing = [i for i in instrument_ids if i not in marks]
+    if missing:
+        marks.update(
+            Candle.objects
+            .filter(instrument_id__in=missing, interval=interval)
+            .values("instrument_id")
+            .annotate(last=Max("dt"))
+            .values_list("instrument_id", "last")
+        )
+    return marks
+
+
+def ensure_instruments(tickers: Sequence[str], engine: str, market: str, board: str) -> Dict[str, int]:
+    """{ticker: instrument_id}; недостающие инструменты создаём одной пачкой."""
+    sync_instruments(
+        {t: {"secid": t, "shortname": t} for t in tickers},
+        update_fields=(),
+        create_defaults={"engine": engine, "market": market, "board": board},
+    )
+    return dict(Instrument.objects.filter(ticker__in=list(tickers)).values_list("ticker", "id"))
+
+
+# Задача выкачки: (тикер, from, till, since) — since уходит в ISS как from с временем,
+# а при записи ещё раз отсекает бары раньше окна перекрытия (на случай, если ISS вернёт лишнее)
+Task = Tuple[str, dt.date, dt.date, Optional[dt.datetime]]
+
+
+def _run_tasks(
+    tasks: Sequence[Task],
+    ids: Dict[str, int],
+    interval: int,
+    *,
+    engine: str,
+    market: str,
+    board: str,
+    max_workers: int,
+    on_progress: Optional[Callable[[str, dt.date, dt.date, int], None]],
+) -> Dict[str, int]:
+    """Выкачка задач ограниченным пулом потоков; запись — в основном потоке, транзакция на задачу."""
+    saved: Dict[str, int] = {t: 0 for t in ids}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="candles") as pool:
+        futures = {
+            pool.submit(fetch_candles, engine, market, board, ticker, c_from, c_till, interval, since=since):
+                (ticker, c_from, c_till, since)
+            for ticker, c_from, c_till, since in tasks
+        }
+        for fut in as_completed(futures):
+            ticker, c_from, c_till, since = futures[fut]
+            bars = fut.result()
+            with transaction.atomic():
+                n = upsert_candles(ids[ticker], interval, bars, since=since)
+            saved[ticker] += n
+            if on_progress:
+                on_progress(ticker, c_from, c_till, n)
+    return saved
+
+
+def load_candles(
+    tickers: Sequence[str],
+    date_from: dt.date,
+    date_till: dt.date,
+    interval: int,
+    *,
+    engine: str = "stock",
+    market: str = "shares",
+    board: str = "TQBR",
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    on_progress: Optional[Callable[[str, dt.date, dt.date, int], None]] = None,
+) -> Dict[str, int]:
+    """
+    Загрузка свечей для набора тикеров.
+
+    Диапазон режется на куски (date_chunks), задачи (тикер × кусок) выкачиваются
+    параллельно ограниченным пулом потоков; запись в БД — в основном потоке,
+    одна короткая транзакция на задачу. Возвращает {ticker: сохранено баров}.
+    """
+    if interval not in ISS_INTERVALS:
+        raise ValueError(f"Unsupported interval: {interval}")
+    ids = ensure_instruments(tickers, engine, market, board)
+    tasks: List[Task] = [
+        (t, c_from, c_till, None)
+        for t in tickers
+        for c_from, c_till in date_chunks(date_from, date_till, interval)
+    ]
+    return _run_tasks(tasks, ids, interval, engine=engine, market=market, board=board,
+                      max_workers=max_workers, on_progress=on_progress)
+
+
+def sync_candles(
+    tickers: Sequence[str],
+    interval: int,
+    *,
+    engine: str = "stock",
+    market: str = "shares",
+    board: str = "TQBR",
+    overlap_bars: int = 2,
+    initial_days: int = 30,
+    till: Optional[dt.date] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    on_progress: Optional[Callable[[str, dt.date, dt.date, int], None]] = None,
+) -> Dict[str, int]:
+    """
+    Инкрементальная синхронизация: по каждому ряду тянем только бары новее high-water mark
+    минус overlap_bars интервалов (перезаписываем ещё формирующийся последний бар).
+    Ряды без отметки стартуют с initial_days назад.
+    """
+    if interval not in ISS_INTERVALS:
+        raise ValueError(f"Unsupported interval: {interval}")
+    till = till or timezone.localdate()
+    ids = ensure_instruments(tickers, engine, market, board)
+    marks = high_water_marks(list(ids.values()), interval)
+    overlap = dt.timedelta(minutes=int(interval) * max(0, overlap_bars))
+
+    tasks: List[Task] = []
+    for ticker in tickers:
+        mark = marks.get(ids[ticker])
+        if mark is None:
+            since = None
+            date_from = till - dt.timedelta(days=initial_days)
+        else:
+            since = mark - overlap
+            date_from = timezone.localtime(since).date()
+        tasks.extend((ticker, c_from, c_till, since) for c_from, c_till in date_chunks(date_from, till, interval))
+
+    return _run_tasks(tasks, ids, interval, engine=engine, market=market, board=board,
+                      max_workers=max_workers, on_progress=on_progress)
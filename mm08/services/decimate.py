@@ -0,0 +1,74 @@
+# Project/mm08/services/decimate.py
+from __future__ import annotations
+
+import numpy as np
+
+from .resample import Bars
+
+# Режимы прореживания для ?mode= графика
+MODES = ("minmax", "lttb")
+# Без явного диапазона прореживаем не всю историю, а последние столько исходных баров
+WINDOW_BARS = 50_000
+
+
+def minmax_ohlc(bars: Bars, points: int) -> Bars:
+    """
+    Свести ряд к points баров: равные по числу исходных баров корзины,
+    open — первый, close — последний, high/low — экстремумы, volume — сумма.
+    Пики и провалы не теряются при любом масштабе.
+    """
+    size = bars["ts"].size
+    if points <= 0 or size <= points:
+        return bars
+    starts = np.linspace(0, size, points, endpoint=False).astype(np.int64)
+    ends = np.concatenate((starts[1:], [size])) - 1
+    return {
+        "ts": bars["ts"][starts],
+        "open": bars["open"][starts],
+        "high": np.maximum.reduceat(bars["high"], starts),
+        "low": np.minimum.reduceat(bars["low"], starts),
+        "close": bars["close"][ends],
+        "volume": np.add.reduceat(bars["volume"], starts),
+    }
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: индексы points точек линии, визуально близкой к исходной.
+    Первая и последняя точки сохраняются; в каждой корзине берём точку с наибольшей площадью
+    треугольника (выбранная точка слева, средняя следующей корзины справа).
+    Площади внутри корзины считаются векторно, цикл — только по корзинам.
+    Меньше трёх точек не бывает: первая, последняя и хотя бы одна между ними.
+    """
+    size = x.size
+    points = max(points, 3)
+    if points >= size:
+        return np.arange(size)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+
+    # points-2 корзины по индексам 1..size-2
+    edges = np.linspace(1, size - 1, points - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[: size - 1], edges[:-1]) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[: size - 1], edges[:-1]) / counts, y[-1])
+
+    out = np.empty(points, dtype=np.int64)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    for j in range(points - 2):
+        lo, hi = edges[j], edges[j + 1]
+        ax, ay = x[a], y[a]
+        nx, ny = avg_x[j + 1], avg_y[j + 1]
+        area = np.abs((ax - nx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (ny - ay))
+        a = lo + int(area.argmax())
+        out[j + 1] = a
+    return out
+
+
+def decimate(bars: Bars, points: int, mode: str = "minmax") -> Bars:
+    """Прореживание под график: minmax — агрегированные OHLC-корзины, lttb — исходные бары по линии close."""
+    if mode == "lttb":
+        idx = lttb_indices(bars["ts"], bars["close"], points)
+        return {k: v[idx] for k, v in bars.items()}
+    return minmax_ohlc(bars, points)
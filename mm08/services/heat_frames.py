@@ -0,0 +1,212 @@
+# Project/mm08/services/heat_frames.py
+from __future__ import annotations
+import datetime as dt
+import logging
+import zlib
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from mm08.models import HeatFrame
+
+logger = logging.getLogger(__name__)
+
+# Внутридневной ряд теплокарты: каждое обновление доски — кадр HeatFrame.
+# Ключевой кадр (первый за день и каждый KEYFRAME_EVERY-й) хранит всю доску:
+#   zlib(тикеры через "\n" + b"\0" + LAST <f8 + CHANGE_PCT <f4)
+# дельта — только изменившиеся бумаги, по номеру в ключевом кадре:
+#   zlib(индекс <u2 + LAST <f8 + CHANGE_PCT <f4) — 14 байт на бумагу до сжатия.
+# Кадр на момент T = ближайший ключевой ≤ T + дельты после него до T.
+# Писатели (поллер котировок, build_snapshot, load_heatmap --series) собирают кадр одной
+# функцией frame_columns — иначе разница в наборе/порядке бумаг или в NaN давала бы
+# ключевые кадры и дельты по всей доске на ровном месте.
+
+KEYFRAME_EVERY = 60
+
+_LAST, _PCT, _IDX = np.dtype("<f8"), np.dtype("<f4"), np.dtype("<u2")
+
+
+class FrameState(NamedTuple):
+    board: str
+    ts: dt.datetime
+    tickers: List[str]
+    last: np.ndarray  # float64, NaN — нет цены
+    pct: np.ndarray   # float32, NaN — процент неизвестен
+
+    def rows(self) -> List[Dict[str, Any]]:
+        last = [None if v != v else v for v in self.last.tolist()]
+        pct = [None if v != v else round(v, 3) for v in self.pct.tolist()]
+        return [
+            {"ticker": t, "last": lv, "change_pct": pv}
+            for t, lv, pv in zip(self.tickers, last, pct)
+        ]
+
+
+class _Tail(NamedTuple):
+    """Последнее состояние ряда доски — основа для следующей дельты."""
+    frame_id: int
+    state: FrameState
+    key_ts: dt.datetime
+    deltas: int
+    index: Dict[str, int]
+
+
+# процесс: {board: _Tail}; сверяется с БД по (id, ts) последнего кадра — запись могла откатиться
+_tails: Dict[str, _Tail] = {}
+
+
+# --- упаковка -------------------------------------------------------------------
+
+def _pack_key(tickers: Sequence[str], last: np.ndarray, pct: np.ndarray) -> bytes:
+    names = "\n".join(tickers).encode()
+    return zlib.compress(names + b"\0" + last.astype(_LAST).tobytes() + pct.astype(_PCT).tobytes())
+
+
+def _unpack_key(data: bytes, size: int) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    raw = zlib.decompress(bytes(data))
+    names, _, body = raw.partition(b"\0")
+    tickers = names.decode().split("\n") if size else []
+    last = np.frombuffer(body, _LAST, size).astype(float)
+    pct = np.frombuffer(body, _PCT, size, offset=size * _LAST.itemsize).copy()
+    return tickers, last, pct
+
+
+def _pack_delta(idx: np.ndarray, last: np.ndarray, pct: np.ndarray) -> bytes:
+    return zlib.compress(idx.astype(_IDX).tobytes() + last.astype(_LAST).tobytes() + pct.astype(_PCT).tobytes())
+
+
+def _unpack_delta(data: bytes, size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    raw = zlib.decompress(bytes(data))
+    idx = np.frombuffer(raw, _IDX, size).astype(np.intp)
+    offset = size * _IDX.itemsize
+    last = np.frombuffer(raw, _LAST, size, offset=offset)
+    pct = np.frombuffer(raw, _PCT, size, offset=offset + size * _LAST.itemsize)
+    return idx, last, pct
+
+
+# --- чтение ---------------------------------------------------------------------
+
+def _replay(board: str, at: Optional[dt.datetime]) -> Optional[_Tail]:
+    """Состояние на момент at (None — последнее): ключевой кадр + дельты за два запроса."""
+    frames = HeatFrame.objects.filter(board=board)
+    if at is not None:
+        frames = frames.filter(ts__lte=at)
+    key = frames.filter(is_key=True).order_by("-ts").values_list("id", "ts", "size", "data").first()
+    if key is None:
+        return None
+    key_id, key_ts, size, data = key
+    tickers, last, pct = _unpack_key(data, size)
+
+    frame_id, ts, deltas = key_id, key_ts, 0
+    for frame_id, ts, size, data in frames.filter(ts__gt=key_ts).order_by("ts").values_list("id", "ts", "size", "data"):
+        idx, d_last, d_pct = _unpack_delta(data, size)
+        last[idx], pct[idx] = d_last, d_pct
+        deltas += 1
+    state = FrameState(board, ts, tickers, last, pct)
+    return _Tail(frame_id, state, key_ts, deltas, {t: i for i, t in enumerate(tickers)})
+
+
+def frame_at(board: str, at: Optional[dt.datetime] = None) -> Optional[FrameState]:
+    """Состояние доски на момент at — последний кадр с ts ≤ at (at=None — самый свежий)."""
+    tail = _replay(board.upper(), at)
+    return tail.state if tail is not None else None
+
+
+def frame_times(board: str, date: Optional[dt.date] = None) -> List[Tuple[dt.datetime, bool]]:
+    """Моменты кадров доски за день (локальная дата): [(ts, ключевой?)] по возрастанию."""
+    day = date or timezone.localdate()
+    start = timezone.make_aware(dt.datetime.combine(day, dt.time.min))
+    return list(
+        HeatFrame.objects.filter(board=board.upper(), ts__gte=start, ts__lt=start + dt.timedelta(days=1))
+        .order_by("ts")
+        .values_list("ts", "is_key")
+    )
+
+
+# --- запись ---------------------------------------------------------------------
+
+def _tail(board: str) -> Optional[_Tail]:
+    latest = HeatFrame.objects.filter(board=board).order_by("-ts").values_list("id", "ts").first()
+    if latest is None:
+        return None
+    cached = _tails.get(board)
+    if cached is not None and (cached.frame_id, cached.state.ts) == latest:
+        return cached
+    return _replay(board, None)
+
+
+def _same(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+def frame_columns(md: Mapping[str, Any]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Канонический кадр из колонок доски с SECID/LAST/CHANGE_PCT (board_marketdata или
+    таблица котировок fetch_quotes): бумаги с непустым SECID по алфавиту, NaN остаются NaN.
+    """
+    at = {secid: i for i, secid in enumerate(np.asarray(md["SECID"]).tolist()) if secid}
+    tickers = sorted(at)
+    idx = np.array([at[t] for t in tickers], dtype=np.intp)
+    return tickers, np.asarray(md["LAST"], dtype=float)[idx], np.asarray(md["CHANGE_PCT"], dtype=float)[idx]
+
+
+def record_board(board: str, md: Mapping[str, Any], ts: Optional[dt.datetime] = None) -> Optional[HeatFrame]:
+    """Кадр доски из её колонок (см. frame_columns) — вход для всех писателей ряда."""
+    return record_frame(board, *frame_columns(md), ts=ts)
+
+
+def record_frame(
+    board: str,
+    tickers: Sequence[str],
+    last: Sequence[Optional[float]],
+    pct: Sequence[Optional[float]],
+    ts: Optional[dt.datetime] = None,
+) -> Optional[HeatFrame]:
+    """
+    Дописать кадр доски. Без изменений относительно прошлого кадра или с ts не новее
+    его — ничего не пишет (None): «кадр на момент T» и так вернёт то же состояние.
+    """
+    board = board.upper()
+    ts = ts or timezone.now()
+    last = np.array(last, dtype=float)  # None → NaN
+    pct = np.array(pct, dtype=float).astype(_PCT)
+
+    tail = _tail(board)
+    if tail is not None and ts <= tail.state.ts:
+        return None
+
+    key = (
+        tail is None
+        or timezone.localdate(tail.key_ts) != timezone.localdate(ts)
+        or tail.deltas + 1 >= KEYFRAME_EVERY
+        or len(tail.index) > np.iinfo(_IDX).max
+        # другой состав доски (новая бумага или ушедшая — делистинг, приостановка):
+        # дельта не умеет ни добавить, ни убрать тикер
+        or set(tickers) != tail.index.keys()
+    )
+    if key:
+        frame = HeatFrame(board=board, ts=ts, is_key=True, size=len(tickers), data=_pack_key(tickers, last, pct))
+        state = FrameState(board, ts, list(tickers), last, pct)
+        new_tail = (state, ts, 0, {t: i for i, t in enumerate(tickers)})
+    else:
+        pos = np.array([tail.index[t] for t in tickers], dtype=np.intp)
+        changed = ~(_same(tail.state.last[pos], last) & _same(tail.state.pct[pos], pct))
+        if not changed.any():
+            return None
+        idx = pos[changed]
+        frame = HeatFrame(board=board, ts=ts, size=len(idx), data=_pack_delta(idx, last[changed], pct[changed]))
+        s_last, s_pct = tail.state.last.copy(), tail.state.pct.copy()
+        s_last[idx], s_pct[idx] = last[changed], pct[changed]
+        state = FrameState(board, ts, tail.state.tickers, s_last, s_pct)
+        new_tail = (state, tail.key_ts, tail.deltas + 1, tail.index)
+
+    try:
+        with transaction.atomic():
+            frame.save()
+    except IntegrityError:
+        logger.info("Frame %s %s already recorded", board, ts)
+        return None
+    _tails[board] = _Tail(frame.pk, *new_tail)
+    return frame
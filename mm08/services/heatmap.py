@@ -2,12 +2,17 @@
 from __future__ import annotations
 
 import datetime as dt
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 
-import requests
 from django.db import transaction
 
-from mm08.models import Instrument, HeatSnapshot, HeatTile
+from mm08.models import HeatSnapshot, HeatTile
+from mm08.services.instrument_sync import sync_instruments
+from mm08.services.board_reference import board_reference
+from mm08.services.heat_frames import record_board
+from mm08.services.heatmap_fetcher import PCT_COLUMNS, board_marketdata
+from mm08.services.iss_client import Columns, nan_to_none
+from mm08.services.snapshot_cache import bump_heatmap_version, touch_snapshot
 from django.utils import timezone
 
 
@@ -20,67 +25,36 @@ BOARD_MAP: Dict[str, Tuple[str, str]] = {
     # при необходимости добавляйте другие доски
 }
 
-ISS_BASE = "https://iss.moex.com/iss"
+# Проекция колонок: тянем только то, что реально кладём в снимок (LAST и процент).
+# Справка (SHORTNAME, BOARDID) — из суточного кэша board_reference, с ISS — только marketdata
+MD_COLUMNS = PCT_COLUMNS
 
 
-def _iss_board_url(board: str) -> str:
-    engine, market = BOARD_MAP[board]
-    # В marketdata есть LAST, LASTTOPREVPRICE, CHANGE и т.д.
-    return (
-        f"{ISS_BASE}/engines/{engine}/markets/{market}/boards/{board}/"
-        f"securities.json?iss.meta=off&iss.only=securities,marketdata"
-    )
-
-
-def _fetch_board_data(board: str) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+def _fetch_board_data(board: str) -> Tuple[Dict[str, dict], Dict[str, dict], Columns]:
     """
-    Тянем секции `securities` и `marketdata` и раскладываем их в словари по SECID.
-    Возвращаем (securities_by_secid, marketdata_by_secid)
+    Тянем `marketdata` доски и раскладываем по SECID вместе со справкой `securities`.
+    Возвращаем (securities_by_secid, marketdata_by_secid, колонки marketdata для кадра ряда)
     """
-    url = _iss_board_url(board)
-    resp = requests.get(url, timeout=20)
-    resp.raise_for_status()
-    data = resp.json()
-
-    # Парсим securities
-    sec_cols = data["securities"]["columns"]
-    sec_pos = {c: i for i, c in enumerate(sec_cols)}
-    securities = {}
-    for row in data["securities"]["data"]:
-        secid = row[sec_pos.get("SECID")]
-        if not secid:
-            continue
-        securities[secid] = {
+    engine, market = BOARD_MAP[board]
+    # процент — общей функцией change_pct_columns, как у котировок и load_heatmap
+    md = board_marketdata(engine, market, board, MD_COLUMNS)
+    marketdata = {
+        secid: {"last": last, "change_pct": change_pct}
+        for secid, last, change_pct in zip(md["SECID"].tolist(), nan_to_none(md["LAST"]), nan_to_none(md["CHANGE_PCT"]))
+        if secid
+    }
+
+    # Справка по бумагам — из кэша (ISS — раз в день или при новой бумаге)
+    securities = {
+        secid: {
             "secid": secid,
-            "shortname": row[sec_pos.get("SHORTNAME")],
-            "board": row[sec_pos.get("BOARDID")] or board,
+            "shortname": ref.get("SHORTNAME"),
+            "board": ref.get("BOARDID") or board,
         }
+        for secid, ref in board_reference(engine, market, board, require=marketdata).items()
+    }
 
-    # Парсим marketdata
-    md_cols = data["marketdata"]["columns"]
-    md_pos = {c: i for i, c in enumerate(md_cols)}
-    marketdata = {}
-    for row in data["marketdata"]["data"]:
-        secid = row[md_pos.get("SECID")]
-        if not secid:
-            continue
-        last = row[md_pos.get("LAST")]
-        # LASTTOPREVPRICE у акций — это отношение LAST к PREVPRICE в %
-        # Преобразуем к "изменение, %" (т.е. -1.25, +2.10 и т.д.)
-        last_to_prev_pct = row[md_pos.get("LASTTOPREVPRICE")]
-        change_pct = None
-        if last_to_prev_pct is not None:
-            try:
-                change_pct = float(last_to_prev_pct) - 100.0
-            except Exception:
-                change_pct = None
-
-        marketdata[secid] = {
-            "last": last,
-            "change_pct": change_pct,
-        }
-
-    return securities, marketdata
+    return securities, marketdata, md
 
 
 # --- Публичный API ------------------------------------------------------------
@@ -90,9 +64,13 @@ def build_snapshot(
     label: str = "fast",
     date: Optional[str] = None,
     replace: bool = True,
+    progress: Optional[Callable[[int, str], None]] = None,
 ) -> Tuple[HeatSnapshot, bool]:
     """
-    Собирает снимок теплокарты: тянет котировки ISS, апсертит инструменты и плитки.
+    Собирает снимок теплокарты: тянет котировки ISS, пакетно апсертит инструменты и плитки.
+    Сегодняшняя сборка заодно дописывает кадр во внутридневной ряд доски (HeatFrame),
+    так что перезапись плиток историю не теряет.
+    Число SQL-запросов не зависит от размера доски.
 
     Parameters
     ----------
@@ -104,6 +82,8 @@ def build_snapshot(
         Явная дата снимка в формате YYYY-MM-DD; по умолчанию сегодня.
     replace : bool, optional
         Если True и снимок существует — перезаполняем плитки. По умолчанию True.
+    progress : Optional[Callable[[int, str], None]], optional
+        Отчёт о ходе работы (процент, этап) — для фоновых задач.
 
     Returns
     -------
@@ -120,7 +100,11 @@ def build_snapshot(
         snap_date = dt.date.today()
 
     # Тянем данные с ISS
-    securities, marketdata = _fetch_board_data(board)
+    if progress:
+        progress(10, "fetch")
+    securities, marketdata, columns = _fetch_board_data(board)
+    if progress:
+        progress(50, "write")
 
     with transaction.atomic():
         # Снапшот
@@ -134,42 +118,41 @@ def build_snapshot(
         if not created and replace:
             HeatTile.objects.filter(snapshot=snapshot).delete()
 
-        # Апсерты инструментов и создание плиток
+        # Инструменты: один SELECT + пакетный апсерт только новых/изменившихся
+        engine = BOARD_MAP[board][0]
+        sync_instruments(
+            {
+                secid: {"shortname": sec.get("shortname") or secid, "engine": engine}
+                for secid, sec in securities.items()
+            },
+            update_fields=("shortname", "engine"),
+            create_defaults={"board": board},
+        )
+
+        # Плитки
         tiles: List[HeatTile] = []
         for secid, sec in securities.items():
             md = marketdata.get(secid, {})
             last = md.get("last")
-            change_pct = md.get("change_pct")
-
-            inst, _ = Instrument.objects.update_or_create(
-                board=board,
-                ticker=secid,
-                defaults={
-                    "shortname": sec.get("shortname") or secid,
-                    "engine": BOARD_MAP[board][0],
-                },
-            )
-
-            # безопасное значение для last: модель NOT NULL → подставим 0, если None
-            last_safe = last if last is not None else 0
 
             tiles.append(
                 HeatTile(
                     snapshot=snapshot,
-                    ticker=inst.ticker,
-                    shortname=inst.shortname,
-                    last=last_safe,             # ← используем безопасное значение
-                    change_pct=change_pct,      # может быть None — модель это допускает
+                    ticker=secid,
+                    shortname=sec.get("shortname") or secid,
+                    # безопасное значение для last: модель NOT NULL → подставим 0, если None
+                    last=last if last is not None else 0,
+                    change_pct=md.get("change_pct"),  # может быть None — модель это допускает
                 )
             )
 
-
         if tiles:
             HeatTile.objects.bulk_create(tiles, batch_size=500)
+        if snap_date == dt.date.today():
+            record_board(board, columns)  # кадр ряда — из тех же колонок, что у поллера
+        if not created:
+            touch_snapshot(snapshot)  # плитки переписаны — новая версия для ETag
+        bump_heatmap_version(board)  # кэш страниц теплокарты доски — устарел
 
     return snapshot, created
 
-
-
-
-
@@ -1,112 +1,85 @@
 # mm08/services/heatmap_fetch.py
 from __future__ import annotations
-import requests
-from decimal import Decimal, InvalidOperation
+from typing import Sequence
 
-def _to_decimal(x):
-    if x in (None, "", "-"):
-        return None
-    try:
-        return Decimal(str(x))
-    except InvalidOperation:
-        return None
+import numpy as np
 
-def _rows_from_table(tbl) -> list[dict]:
-    if not tbl:
-        return []
-    if isinstance(tbl, list):
-        if tbl and isinstance(tbl[0], dict):
-            return tbl
-        return []
-    cols = tbl.get("columns") or []
-    data = tbl.get("data") or []
-    out = []
-    for row in data:
-        d = {}
-        for i, col in enumerate(cols):
-            if i < len(row):
-                d[col] = row[i]
-        out.append(d)
-    return out
+from .board_reference import board_reference, fetch_marketdata
+from .iss_client import Columns, iss_columns, nan_to_none
 
-def _resolve_path(board: str) -> tuple[str, str, str]:
-    b = (board or "").upper()
-    if b.startswith("RF"):  # FORTS
-        return (
-            "futures",
-            "forts",
-            "https://iss.moex.com/iss/engines/futures/markets/forts/boards/{board}/securities.json",
-        )
-    return (
-        "stock",
-        "shares",
-        "https://iss.moex.com/iss/engines/stock/markets/shares/boards/{board}/securities.json",
-    )
+# SHORTNAME/LOTSIZE — из суточной справки доски (board_reference), с ISS — только marketdata
+# NB: LASTTOPREVPRICE — запасной источник процента, если нет LASTCHANGEPRC
+MD_COLUMNS = (
+    "SECID", "LAST", "OPEN", "PREVPRICE", "CHANGE", "LASTCHANGEPRC", "LASTTOPREVPRICE",
+    "VALTODAY", "VOLTODAY", "NUMTRADES",
+)
+# Минимум marketdata для LAST и процента изменения (change_pct_columns) — для теплокарты и страниц доски
+PCT_COLUMNS = ("SECID", "LAST", "PREVPRICE", "CHANGE", "LASTCHANGEPRC", "LASTTOPREVPRICE")
 
-def fetch_board(board: str) -> tuple[str, str, list[dict]]:
+
+def change_pct_columns(md: Columns) -> np.ndarray:
     """
-    Возвращает (engine, market, rows) для выбранного борда.
-    rows: [{ticker, shortname, lot_size, last, change_pct, turnover, volume}, ...]
+    Процент изменения по колонкам marketdata (NaN — неизвестен), векторно по всей доске.
+    Сначала готовый LASTCHANGEPRC, затем LASTTOPREVPRICE (в ISS это уже изменение
+    к цене прошлого дня в %: -1.25, 2.10), затем CHANGE/PREVPRICE, затем LAST/PREVPRICE.
+    Это единственное место, где читается LASTTOPREVPRICE.
     """
-    engine, market, URL = _resolve_path(board)
+    missing = np.full(len(md["SECID"]), np.nan)
+    last, prev, chg, ltp = (md.get(name, missing) for name in ("LAST", "PREVPRICE", "CHANGE", "LASTTOPREVPRICE"))
+    prev_ok = ~np.isnan(prev) & (prev != 0)
 
-    SEC_COLS = "SECID,SHORTNAME,LOTSIZE"
-    MD_COLS = "SECID,LAST,PREVPRICE,CHANGE,LASTCHANGEPRC,VALTODAY,VOLTODAY,NUMTRADES"
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = md.get("LASTCHANGEPRC", missing).copy()
+        todo = np.isnan(pct)
+        pct[todo] = ltp[todo]
+        todo = np.isnan(pct) & ~np.isnan(chg) & prev_ok
+        pct[todo] = chg[todo] / prev[todo] * 100
+        todo = np.isnan(pct) & ~np.isnan(last) & prev_ok
+        pct[todo] = (last[todo] - prev[todo]) / prev[todo] * 100
+    return pct
 
-    params = {
-        "iss.only": "securities,marketdata",
-        "iss.meta": "off",
-        "iss.json": "extended",
-        "securities.columns": SEC_COLS,
-        "marketdata.columns": MD_COLS,
-    }
 
-    r = requests.get(URL.format(board=board), params=params, timeout=20)
-    r.raise_for_status()
-    raw = r.json()
+def board_marketdata(engine: str, market: str, board: str, columns: Sequence[str] = MD_COLUMNS) -> Columns:
+    """marketdata доски колонками (SECID — текст, остальное — float64) + CHANGE_PCT."""
+    md = iss_columns(fetch_marketdata(engine, market, board, columns), text=("SECID",), numeric=columns[1:])
+    md["CHANGE_PCT"] = change_pct_columns(md)
+    return md
 
-    sec_tbl = raw.get("securities") if isinstance(raw, dict) else None
-    md_tbl = raw.get("marketdata") if isinstance(raw, dict) else None
-    if sec_tbl is None or md_tbl is None and isinstance(raw, list):
-        for part in raw:
-            if isinstance(part, dict):
-                sec_tbl = sec_tbl or part.get("securities")
-                md_tbl = md_tbl or part.get("marketdata")
 
-    sec_rows = _rows_from_table(sec_tbl)
-    md_rows = _rows_from_table(md_tbl)
-    md_by = {row.get("SECID"): row for row in md_rows if isinstance(row, dict)}
-
-    rows = []
-    for s in sec_rows:
-        secid = s.get("SECID")
-        if not secid:
-            continue
-        m = md_by.get(secid) or {}
+def _resolve_path(board: str) -> tuple[str, str]:
+    b = (board or "").upper()
+    if b.startswith("RF"):  # FORTS
+        return "futures", "forts"
+    return "stock", "shares"
 
-        last = _to_decimal(m.get("LAST"))
-        prev = _to_decimal(m.get("PREVPRICE"))
-        chg = _to_decimal(m.get("CHANGE"))
-        ready_pct = _to_decimal(m.get("LASTCHANGEPRC"))
+def fetch_board(board: str) -> tuple[str, str, list[dict]]:
+    """
+    Возвращает (engine, market, rows) для выбранного борда.
+    rows: [{ticker, shortname, lot_size, last, change_pct, turnover, volume}, ...]
+    """
+    engine, market = _resolve_path(board)
 
-        change_pct = ready_pct
-        if change_pct is None:
-            if chg is not None and prev not in (None, Decimal("0")):
-                change_pct = (chg / prev) * Decimal("100")
-            elif last is not None and prev not in (None, Decimal("0")):
-                change_pct = ((last - prev) / prev) * Decimal("100")
+    md = board_marketdata(engine, market, board)
+    at = {secid: i for i, secid in enumerate(md["SECID"].tolist()) if secid}
 
-        turnover = m.get("VALTODAY") or m.get("VOLTODAY") or 0
-        volume = m.get("NUMTRADES") or 0
+    # вся арифметика — колонками; в цикле только сборка строк
+    last = np.nan_to_num(md["LAST"], nan=0.0).tolist()
+    change_pct = nan_to_none(md["CHANGE_PCT"])
+    turnover = np.where(np.nan_to_num(md["VALTODAY"]) != 0, md["VALTODAY"], md["VOLTODAY"])
+    turnover = np.nan_to_num(turnover).astype(np.int64).tolist()
+    volume = np.nan_to_num(md["NUMTRADES"]).astype(np.int64).tolist()
 
+    rows = []
+    for secid, s in board_reference(engine, market, board, require=at).items():
+        i = at.get(secid)
         rows.append({
             "ticker": secid,
             "shortname": s.get("SHORTNAME") or "",
             "lot_size": int(s.get("LOTSIZE") or 1),
-            "last": float(last) if last is not None else 0.0,
-            "change_pct": float(change_pct) if change_pct is not None else None,
-            "turnover": int(turnover or 0),
-            "volume": int(volume or 0),
+            "last": last[i] if i is not None else 0.0,
+            "change_pct": change_pct[i] if i is not None else None,
+            "turnover": turnover[i] if i is not None else 0,
+            "volume": volume[i] if i is not None else 0,
         })
 
     return engine, market, rows
@@ -0,0 +1,91 @@
+# Project/mm08/services/ingest_bench.py
+from __future__ import annotations
+import io
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from mm08.models import HeatTile, Instrument
+from .bench import rolled_back
+from .heatmap import build_snapshot
+from .iss_cassette import use_cassette
+from .iss_client import fetch_tqbr_all
+
+
+def _stage_fetch_tqbr_all() -> int:
+    return len(fetch_tqbr_all())
+
+
+def _stage_build_snapshot() -> int:
+    snapshot, _ = build_snapshot(board="TQBR", label="bench", date=None, replace=True)
+    return snapshot.tiles.count()
+
+
+def _stage_load_heatmap() -> int:
+    call_command("load_heatmap", "--board", "TQBR", "--label", "bench", stdout=io.StringIO())
+    return HeatTile.objects.filter(snapshot__label="bench").count()
+
+
+def _stage_load_moex() -> int:
+    call_command(
+        "load_moex", "--engine", "stock", "--market", "shares", "--board", "TQBR",
+        stdout=io.StringIO(),
+    )
+    return Instrument.objects.filter(board="TQBR").count()
+
+
+# Стадии в порядке запуска: имя → функция, возвращающая число строк на выходе
+STAGES: Dict[str, Callable[[], int]] = {
+    "fetch_tqbr_all": _stage_fetch_tqbr_all,
+    "build_snapshot": _stage_build_snapshot,
+    "load_heatmap": _stage_load_heatmap,
+    "load_moex": _stage_load_moex,
+}
+
+
+def measure(name: str, fn: Callable[[], int], *, keep: bool = False) -> Dict[str, Union[str, int, float]]:
+    """
+    Замер одной стадии: wall time, число SQL-запросов и пик памяти (tracemalloc).
+    По умолчанию всё, что стадия записала в БД, откатывается.
+    """
+    rows = 0
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            with rolled_back(keep):
+                rows = fn()
+        wall = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "stage": name,
+        "rows": rows,
+        "wall_ms": round(wall * 1000, 2),
+        "queries": len(queries),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_stages(
+    cassette: Union[str, Path],
+    *,
+    stages: Optional[Sequence[str]] = None,
+    record: bool = False,
+    keep: bool = False,
+) -> List[Dict[str, Union[str, int, float]]]:
+    """Прогнать стадии загрузки на записанных ответах ISS (record=True — дописать недостающие)."""
+    names = list(stages or STAGES.keys())
+    unknown = [n for n in names if n not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(unknown)}")
+
+    with use_cassette(cassette, record=record):
+        return [measure(name, STAGES[name], keep=keep) for name in names]
@@ -0,0 +1,319 @@
+# Project/mm08/services/instrument_search.py
+from __future__ import annotations
+import heapq
+import re
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from mm08.models import Instrument
+from mm08.services.moex_catalog import get_catalog_index
+
+# Поиск для type-ahead: индекс в памяти процесса по ticker / secid / shortname.
+# Префикс — бисекция по отсортированному списку токенов, подстрока — пересечение
+# биграмм, опечатки — кандидаты по биграммам на своих позициях + ограниченное расстояние Дамерау.
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Ранги совпадений (меньше — выше в выдаче)
+EXACT, CODE_PREFIX, NAME_PREFIX, SUBSTRING, FUZZY = range(5)
+
+_WORD_RE = re.compile(r"[0-9A-ZА-Я]+")
+
+# Версия таблицы Instrument для всех воркеров (только кэш, как heatmap_version)
+_VERSION_KEY = "instruments:search:ver"
+# Опечатки ищем по биграммам на своих позициях в начале слов: дальше ввод не доходит
+FUZZY_SPAN = 12
+# Сколько держать индекс каталога ISS, не сверяясь с кэшем
+CATALOG_RECHECK_SEC = 60
+
+
+def normalize(text: str) -> str:
+    return " ".join((text or "").upper().replace("Ё", "Е").split())
+
+
+def _grams(text: str) -> Set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _prefix_distance(q: str, token: str, limit: int) -> int:
+    """
+    Расстояние Дамерау–Левенштейна (OSA) от q до ближайшего начала token
+    (ввод ещё не закончен: «SBRE» ≈ «SBERBANK»); всё, что больше limit, — limit + 1.
+    """
+    n = len(q)
+    b = token[:n + limit]
+    if b.startswith(q):
+        return 0
+    if limit == 1:
+        # одна правка — сравнение срезами после общего префикса, без таблицы
+        p = 0
+        while p < n and p < len(b) and q[p] == b[p]:
+            p += 1
+        if (
+            q[p + 1:] == b[p + 1:n]                                    # замена
+            or q[p + 1:] == b[p:n - 1]                                 # лишняя буква
+            or q[p:] == b[p + 1:n + 1]                                 # пропущенная буква
+            or q[p:p + 2] == b[p + 1:p + 2] + b[p:p + 1] and q[p + 2:] == b[p + 2:n]  # перестановка
+        ):
+            return 1
+        return 2
+    if len(b) < n - limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, n + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = q[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and q[i - 1] == b[j - 2] and q[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return min(min(prev[max(0, n - limit):]), limit + 1)
+
+
+def _max_typos(q: str) -> int:
+    return 0 if len(q) < 3 else 1 if len(q) < 6 else 2
+
+
+class _Doc:
+    __slots__ = ("ticker", "codes", "words", "terms", "texts", "grams", "spots", "payload", "stamp")
+
+    def __init__(self, ticker: str, secid: str, shortname: str, payload: Any, stamp: Any):
+        self.ticker = normalize(ticker)
+        self.codes = {c for c in (self.ticker, normalize(secid)) if c}
+        name = normalize(shortname)
+        # terms — отдельные слова (для опечаток), words — ещё и имя целиком (префикс «САМОЛЕТ ГК»)
+        self.terms = self.codes | set(_WORD_RE.findall(name))
+        self.words = self.terms - self.codes | ({name} if name else set())
+        self.texts = [*self.codes, *([name] if name else [])]
+        self.grams = set().union(*(_grams(t) for t in self.texts)) if self.texts else set()
+        self.spots = {(i, t[i:i + 2]) for t in self.terms for i in range(min(len(t), FUZZY_SPAN) - 1)}
+        self.payload = payload
+        self.stamp = stamp
+
+
+def _prefixed(tokens: List[Tuple[str, Hashable]], prefix: str) -> Iterator[Tuple[str, Hashable]]:
+    """(токен, ключ) с данным префиксом — бисекцией по отсортированному списку."""
+    i = bisect_left(tokens, (prefix,))
+    while i < len(tokens) and tokens[i][0].startswith(prefix):
+        yield tokens[i]
+        i += 1
+
+
+class SearchIndex:
+    """
+    Индекс поиска инструментов. Обновляется поштучно (upsert/remove) или сверкой
+    с полным набором (sync) — меняются только изменившиеся записи.
+    """
+
+    def __init__(self) -> None:
+        self._docs: Dict[Hashable, _Doc] = {}
+        # (токен, ключ), отсортированы: коды (ticker/secid) отдельно от слов имени
+        self._codes: List[Tuple[str, Hashable]] = []
+        self._words: List[Tuple[str, Hashable]] = []
+        self._grams: Dict[str, Set[Hashable]] = {}
+        self._spots: Dict[Tuple[int, str], Set[Hashable]] = {}  # (позиция, биграмма) в начале слов
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def stamps(self) -> Dict[Hashable, Any]:
+        return {key: doc.stamp for key, doc in self._docs.items()}
+
+    def upsert(self, key: Hashable, ticker: str, secid: str, shortname: str, payload: Any, stamp: Any = None) -> None:
+        self.remove(key)
+        doc = _Doc(ticker, secid, shortname, payload, stamp)
+        self._docs[key] = doc
+        for tokens, own in ((self._codes, doc.codes), (self._words, doc.words)):
+            for token in own:
+                insort(tokens, (token, key))
+        for g in doc.grams:
+            self._grams.setdefault(g, set()).add(key)
+        for spot in doc.spots:
+            self._spots.setdefault(spot, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        for tokens, own in ((self._codes, doc.codes), (self._words, doc.words)):
+            for token in own:
+                i = bisect_left(tokens, (token, key))
+                if i < len(tokens) and tokens[i] == (token, key):
+                    del tokens[i]
+        for postings, own in ((self._grams, doc.grams), (self._spots, doc.spots)):
+            for g in own:
+                keys = postings.get(g)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del postings[g]
+
+    def sync(self, rows: Mapping[Hashable, Tuple[str, str, str, Any, Any]]) -> int:
+        """
+        Свести индекс к rows {key: (ticker, secid, shortname, payload, stamp)}:
+        удалить пропавшие, переиндексировать только записи с другим stamp. Возвращает число изменений.
+        """
+        changed = 0
+        for key in [k for k in self._docs if k not in rows]:
+            self.remove(key)
+            changed += 1
+        for key, (ticker, secid, shortname, payload, stamp) in rows.items():
+            doc = self._docs.get(key)
+            if doc is None or doc.stamp != stamp:
+                self.upsert(key, ticker, secid, shortname, payload, stamp)
+                changed += 1
+        return changed
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[Any]:
+        """
+        Payload'ы лучших совпадений: точный код → префикс кода → префикс слова имени →
+        подстрока → опечатка. Коды ранжируются полностью (короче тикер — выше); следующие
+        ярусы добираются, только пока не набран limit, в порядке индекса.
+        """
+        q = normalize(query)
+        if not q:
+            return []
+        best: Dict[Hashable, Tuple[int, int]] = {}
+
+        for token, key in _prefixed(self._codes, q):
+            rank = EXACT if token == q else CODE_PREFIX
+            if rank < best.get(key, (FUZZY + 1,))[0]:
+                best[key] = (rank, 0)
+
+        if len(best) < limit:
+            for _, key in _prefixed(self._words, q):
+                best.setdefault(key, (NAME_PREFIX, 0))
+                if len(best) >= limit:
+                    break
+
+        qgrams = _grams(q)
+        if qgrams and len(best) < limit:
+            sets = sorted((self._grams.get(g, set()) for g in qgrams), key=len)
+            for key in sets[0].intersection(*sets[1:]):
+                if key not in best and any(q in t for t in self._docs[key].texts):
+                    best[key] = (SUBSTRING, 0)
+                    if len(best) >= limit:
+                        break
+
+        # опечатки — только когда точных совпадений нет: это самый дорогой шаг
+        typos = _max_typos(q)
+        if typos and not best:
+            # перестановка соседних букв в коротком запросе съедает все биграммы — ищем её префиксом
+            for j in range(len(q) - 1):
+                swapped = q[:j] + q[j + 1] + q[j] + q[j + 2:]
+                for tokens in (self._codes, self._words):
+                    for _, key in _prefixed(tokens, swapped):
+                        best[key] = (FUZZY, 1)
+            # кандидаты — слова с той же биграммой не дальше typos позиций от её места в запросе
+            shared: Counter = Counter()
+            for j in range(min(len(q), FUZZY_SPAN) - 1):
+                g = q[j:j + 2]
+                shared.update(set().union(*(
+                    self._spots.get((p, g), ()) for p in range(max(0, j - typos), j + typos + 1)
+                )))
+            need = max(1, min(len(q), FUZZY_SPAN) - 1 - 2 * typos)
+            for key, n in shared.items():
+                if n < need or key in best:
+                    continue
+                dist = min(_prefix_distance(q, t, typos) for t in self._docs[key].terms)
+                if dist <= typos:
+                    best[key] = (FUZZY, dist)
+
+        ranked = heapq.nsmallest(limit, best, key=lambda k: (*best[k], len(self._docs[k].ticker), self._docs[k].ticker))
+        return [self._docs[k].payload for k in ranked]
+
+
+# --- Локальная таблица Instrument ----------------------------------------------
+
+_local = SearchIndex()
+_local_version: Optional[int] = None
+
+
+def _version() -> int:
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        cache.add(_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(_VERSION_KEY)
+    return version
+
+
+def bump_instrument_index() -> None:
+    """Таблица Instrument изменилась: каждый процесс досинхронизирует свой индекс при следующем поиске."""
+    def bump() -> None:
+        try:
+            cache.incr(_VERSION_KEY)
+        except ValueError:
+            cache.set(_VERSION_KEY, time.time_ns(), timeout=None)
+    transaction.on_commit(bump)
+
+
+def _refresh_local() -> None:
+    """Инкрементальная сверка с БД: (id, updated_at) всех строк, полные поля — только у изменившихся."""
+    stamps = dict(Instrument.objects.values_list("id", "updated_at"))
+    known = _local.stamps()
+    for pk in set(known) - set(stamps):
+        _local.remove(pk)
+    changed = [pk for pk, stamp in stamps.items() if known.get(pk) != stamp]
+    for pk, ticker, secid, shortname, updated_at in (
+        Instrument.objects.filter(pk__in=changed).values_list("id", "ticker", "secid", "shortname", "updated_at")
+    ):
+        _local.upsert(pk, ticker, secid, shortname, pk, updated_at)
+
+
+def search_instruments(query: str, limit: int = DEFAULT_LIMIT) -> List[int]:
+    """id инструментов по релевантности. БД трогаем, только если версия таблицы сдвинулась."""
+    global _local_version
+    version = _version()
+    if version != _local_version:
+        _refresh_local()
+        _local_version = version
+    return _local.search(query, limit)
+
+
+def on_instrument_changed(sender, instance: Instrument, **kwargs) -> None:
+    """post_save / post_delete Instrument (подключается в Mm08Config.ready)."""
+    bump_instrument_index()
+
+
+# --- Каталоги ISS --------------------------------------------------------------
+
+_catalogs: Dict[Tuple[str, str, str], Tuple[float, SearchIndex]] = {}
+
+
+def search_catalog(engine: str, market: str, board: str, query: str, limit: int = DEFAULT_LIMIT) -> List[Dict[str, str]]:
+    """[{secid, label}] из закэшированного каталога доски (get_catalog_index) по релевантности."""
+    board_key = (engine, market, board)
+    checked, index = _catalogs.get(board_key, (0.0, None))
+    if index is None or time.monotonic() - checked > CATALOG_RECHECK_SEC:
+        index = index or SearchIndex()
+        catalog = get_catalog_index(engine, market, board)
+        if catalog:  # сбой ISS → пустой индекс; старый не затираем
+            index.sync({
+                secid: (secid, info.get("secid") or secid, info.get("shortname") or "",
+                        {"secid": secid, "label": info["label"]}, info["label"])
+                for secid, info in catalog.items()
+            })
+        _catalogs[board_key] = (time.monotonic(), index)
+    return index.search(query, limit)
+
+
+def clamp_limit(raw: Optional[str], default: int = DEFAULT_LIMIT) -> int:
+    try:
+        return max(1, min(int(raw), MAX_LIMIT)) if raw else default
+    except ValueError:
+        return default
+
+
+def iter_ranked(objects: Mapping[Hashable, Any], keys: Iterable[Hashable]) -> List[Any]:
+    """Объекты in_bulk в порядке ранжирования (пропавшие между поиском и выборкой — пропускаем)."""
+    return [objects[k] for k in keys if k in objects]
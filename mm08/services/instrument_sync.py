@@ -0,0 +1,72 @@
+# Project/mm08/services/instrument_sync.py
+from __future__ import annotations
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from mm08.models import Instrument
+from mm08.services.instrument_search import bump_instrument_index
+
+
+def sync_instruments(
+    rows: Mapping[str, Mapping[str, Any]],
+    update_fields: Sequence[str],
+    *,
+    create_defaults: Optional[Mapping[str, Any]] = None,
+    batch_size: int = 500,
+) -> Dict[str, int]:
+    """
+    Пакетный апсерт инструментов по ticker вместо update_or_create на каждую бумагу.
+
+    Один SELECT по всем тикерам → сравнение полей в памяти → один
+    INSERT ... ON CONFLICT(ticker) DO UPDATE только для новых и изменившихся строк.
+
+    Parameters
+    ----------
+    rows : Mapping[str, Mapping[str, Any]]
+        {ticker: {поле: значение}} — значения полей из update_fields (и, опционально, других).
+    update_fields : Sequence[str]
+        Поля, которые сверяем и обновляем у существующих инструментов.
+    create_defaults : Optional[Mapping[str, Any]]
+        Доп. значения только для новых инструментов (например, board).
+    batch_size : int
+        Размер пачки для bulk_create.
+
+    Returns
+    -------
+    Dict[str, int]
+        {"created": ..., "updated": ..., "unchanged": ...}
+    """
+    stats = {"created": 0, "updated": 0, "unchanged": 0}
+    if not rows:
+        return stats
+
+    fields = list(update_fields)
+    existing = {
+        row["ticker"]: row
+        for row in Instrument.objects.filter(ticker__in=list(rows)).values("ticker", *fields)
+    }
+
+    to_write: List[Instrument] = []
+    for ticker, values in rows.items():
+        current = existing.get(ticker)
+        if current is None:
+            data = {**(create_defaults or {}), **values}
+            to_write.append(Instrument(ticker=ticker, **data))
+            stats["created"] += 1
+            continue
+        if all(current[f] == values.get(f, current[f]) for f in fields):
+            stats["unchanged"] += 1
+            continue
+        # существующий инструмент: подставляем только сверяемые поля, остальное не трогаем
+        to_write.append(Instrument(ticker=ticker, **{f: values.get(f, current[f]) for f in fields}))
+        stats["updated"] += 1
+
+    if to_write:
+        Instrument.objects.bulk_create(
+            to_write,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["ticker"],
+            update_fields=[*fields, "updated_at"],
+        )
+        bump_instrument_index()  # bulk_create не шлёт post_save
+    return stats
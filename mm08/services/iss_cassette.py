@@ -0,0 +1,92 @@
+# Project/mm08/services/iss_cassette.py
+from __future__ import annotations
+import json
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Mapping, Optional, Union
+from urllib.parse import urlencode
+
+from .iss_client import IssTransport, RequestsTransport, Timeout, get_client
+
+
+class CassetteMiss(LookupError):
+    """В кассете нет записи для запрошенного URL/параметров (режим replay)."""
+
+
+class CassetteTransport:
+    """
+    Транспорт «запись/воспроизведение» для IssClient.
+
+    record=False — отдаём ответы только из файла (сеть не трогаем, промах → CassetteMiss);
+    record=True  — недостающие ответы берём у inner-транспорта и дописываем в кассету.
+    Ключ записи — URL + отсортированные параметры, так что порядок запросов не важен
+    (в т.ч. при параллельной выкачке страниц).
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        *,
+        record: bool = False,
+        inner: Optional[IssTransport] = None,
+    ):
+        self.path = Path(path)
+        self.record = record
+        self.inner = inner
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.interactions: Dict[str, Any] = {}
+        if self.path.exists():
+            with self.path.open(encoding="utf-8") as fh:
+                self.interactions = json.load(fh).get("interactions", {})
+
+    @staticmethod
+    def key(url: str, params: Optional[Mapping[str, Any]]) -> str:
+        query = urlencode(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        return f"{url}?{query}" if query else url
+
+    def get(self, url: str, params: Optional[Mapping[str, str]], timeout: Timeout) -> Any:
+        key = self.key(url, params)
+        with self._lock:
+            if key in self.interactions:
+                return self.interactions[key]
+        if not self.record:
+            raise CassetteMiss(f"Нет записи в кассете {self.path.name}: {key}")
+
+        if self.inner is None:
+            self.inner = RequestsTransport()
+        js = self.inner.get(url, params, timeout)
+        with self._lock:
+            self.interactions[key] = js
+            self._dirty = True
+        return js
+
+    def save(self) -> None:
+        """Сбросить новые записи на диск (в режиме replay — ничего не делает)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("w", encoding="utf-8") as fh:
+                json.dump({"interactions": self.interactions}, fh, ensure_ascii=False, sort_keys=True)
+            self._dirty = False
+
+
+@contextmanager
+def use_cassette(
+    path: Union[str, Path],
+    *,
+    record: bool = False,
+    inner: Optional[IssTransport] = None,
+) -> Iterator[CassetteTransport]:
+    """Временно подключить кассету к общему клиенту ISS; на выходе — сохранить и вернуть транспорт."""
+    client = get_client()
+    previous = client.transport
+    cassette = CassetteTransport(path, record=record, inner=inner or previous)
+    client.transport = cassette
+    try:
+        yield cassette
+    finally:
+        client.transport = previous
+        cassette.save()
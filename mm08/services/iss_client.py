@@ -1,9 +1,12 @@
 # Project/mm08/services/iss_client.py
 from __future__ import annotations
-import json
-import urllib.request
-from typing import Dict, List, Tuple, Optional
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+from typing import (
+    Any, Callable, Dict, Iterator, List, Mapping, Optional, Protocol, Sequence, Tuple, TypeVar, Union,
+)
+import numpy as np
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -13,156 +16,292 @@ DEFAULT_HEADERS = {
     "User-Agent": "MM-Training/1.0",
     "Accept": "application/json",
 }
-_session: Optional[requests.Session] = None
 
+# Единая политика для всех обращений к ISS
+Timeout = Union[float, Tuple[float, float]]
+DEFAULT_TIMEOUT: Tuple[float, float] = (3.0, 15.0)   # (connect, read)
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.3
+DEFAULT_POOL_SIZE = 16                               # keep-alive соединений на хост
+DEFAULT_MAX_WORKERS = 4                              # потолок параллельных страниц к ISS
 
-def _get_session() -> requests.Session:
-    global _session
-    if _session is None:
+T = TypeVar("T")
+
+
+# --- Транспорт ----------------------------------------------------------------
+
+class IssTransport(Protocol):
+    """Транспорт ISS: получает абсолютный URL и параметры, возвращает разобранный JSON."""
+
+    def get(self, url: str, params: Optional[Mapping[str, str]], timeout: Timeout) -> Any: ...
+
+
+class RequestsTransport:
+    """HTTP-транспорт на одном requests.Session: пул keep-alive соединений + ретраи."""
+
+    def __init__(
+        self,
+        *,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        pool_size: int = DEFAULT_POOL_SIZE,
+    ):
         s = requests.Session()
+        s.headers.update(DEFAULT_HEADERS)
         retry = Retry(
-            total=2,
-            backoff_factor=0.3,
+            total=retries,
+            backoff_factor=backoff,
             status_forcelist=[502, 503, 504],
             allowed_methods=["GET"],
         )
-        adapter = HTTPAdapter(max_retries=retry)
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
         s.mount("https://", adapter)
         s.mount("http://", adapter)
-        _session = s
-    return _session
-
-def _block(js: dict, name: str):
-    cols = js[name]["columns"]
-    rows = js[name]["data"]
-    idx = {c: i for i, c in enumerate(cols)}
-    return idx, rows
-
-def fetch_tqbr_all() -> List[dict]:
-    """Акции, доска TQBR (engine=stock, market=shares) — все страницы."""
-    start, acc = 0, []
-    while True:
-        js = _get_json(
-            "/engines/stock/markets/shares/boards/TQBR/securities.json",
-            params={"iss.meta": "off", "iss.only": "securities,marketdata", "start": str(start)},
-        )
-        s_idx, s_rows = _block(js, "securities")
-        m_idx, m_rows = _block(js, "marketdata")
-        md = {r[m_idx.get("SECID")]: r for r in m_rows if r[m_idx.get("SECID")]}
-
-        page = []
-        for r in s_rows:
-            secid = r[s_idx.get("SECID")]
-            if not secid or secid not in md:
-                continue
-            m = md[secid]
-
-            def g(row, idx, name, default=None):
-                i = idx.get(name)
-                return row[i] if i is not None else default
-
-            last = g(m, m_idx, "LAST")
-            ref = g(m, m_idx, "PREVPRICE") or g(m, m_idx, "OPEN")
-            change_pct = None
-            if last not in (None, 0) and ref not in (None, 0):
-                change_pct = (last - ref) / ref * 100.0
-
-            page.append({
-                "SECID": secid,
-                "SHORTNAME": g(r, s_idx, "SHORTNAME") or "",
-                "BOARDID": g(r, s_idx, "BOARDID"),
-                "LOTSIZE": g(r, s_idx, "LOTSIZE") or 1,
-                "LAST": last,
-                "OPEN": g(m, m_idx, "OPEN"),
-                "HIGH": g(m, m_idx, "HIGH"),
-                "LOW": g(m, m_idx, "LOW"),
-                "PREVPRICE": g(m, m_idx, "PREVPRICE"),
-                "VOLUME": g(m, m_idx, "VOLUME"),
-                "VALTODAY": g(m, m_idx, "VALTODAY"),
-                "CHANGE_PCT": change_pct,
-            })
-        if not page:
-            break
-        acc.extend(page)
-        start += 100
-    return acc
-
-
-def _get_json(path: str, params: Optional[Dict[str, str]] = None,
-              *, timeout: Tuple[float, float] = (3.0, 7.0)) -> dict:
-    """path может быть /relative или полным https://..."""
-    if path.startswith("http://") or path.startswith("https://"):
-        url = path
-    else:
-        url = f"{ISS_BASE.rstrip('/')}/{path.lstrip('/')}"
-    r = _get_session().get(url, params=params, timeout=timeout)
-    r.raise_for_status()
-    return r.json()
-
-
-def _block_to_rows(js: dict, block: str) -> Tuple[List[str], List[List]]:
-    cols = js[block]["columns"]
-    rows = js[block]["data"]
-    return cols, rows
-
-
-def fetch_board_page(engine: str, market: str, board: str, *, start: int = 0) -> Tuple[List[dict], int]:
+        self.session = s
+
+    def get(self, url: str, params: Optional[Mapping[str, str]], timeout: Timeout) -> Any:
+        r = self.session.get(url, params=params, timeout=timeout)
+        r.raise_for_status()
+        return r.json()
+
+
+# --- Разбор таблиц ISS ---------------------------------------------------------
+
+def iss_table(js: Any, name: str) -> Tuple[List[str], List[list]]:
     """
-    Возвращает кортеж: (строки-объединение securities+marketdata, total)
+    Достаём блок ISS как (columns, rows).
+    Поддерживает обычный формат {"block": {"columns": [...], "data": [[...]]}}
+    и iss.json=extended ([{charsetinfo}, {"block": [{...}, ...]}]).
     """
-    path = f"/engines/{engine}/markets/{market}/boards/{board}/securities.json"
-    js = _get_json(
-        path,
-        {
-            "iss.meta": "off",
-            # cursor НУЖЕН, чтобы знать total и корректно пагинировать
-            "iss.only": "securities,marketdata,securities.cursor",
-            "start": str(start),
-        },
-    )
+    tbl = None
+    if isinstance(js, dict):
+        tbl = js.get(name)
+    elif isinstance(js, list):
+        for part in js:
+            if isinstance(part, dict) and name in part:
+                tbl = part[name]
+                break
+
+    if not tbl:
+        return [], []
+    if isinstance(tbl, list):
+        # extended: список словарей — превращаем обратно в колонки/строки
+        if not isinstance(tbl[0], dict):
+            return [], []
+        cols = list(tbl[0].keys())
+        return cols, [[d.get(c) for c in cols] for d in tbl]
+    return list(tbl.get("columns") or []), list(tbl.get("data") or [])
+
+
+def iss_cursor(table: Tuple[List[str], List[list]], default_total: int) -> Tuple[int, Optional[int]]:
+    """
+    Разбор блока *.cursor → (total, pagesize).
+    Колонки у ISS: INDEX, TOTAL, PAGESIZE; если блока нет — (default_total, None).
+    """
+    cols, rows = table
+    if not rows or not rows[0]:
+        return default_total, None
+    row = rows[0]
+    total_i = cols.index("TOTAL") if "TOTAL" in cols else 0
+    size_i = cols.index("PAGESIZE") if "PAGESIZE" in cols else None
+    total = row[total_i] if total_i < len(row) and row[total_i] is not None else default_total
+    pagesize = row[size_i] if size_i is not None and size_i < len(row) else None
+    return int(total), (int(pagesize) if pagesize else None)
+
+
+# Блок ISS по колонкам: {имя: np.ndarray}. Текст — object, числа — float64 (None → NaN)
+Columns = Dict[str, np.ndarray]
+
+
+def _float_column(values: Sequence[Any]) -> np.ndarray:
+    try:
+        return np.array(values, dtype=float)  # None → NaN, числа-строки ISS тоже разберёт
+    except (TypeError, ValueError):
+        # редкие "" / "-" и прочий мусор — поштучно
+        out = np.full(len(values), np.nan)
+        for i, v in enumerate(values):
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                pass
+        return out
+
+
+def iss_columns(
+    table: Tuple[List[str], List[list]],
+    *,
+    text: Sequence[str] = (),
+    numeric: Sequence[str] = (),
+) -> Columns:
+    """
+    Разобрать блок (columns, rows) в типизированные колонки за один проход транспонирования —
+    без словаря на строку. Колонки, которых ISS не вернул, заполняются None / NaN.
+    """
+    cols, rows = table
+    n = len(rows)
+    pos = {c: i for i, c in enumerate(cols)}
+    # короткие строки дополняются None, а не обрезают колонки у всех
+    transposed = list(zip_longest(*rows)) if rows else []
+
+    out: Columns = {}
+    for name in text:
+        i = pos.get(name)
+        column = np.empty(n, dtype=object)
+        column[:] = transposed[i] if i is not None and i < len(transposed) else None
+        out[name] = column
+    for name in numeric:
+        i = pos.get(name)
+        out[name] = _float_column(transposed[i]) if i is not None and i < len(transposed) else np.full(n, np.nan)
+    return out
+
+
+def nan_to_none(column: np.ndarray) -> List[Optional[float]]:
+    """Колонка float64 → список для JSON/ORM: NaN → None."""
+    return [None if v != v else v for v in column.tolist()]
+
+
+def fan_out_pages(
+    fetch: Callable[[int], T],
+    starts: Sequence[int],
+    *,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> Iterator[T]:
+    """
+    Параллельно забрать страницы по списку offset'ов ограниченным пулом потоков.
+    Результаты отдаются строго в порядке starts (детерминированно).
+    """
+    if not starts:
+        return
+    if max_workers <= 1 or len(starts) == 1:
+        for start in starts:
+            yield fetch(start)
+        return
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(starts)), thread_name_prefix="iss")
+    try:
+        yield from pool.map(fetch, starts)
+    finally:
+        # потребитель мог остановиться раньше (нашёл нужный SECID) — недокачанное отменяем
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Клиент ---------------------------------------------------------------------
+
+class IssClient:
+    """
+    Единый клиент ISS: общий транспорт, базовый адрес, таймауты и проекция колонок.
+    Все сервисы и команды ходят в ISS только через него.
+    """
+
+    def __init__(
+        self,
+        transport: Optional[IssTransport] = None,
+        *,
+        base: str = ISS_BASE,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+    ):
+        self.transport: IssTransport = transport or RequestsTransport()
+        self.base = base.rstrip("/")
+        self.timeout = timeout
+
+    def url(self, path: str) -> str:
+        """path может быть /relative или полным https://..."""
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base}/{path.lstrip('/')}"
+
+    def get_json(
+        self,
+        path: str,
+        params: Optional[Mapping[str, str]] = None,
+        *,
+        timeout: Optional[Timeout] = None,
+    ) -> Any:
+        return self.transport.get(self.url(path), dict(params or {}), timeout or self.timeout)
+
+    def get_tables(
+        self,
+        path: str,
+        blocks: Sequence[str],
+        *,
+        columns: Optional[Mapping[str, Sequence[str]]] = None,
+        params: Optional[Mapping[str, str]] = None,
+        timeout: Optional[Timeout] = None,
+    ) -> Dict[str, Tuple[List[str], List[list]]]:
+        """
+        Запросить только нужные блоки (iss.only) и колонки (<block>.columns).
+        Возвращает {block: (columns, rows)}.
+        """
+        query: Dict[str, str] = {"iss.meta": "off", "iss.only": ",".join(blocks)}
+        for block, cols in (columns or {}).items():
+            query[f"{block}.columns"] = ",".join(cols)
+        query.update(params or {})
+        js = self.get_json(path, query, timeout=timeout)
+        return {block: iss_table(js, block) for block in blocks}
+
+
+def board_securities_path(engine: str, market: str, board: str) -> str:
+    return f"/engines/{engine}/markets/{market}/boards/{board}/securities.json"
+
+
+_client: Optional[IssClient] = None
+_client_lock = threading.Lock()
+
 
-    securities = js.get("securities", {})
-    marketdata = js.get("marketdata", {})
-    cursor = js.get("securities.cursor", {})
+def get_client() -> IssClient:
+    """Общий на процесс клиент ISS (одно пуловое соединение на все вызовы)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = IssClient()
+    return _client
 
-    sec_cols = securities.get("columns", [])
-    md_cols = marketdata.get("columns", [])
-    sec_data = securities.get("data", []) or []
-    md_data = marketdata.get("data", []) or []
+
+def set_transport(transport: Optional[IssTransport]) -> IssClient:
+    """Подменить транспорт общего клиента (None — вернуть HTTP по умолчанию)."""
+    client = get_client()
+    client.transport = transport or RequestsTransport()
+    return client
+
+
+# --- Доски ----------------------------------------------------------------------
+
+def fetch_board_page(
+    engine: str, market: str, board: str, *, start: int = 0, reference: Optional[Mapping[str, dict]] = None
+) -> Tuple[List[dict], int]:
+    """
+    Возвращает кортеж: (строки marketdata + справка securities, total).
+    С ISS — только marketdata; SHORTNAME/BOARDID берутся из reference
+    (суточная справка доски, см. board_reference), если она не передана — из общего кэша.
+    """
+    # справка живёт в кэше Django, процент считает heatmap_fetcher — импорт по месту
+    from .board_reference import board_reference
+    from .heatmap_fetcher import PCT_COLUMNS, change_pct_columns
+
+    if reference is None:
+        reference = board_reference(engine, market, board)
+
+    tables = get_client().get_tables(
+        board_securities_path(engine, market, board),
+        # cursor НУЖЕН, чтобы знать total и корректно пагинировать
+        ("marketdata", "securities.cursor"),
+        columns={"marketdata": PCT_COLUMNS},
+        params={"start": str(start)},
+    )
+
+    md = iss_columns(tables["marketdata"], text=("SECID",), numeric=PCT_COLUMNS[1:])
+    secids = md["SECID"].tolist()
 
     # total из курсора (если по какой-то причине нет — fallback на start+len)
-    total = start + len(sec_data)
-    cur_data = cursor.get("data", [])
-    if cur_data:
-        # у секций *.cursor в первом столбце TOTAL
-        total = cur_data[0][0] if cur_data[0] and cur_data[0][0] is not None else total
-
-    # индексы нужных колонок
-    secid_i = sec_cols.index("SECID") if "SECID" in sec_cols else None
-    short_i = sec_cols.index("SHORTNAME") if "SHORTNAME" in sec_cols else None
-    board_i = sec_cols.index("BOARDID") if "BOARDID" in sec_cols else None
-
-    md_by_secid: Dict[str, list] = {}
-    if md_data and "SECID" in md_cols:
-        md_secid_i = md_cols.index("SECID")
-        for row in md_data:
-            if row and md_secid_i < len(row):
-                md_by_secid[row[md_secid_i]] = row
-
-    last_i = md_cols.index("LAST") if "LAST" in md_cols else None
-    chg_i = md_cols.index("LASTTOPREVPRICE") if "LASTTOPREVPRICE" in md_cols else None
+    total, _ = iss_cursor(tables["securities.cursor"], start + len(secids))
 
     page: List[dict] = []
-    for row in sec_data:
-        secid = row[secid_i] if secid_i is not None else None
-        mdr = md_by_secid.get(secid)
-        last = mdr[last_i] if (mdr and last_i is not None and last_i < len(mdr)) else None
-        change_pct = mdr[chg_i] if (mdr and chg_i is not None and chg_i < len(mdr)) else None
-
+    for secid, last, change_pct in zip(secids, nan_to_none(md["LAST"]), nan_to_none(change_pct_columns(md))):
+        ref = reference.get(secid) or {}
         page.append({
             "secid": secid,
-            "shortname": row[short_i] if short_i is not None else None,
-            "board": row[board_i] if board_i is not None else board,
+            "shortname": ref.get("SHORTNAME"),
+            "board": ref.get("BOARDID") or board,
             "last": last,
             "change_pct": change_pct,
         })
@@ -170,26 +309,38 @@ def fetch_board_page(engine: str, market: str, board: str, *, start: int = 0) ->
     return page, int(total)
 
 
-def fetch_board_all(engine: str, market: str, board: str, *, max_pages: Optional[int] = None) -> List[dict]:
-    start = 0
-    out: List[dict] = []
-    pages = 0
-    total = None
+def fetch_board_all(
+    engine: str,
+    market: str,
+    board: str,
+    *,
+    max_pages: Optional[int] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> List[dict]:
+    """
+    Все страницы доски. Первая страница — последовательно (узнаём TOTAL и размер страницы),
+    остальные — параллельно через fan_out_pages с сохранением порядка.
+    Справка доски читается один раз на весь обход.
+    """
+    from .board_reference import board_reference
+
+    reference = board_reference(engine, market, board)
+    first, total = fetch_board_page(engine, market, board, start=0, reference=reference)
+    if not first:
+        return []
 
-    while True:
-        page, total = fetch_board_page(engine, market, board, start=start)
-        if not page:
-            break
-        out.extend(page)
-        start += len(page)
-        pages += 1
+    out: List[dict] = list(first)
+    step = len(first)
+    starts = list(range(step, total, step))
+    # защита от бесконечного/слишком длинного обхода
+    if max_pages:
+        starts = starts[: max(0, max_pages - 1)]
 
-        # защита от бесконечного цикла
-        if max_pages and pages >= max_pages:
-            break
-        if total is not None and start >= total:
-            break
+    def _page(start: int) -> List[dict]:
+        return fetch_board_page(engine, market, board, start=start, reference=reference)[0]
 
+    for page in fan_out_pages(_page, starts, max_workers=max_workers):
+        out.extend(page)
     return out
 
 
@@ -0,0 +1,188 @@
+# Project/mm08/services/jobs.py
+from __future__ import annotations
+import datetime as dt
+import logging
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from mm08.models import RefreshJob
+from mm08.services.heatmap import BOARD_MAP, build_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Очередь задач в БД: веб-воркер только ставит задачу, собирает снапшот
+# отдельный процесс (manage.py run_jobs). Захват задачи — условный UPDATE
+# (status=queued → running), так что воркеров может быть несколько.
+
+# Задача в running без отметок дольше этого — воркер упал, возвращаем в очередь
+STALE_AFTER_SEC = 10 * 60
+# Пока задача выполняется, воркер раз в столько секунд обновляет её updated_at:
+# медленная сборка (долгий ISS, большая транзакция) живая, пока идут отметки
+HEARTBEAT_SEC = 60
+# Сколько раз задачу можно взять в работу: та, что роняет воркер, не крутится в очереди вечно
+MAX_ATTEMPTS = 3
+
+Status = RefreshJob.Status
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def heatmap_dedup_key(board: str, label: str, date: Optional[dt.date]) -> str:
+    return f"heatmap:{board}:{label}:{date.isoformat() if date else 'today'}"
+
+
+def enqueue_heatmap_refresh(
+    board: str, label: str = "fast", date: Optional[dt.date] = None, *, user=None
+) -> Tuple[RefreshJob, bool]:
+    """
+    Поставить пересборку снапшота в очередь. Если такая же задача уже ждёт или
+    выполняется — вернуть её (created=False): шторм нажатий «Обновить» = одна сборка.
+    """
+    board = (board or "TQBR").upper()
+    if board not in BOARD_MAP:
+        raise ValueError(f"Unsupported board: {board}")
+    key = heatmap_dedup_key(board, label, date)
+
+    for _ in range(3):
+        active = RefreshJob.objects.filter(dedup_key=key, status__in=RefreshJob.ACTIVE).first()
+        if active is not None:
+            return active, False
+        try:
+            with transaction.atomic():
+                job = RefreshJob.objects.create(
+                    kind="heatmap", board=board, label=label, date=date, dedup_key=key,
+                    created_by=user if getattr(user, "is_authenticated", False) else None,
+                )
+            return job, True
+        except IntegrityError:
+            continue  # параллельный запрос успел поставить такую же — перечитываем
+    raise RuntimeError(f"Cannot enqueue {key}")
+
+
+def job_state(job: RefreshJob) -> Dict[str, Any]:
+    """JSON статуса задачи для polling'а."""
+    return {
+        "job_id": job.pk,
+        "status": job.status,
+        "progress": job.progress,
+        "stage": job.stage,
+        "board": job.board,
+        "label": job.label,
+        "date": job.date.isoformat() if job.date else None,
+        "snapshot_id": job.snapshot_id,
+        "error": job.error or None,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def requeue_stale(stale_after: int = STALE_AFTER_SEC, max_attempts: int = MAX_ATTEMPTS) -> int:
+    """
+    Вернуть в очередь задачи, брошенные упавшим воркером (running без обновлений и heartbeat).
+    Исчерпавшие max_attempts попыток — в failed: скорее всего, воркер роняет сама задача.
+    """
+    now = timezone.now()
+    stale = RefreshJob.objects.filter(status=Status.RUNNING, updated_at__lt=now - dt.timedelta(seconds=stale_after))
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=Status.FAILED, stage="failed", error=f"Worker lost the job {max_attempts} times",
+        finished_at=now, updated_at=now,
+    )
+    if failed:
+        logger.warning("Failed %d jobs after %d lost attempts", failed, max_attempts)
+    return stale.update(status=Status.QUEUED, worker="", stage="requeued", updated_at=now)
+
+
+def claim_next(worker: str) -> Optional[RefreshJob]:
+    """Взять самую старую задачу из очереди. Условный UPDATE: одну задачу забирает ровно один воркер."""
+    for pk in RefreshJob.objects.filter(status=Status.QUEUED).order_by("created_at", "id").values_list("id", flat=True)[:5]:
+        claimed = RefreshJob.objects.filter(pk=pk, status=Status.QUEUED).update(
+            status=Status.RUNNING, worker=worker, started_at=timezone.now(), progress=0, stage="start",
+            attempts=F("attempts") + 1, updated_at=timezone.now(),
+        )
+        if claimed:
+            return RefreshJob.objects.get(pk=pk)
+    return None
+
+
+def _report(job: RefreshJob, progress: int, stage: str) -> None:
+    # отдельным UPDATE вне транзакции сборки — статус виден сразу
+    RefreshJob.objects.filter(pk=job.pk).update(progress=progress, stage=stage, updated_at=timezone.now())
+
+
+def heartbeat(job: RefreshJob) -> bool:
+    """Отметка «воркер жив». Только пока задача running у этого воркера — чужую не продлеваем."""
+    return bool(
+        RefreshJob.objects.filter(pk=job.pk, status=Status.RUNNING, worker=job.worker)
+        .update(updated_at=timezone.now())
+    )
+
+
+@contextmanager
+def _heartbeats(job: RefreshJob, every: float) -> Iterator[None]:
+    """Фоновый поток с heartbeat(job) раз в every секунд, пока выполняется блок."""
+    stop = threading.Event()
+
+    def beat() -> None:
+        try:
+            while not stop.wait(every):
+                if not heartbeat(job):
+                    break  # задачу уже вернули в очередь или завершили
+        except Exception:
+            logger.exception("Heartbeat failed for %s", job)
+        finally:
+            connection.close()  # соединение этого потока
+
+    thread = threading.Thread(target=beat, name=f"job-{job.pk}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(job: RefreshJob, heartbeat_sec: float = HEARTBEAT_SEC) -> RefreshJob:
+    """Выполнить захваченную задачу; итог (done/failed) пишется в неё же."""
+    fields = ["status", "error", "stage", "finished_at", "updated_at"]
+    try:
+        with _heartbeats(job, heartbeat_sec):
+            snapshot, _ = build_snapshot(
+                board=job.board,
+                label=job.label,
+                date=job.date.isoformat() if job.date else None,
+                replace=True,
+                progress=lambda pct, stage: _report(job, pct, stage),
+            )
+    except Exception as exc:
+        logger.exception("Job %s failed", job)
+        job.status, job.error, job.stage = Status.FAILED, f"{type(exc).__name__}: {exc}", "failed"
+    else:
+        job.status, job.snapshot, job.progress, job.stage = Status.DONE, snapshot, 100, "done"
+        fields += ["snapshot", "progress"]
+    job.finished_at = timezone.now()
+    job.save(update_fields=fields)
+    return job
+
+
+def run_pending(worker: Optional[str] = None, limit: Optional[int] = None) -> int:
+    """Выполнить задачи из очереди (не больше limit). Возвращает число выполненных."""
+    worker = worker or worker_name()
+    done = 0
+    while limit is None or done < limit:
+        job = claim_next(worker)
+        if job is None:
+            break
+        run_job(job)
+        done += 1
+    return done
@@ -0,0 +1,242 @@
+# Project/mm08/services/live.py
+from __future__ import annotations
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db.models import Max
+
+from mm08.models import HeatTile
+from .heatmap import BOARD_MAP
+from .quotes import read_board
+from .snapshot_cache import heatmap_version
+
+# orjson — необязательная зависимость (как в renderers.py)
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Живой канал (SSE, /api/live/ под ASGI): один наблюдатель на процесс раз в POLL_SEC
+# сверяет доску котировок и версию теплокарты, считает дельту по тикерам и кодирует
+# событие один раз — подписчикам уходят одни и те же байты. Новый подписчик сначала
+# получает полное состояние, потом только дельты [тикер, last, change_pct].
+
+CHANNELS = ("quotes", "heatmap")
+POLL_SEC = 0.5
+HEARTBEAT_SEC = 15
+# Очередь подписчика; кто не успевает читать — отключаем, EventSource переподключится
+# и получит полное состояние заново
+QUEUE_SIZE = 64
+RETRY = b"retry: 3000\n\n"
+PING = b": ping\n\n"
+
+Point = Tuple[Optional[float], Optional[float]]  # (last, change_pct)
+State = Dict[str, Point]
+
+
+def encode_event(event: str, data) -> bytes:
+    """Одно SSE-событие; JSON в одну строку (ни orjson, ни json с separators не ставят переводов строк)."""
+    if orjson is not None:
+        body = orjson.dumps(data)
+    else:
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+    return b"event: " + event.encode() + b"\ndata: " + body + b"\n\n"
+
+
+def diff_state(old: State, new: State) -> List[list]:
+    """Изменившиеся и новые тикеры: [[тикер, last, change_pct], ...]."""
+    return [[ticker, *point] for ticker, point in new.items() if old.get(ticker) != point]
+
+
+def _point(last, pct) -> Point:
+    # None/NaN → None: в JSON это null, а NaN в JSON не бывает
+    last = float(last) if last is not None and last == last else None
+    pct = round(float(pct), 3) if pct is not None and pct == pct else None
+    return last, pct
+
+
+class Broadcaster:
+    """Подписчики по темам («quotes:TQBR»): у каждого своя ограниченная очередь байтов."""
+
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._topics: Dict[str, Set[asyncio.Queue]] = {}
+        self._subs: Dict[asyncio.Queue, Tuple[str, ...]] = {}
+        self._state: Dict[str, bytes] = {}  # тема → закодированное полное состояние
+
+    def topics(self) -> List[str]:
+        return [t for t, subs in self._topics.items() if subs]
+
+    def __len__(self) -> int:
+        return len(self._subs)
+
+    def has_state(self, topic: str) -> bool:
+        return topic in self._state
+
+    def subscribe(self, topics: Iterable[str]) -> asyncio.Queue:
+        topics = tuple(topics)
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._subs[queue] = topics
+        for topic in topics:
+            self._topics.setdefault(topic, set()).add(queue)
+            if topic in self._state:
+                queue.put_nowait(self._state[topic])
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        for topic in self._subs.pop(queue, ()):
+            subs = self._topics.get(topic)
+            if subs is not None:
+                subs.discard(queue)
+                if not subs:
+                    del self._topics[topic]
+                    self._state.pop(topic, None)
+
+    def publish(self, topic: str, chunk: Optional[bytes], state: Optional[bytes] = None) -> int:
+        """Разослать уже закодированное событие; state — новое полное состояние темы для новых подписчиков."""
+        if state is not None and topic in self._topics:
+            self._state[topic] = state
+        if not chunk:
+            return 0
+        sent = 0
+        for queue in list(self._topics.get(topic, ())):
+            try:
+                queue.put_nowait(chunk)
+                sent += 1
+            except asyncio.QueueFull:
+                self._drop(queue)
+        return sent
+
+    def _drop(self, queue: asyncio.Queue) -> None:
+        self.unsubscribe(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)  # поток подписчика завершится
+
+
+class LiveFeed:
+    """Наблюдатель процесса: опрашивает источники только для тем, на которые кто-то подписан."""
+
+    def __init__(self, broadcaster: Optional[Broadcaster] = None, poll_sec: float = POLL_SEC):
+        self.broadcaster = broadcaster or Broadcaster()
+        self.poll_sec = poll_sec
+        self._seen: Dict[str, object] = {}  # тема → метка версии (ts доски / версия теплокарты)
+        self._known: Dict[str, Dict[str, State]] = {}  # тема → {ключ: состояние}
+        self._task: Optional[asyncio.Task] = None
+
+    # --- синхронная часть (файл доски, кэш, БД) ---
+
+    def poll(self, topics: Iterable[str]) -> List[Tuple[str, bytes, bytes]]:
+        """Новые события по темам: [(тема, дельта, полное состояние)]. Без изменений — пусто."""
+        out = []
+        for topic in topics:
+            channel, board = topic.split(":", 1)
+            try:
+                frames = self._quotes(board) if channel == "quotes" else self._heatmap(board)
+            except Exception:
+                logger.exception("Live poll failed for %s", topic)
+                continue
+            if frames is None:
+                continue
+            version, parts = frames
+            self._seen[topic] = version
+            known = self._known.setdefault(topic, {})
+            deltas, states = [], []
+            for key, meta, state in parts:
+                delta = diff_state(known.get(key, {}), state)
+                known[key] = state
+                if delta:
+                    deltas.append(encode_event(channel, {**meta, "d": delta}))
+                states.append(encode_event(channel, {**meta, "full": True, "d": diff_state({}, state)}))
+            out.append((topic, b"".join(deltas), b"".join(states)))
+        return out
+
+    def _quotes(self, board: str):
+        # только файл доски: обновляет её поллер (или страницы через current_board), не этот цикл
+        quotes = read_board(board)
+        if quotes is None or self._seen.get(f"quotes:{board}") == quotes.ts:
+            return None
+        state = {r["SECID"]: _point(r["LAST"], r["CHANGE_PCT"]) for r in quotes.rows}
+        return quotes.ts, [(board, {"board": board, "ts": quotes.ts.isoformat()}, state)]
+
+    def _heatmap(self, board: str):
+        version = heatmap_version(board)
+        if self._seen.get(f"heatmap:{board}") == version:
+            return None
+        tiles = HeatTile.objects.filter(snapshot__board=board)
+        last_date = tiles.aggregate(d=Max("snapshot__date"))["d"]
+        parts: Dict[str, tuple] = {}
+        rows = tiles.filter(snapshot__date=last_date).values_list(
+            "snapshot_id", "snapshot__label", "ticker", "last", "change_pct"
+        )
+        for snapshot_id, label, ticker, last, pct in rows.order_by("snapshot_id"):
+            meta, state = parts.setdefault(label, ({"board": board, "label": label, "snapshot": snapshot_id}, {}))
+            state[ticker] = _point(last, pct)
+        return version, [(label, meta, state) for label, (meta, state) in parts.items()]
+
+    # --- асинхронная часть ---
+
+    def subscribe(self, topics: Iterable[str]) -> asyncio.Queue:
+        queue = self.broadcaster.subscribe(topics)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.broadcaster.unsubscribe(queue)
+
+    async def run(self) -> None:
+        # живёт, пока есть подписчики; следующий subscribe запустит заново
+        while len(self.broadcaster):
+            topics = self.broadcaster.topics()
+            # тема без сохранённого состояния (все отписались) — следующий опрос отдаст её целиком
+            for topic in [t for t in self._seen if not self.broadcaster.has_state(t)]:
+                self._seen.pop(topic, None)
+                self._known.pop(topic, None)
+            for topic, chunk, state in await sync_to_async(self.poll)(topics):
+                self.broadcaster.publish(topic, chunk, state)
+            await asyncio.sleep(self.poll_sec)
+        self._seen.clear()
+        self._known.clear()
+
+
+_feed: Optional[LiveFeed] = None
+
+
+def get_feed() -> LiveFeed:
+    global _feed
+    if _feed is None:
+        _feed = LiveFeed()
+    return _feed
+
+
+def live_topics(board: str, channels: Iterable[str]) -> List[str]:
+    board = (board or "TQBR").upper()
+    if board not in BOARD_MAP:
+        raise ValueError(f"Unsupported board: {board}")
+    wanted = [c for c in CHANNELS if c in set(channels)]
+    if not wanted:
+        raise ValueError(f"Unknown channels, expected some of: {', '.join(CHANNELS)}")
+    return [f"{c}:{board}" for c in wanted]
+
+
+async def event_stream(feed: LiveFeed, topics: List[str], heartbeat: float = HEARTBEAT_SEC) -> AsyncIterator[bytes]:
+    """Поток SSE одного клиента. Отключение клиента отменяет генератор — отписка в finally."""
+    queue = feed.subscribe(topics)
+    try:
+        yield RETRY
+        while True:
+            try:
+                chunk = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                chunk = PING  # держим соединение через прокси
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        feed.unsubscribe(queue)
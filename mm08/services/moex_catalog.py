@@ -1,67 +1,82 @@
 # D:\MM\mm08\services\moex_catalog.py
 import logging
 from typing import Dict, List, Tuple, Optional
-from django.core.cache import cache
 from requests import RequestException
 
 from .moex_iss import MoexISSClient, InstrumentRowMapper
 from .moex_meta import is_valid_combo
+from .single_flight import SingleFlightTimeout, single_flight
 
 logger = logging.getLogger(__name__)
 
 CATALOG_CACHE_KEY = "moex_catalog_{engine}_{market}_{board}"
 CATALOG_TTL_SEC = 600  # 10 минут
+CATALOG_STALE_SEC = 3600  # сколько ещё можно отдавать старый индекс, пока его обновляют
 
-def get_moex_list(engine: str, market: str, board: str) -> List[Tuple[str, str]]:
-    """Закрытый список [(SECID, label)] для выпадашки. С кэшем и валидацией тройки."""
+# Индекс доски: {SECID: defaults инструмента (+ticker, label)}
+CatalogIndex = Dict[str, Dict]
+
+
+def _label(secid: str, shortname: str) -> str:
+    return f"{secid} — {shortname}" if shortname else secid
+
+
+class _EmptyIndex(Exception):
+    """ISS не вернул ни одной бумаги — такой индекс не кэшируем."""
+
+
+def get_catalog_index(engine: str, market: str, board: str) -> CatalogIndex:
+    """
+    Индекс каталога доски по SECID — один проход iter_securities на всю доску.
+    Лежит в общем кэше воркеров под single-flight: ISS дёргает один процесс,
+    а пока он обновляет протухший индекс, остальные отдают старый.
+    Неверная тройка, сбой ISS или пустой ответ → пустой индекс (он не кэшируется).
+    """
     if not is_valid_combo(engine, market, board):
         # неверная комбинация — ничего не трогаем
-        logger.warning("Invalid combo for list: %s/%s/%s", engine, market, board)
-        return []
+        logger.warning("Invalid combo for catalog: %s/%s/%s", engine, market, board)
+        return {}
 
     cache_key = CATALOG_CACHE_KEY.format(engine=engine, market=market, board=board)
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return cached
-
-    client = MoexISSClient(timeout=10, pause_sec=0.0)
-    options: List[Tuple[str, str]] = []
 
-    try:
+    def fill() -> CatalogIndex:
+        client = MoexISSClient(timeout=10, pause_sec=0.0)
+        index: CatalogIndex = {}
         for rec in client.iter_securities(engine=engine, market=market, board=board):
             secid = (rec.get("SECID") or rec.get("secid") or "").strip().upper()
-            if not secid:
+            if not secid or secid in index:
                 continue
-            shortname = (rec.get("SHORTNAME") or rec.get("shortname") or "").strip()
-            label = f"{secid} — {shortname}" if shortname else secid
-            options.append((secid, label))
+            defaults = InstrumentRowMapper.to_instrument_defaults(rec)
+            index[secid] = defaults | {"ticker": secid, "label": _label(secid, defaults.get("shortname") or "")}
+        if not index:
+            raise _EmptyIndex  # исключение из fill — single_flight ничего не кладёт в кэш
+        # порядок вставки = порядок выпадашки
+        return dict(sorted(index.items()))
+
+    try:
+        return single_flight(cache_key, fill, ttl=CATALOG_TTL_SEC, stale_ttl=CATALOG_STALE_SEC)
     except RequestException as e:
         logger.exception("ISS request failed for %s/%s/%s: %s", engine, market, board, e)
-        return []
+        return {}
+    except _EmptyIndex:
+        logger.warning("ISS returned no securities for %s/%s/%s", engine, market, board)
+        return {}
+    except SingleFlightTimeout:
+        logger.warning("Catalog %s/%s/%s is still being fetched by another worker", engine, market, board)
+        return {}
 
-    options.sort(key=lambda x: x[0])
-    cache.set(cache_key, options, timeout=CATALOG_TTL_SEC)
-    return options
 
+def get_moex_list(engine: str, market: str, board: str) -> List[Tuple[str, str]]:
+    """Закрытый список [(SECID, label)] для выпадашки — из индекса доски."""
+    return [(secid, info["label"]) for secid, info in get_catalog_index(engine, market, board).items()]
 
-def get_moex_info(engine: str, market: str, board: str, secid: str) -> Optional[Dict]:
-    """Подробности по одному SECID для автозаполнения."""
-    if not is_valid_combo(engine, market, board):
-        logger.warning("Invalid combo for info: %s/%s/%s", engine, market, board)
-        return None
 
-    client = MoexISSClient(timeout=10, pause_sec=0.0)
+def get_moex_info(engine: str, market: str, board: str, secid: str) -> Optional[Dict]:
+    """Подробности по одному SECID для автозаполнения: O(1) по индексу доски, без ISS на тёплом кэше."""
     wanted = (secid or "").strip().upper()
     if not wanted:
         return None
-
-    try:
-        for rec in client.iter_securities(engine=engine, market=market, board=board):
-            rec_secid = (rec.get("SECID") or rec.get("secid") or "").strip().upper()
-            if rec_secid == wanted:
-                return InstrumentRowMapper.to_instrument_defaults(rec) | {"ticker": wanted}
-    except RequestException as e:
-        logger.exception("ISS request failed for %s/%s/%s %s: %s", engine, market, board, wanted, e)
+    info = get_catalog_index(engine, market, board).get(wanted)
+    if info is None:
         return None
-
-    return None
+    return {k: v for k, v in info.items() if k != "label"}
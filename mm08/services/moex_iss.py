@@ -1,7 +1,8 @@
 import time
 import logging
-from typing import Dict, Optional, Iterable
-import requests
+from typing import Dict, List, Optional, Iterable, Iterator, Tuple
+
+from .iss_client import DEFAULT_MAX_WORKERS, IssClient, fan_out_pages, get_client, iss_cursor, iss_table
 
 logger = logging.getLogger(__name__)
 
@@ -9,51 +10,82 @@ logger = logging.getLogger(__name__)
 class MoexISSClient:
     """Клиент ISS с «правильным» адресом под конкретный engine/market/board."""
 
-    BASE = "https://iss.moex.com/iss"
+    PAGE = 100                                    # размер страницы ISS по умолчанию
 
-    def __init__(self, timeout: int = 20, pause_sec: float = 0.2):
+    def __init__(
+        self,
+        timeout: int = 20,
+        pause_sec: float = 0.2,
+        client: Optional[IssClient] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ):
         self.timeout = timeout                    # таймаут HTTP
         self.pause_sec = pause_sec                # пауза между страницами (бережём API)
-        self.session = requests.Session()         # сессия → быстрее повторные запросы
+        self.client = client or get_client()      # общий пуловый клиент ISS
+        self.max_workers = max_workers            # потолок параллельных страниц
 
     def _get(self, path: str, params: Optional[Dict] = None) -> Dict:
         """GET → JSON с проверкой статуса."""
-        url = f"{self.BASE}/{path}"
-        r = self.session.get(url, params=params or {}, timeout=self.timeout)
-        r.raise_for_status()
-        return r.json()
+        return self.client.get_json(path, params, timeout=self.timeout)
 
     def _build_path(self, engine, market, board) -> str:
         if engine and market and board:
             return f"engines/{engine}/markets/{market}/boards/{board}/securities.json"
         return "securities.json" 
 
-    def iter_securities(self, engine: Optional[str], market: Optional[str], board: Optional[str]) -> Iterable[Dict]:
+    def _page(self, path: str, start: int) -> Tuple[List[str], List[list], Tuple[int, Optional[int]]]:
+        """Одна страница: (columns, rows, (total, pagesize)) — курсор, если ISS его отдаёт."""
+        data = self._get(path, params={
+            "iss.meta": "off",
+            "iss.only": "securities,securities.cursor",
+            "start": start,
+        })
+        cols, rows = iss_table(data, "securities")
+        return cols, rows, iss_cursor(iss_table(data, "securities.cursor"), -1)
+
+    def iter_pages(
+        self,
+        engine: Optional[str],
+        market: Optional[str],
+        board: Optional[str],
+        *,
+        start: int = 0,
+    ) -> Iterator[Tuple[int, List[Dict]]]:
         """
-        Постраничный итератор по таблице 'securities' (узел с колонками/данными).
+        Постраничный итератор: (offset страницы, записи страницы) начиная с start.
+        Если ISS вернул курсор с TOTAL — остальные страницы тянем параллельно
+        (порядок сохраняется), иначе идём последовательно с паузой.
         """
-        start = 0
-        page = 100
         path = self._build_path(engine, market, board)
 
-        while True:
-            data = self._get(path, params={"start": start})
-            sec = data.get("securities", {})
-            cols = sec.get("columns", [])
-            rows = sec.get("data", [])
-
-            if not rows:
-                break
-
-            for row in rows:
-                # превращаем массив значений в dict по именам колонок
-                yield dict(zip(cols, row))
-
-            if len(rows) < page:
-                break
-
+        cols, rows, (total, pagesize) = self._page(path, start)
+        if not rows:
+            return
+        # превращаем массив значений в dict по именам колонок
+        yield start, [dict(zip(cols, row)) for row in rows]
+
+        page = pagesize or self.PAGE
+        if total >= 0:
+            starts = list(range(start + page, total, page))
+            pages = fan_out_pages(lambda s: self._page(path, s), starts, max_workers=self.max_workers)
+            for offset, (cols, rows, _) in zip(starts, pages):
+                yield offset, [dict(zip(cols, row)) for row in rows]
+            return
+
+        # курсора нет — последовательный обход до неполной страницы
+        while len(rows) >= page:
             start += page
             time.sleep(self.pause_sec)
+            cols, rows, _ = self._page(path, start)
+            if rows:
+                yield start, [dict(zip(cols, row)) for row in rows]
+
+    def iter_securities(self, engine: Optional[str], market: Optional[str], board: Optional[str]) -> Iterable[Dict]:
+        """
+        Итератор по таблице 'securities' (узел с колонками/данными) — все страницы подряд.
+        """
+        for _, records in self.iter_pages(engine, market, board):
+            yield from records
 
 
 class InstrumentRowMapper:
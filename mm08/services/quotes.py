@@ -0,0 +1,170 @@
+# Project/mm08/services/quotes.py
+from __future__ import annotations
+import datetime as dt
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .heatmap import BOARD_MAP
+from .single_flight import try_lock
+from .board_reference import board_reference
+from .heatmap_fetcher import board_marketdata
+
+logger = logging.getLogger(__name__)
+
+# Доска котировок в памяти, общей для всех процессов: поллер (manage.py poll_quotes)
+# раз в N секунд пишет доску в .npy и атомарно подменяет файл (os.replace), веб-воркеры
+# читают её через mmap. Пока файл не сменился, процесс отдаёт уже разобранные строки —
+# проверка свежести стоит open() + fstat().
+
+QUOTE_DTYPE = np.dtype([
+    ("SECID", "U16"),
+    ("SHORTNAME", "U48"),
+    ("LAST", "f8"),
+    ("OPEN", "f8"),
+    ("HIGH", "f8"),
+    ("LOW", "f8"),
+    ("PREVPRICE", "f8"),
+    ("CHANGE_PCT", "f8"),  # NaN — неизвестен
+    ("VOLUME", "f8"),
+    ("VALTODAY", "f8"),
+])
+QUOTE_FIELDS = QUOTE_DTYPE.names
+
+# SHORTNAME — из суточной справки доски (board_reference), с ISS раз в N секунд — только marketdata
+MD_COLUMNS = (
+    "SECID", "LAST", "OPEN", "HIGH", "LOW", "PREVPRICE", "CHANGE", "LASTCHANGEPRC", "LASTTOPREVPRICE",
+    "VOLTODAY", "VALTODAY",
+)
+
+
+class QuoteBoard(NamedTuple):
+    board: str
+    ts: dt.datetime          # когда поллер записал доску
+    rows: List[Dict[str, Any]]  # строки в формате шаблонов (ключи — имена колонок ISS), по убыванию CHANGE_PCT
+
+
+# процесс: {board: ((inode, mtime_ns, size), QuoteBoard)}
+_loaded: Dict[str, Tuple[Tuple[int, int, int], QuoteBoard]] = {}
+
+
+def quotes_dir() -> Path:
+    return Path(getattr(settings, "QUOTES_DIR", Path(settings.BASE_DIR) / ".cache" / "quotes"))
+
+
+def board_path(board: str) -> Path:
+    return quotes_dir() / f"{board.upper()}.npy"
+
+
+def fetch_quotes(board: str) -> np.ndarray:
+    """Один запрос к ISS (marketdata доски, справка — из кэша) → массив QUOTE_DTYPE по убыванию CHANGE_PCT."""
+    engine, market = BOARD_MAP[board]
+    md = board_marketdata(engine, market, board, MD_COLUMNS)
+    at = {secid: i for i, secid in enumerate(md["SECID"].tolist()) if secid}
+
+    # порядок и имена — из справки; бумаги без marketdata на доску не попадают, а бумаги
+    # без справки (листинг днём, справку ещё не перечитали) — попадают без имени:
+    # набор тот же, что у кадров ряда из marketdata (heat_frames.frame_columns)
+    ref = board_reference(engine, market, board, require=at)
+    secids = [secid for secid in ref if secid in at] + [secid for secid in at if secid not in ref]
+    take = np.array([at[secid] for secid in secids], dtype=np.intp)
+
+    table = np.empty(len(secids), dtype=QUOTE_DTYPE)
+    table["SECID"] = secids
+    table["SHORTNAME"] = [ref.get(secid, {}).get("SHORTNAME") or "" for secid in secids]
+    for name, source in (("LAST", "LAST"), ("OPEN", "OPEN"), ("HIGH", "HIGH"), ("LOW", "LOW"),
+                         ("PREVPRICE", "PREVPRICE"), ("CHANGE_PCT", "CHANGE_PCT"),
+                         ("VOLUME", "VOLTODAY"), ("VALTODAY", "VALTODAY")):
+        table[name] = md[source][take]
+    # NaN в конец, остальные — по убыванию (как сортировали StocksListView)
+    order = np.lexsort((table["SECID"], -np.nan_to_num(table["CHANGE_PCT"], nan=-np.inf)))
+    return table[order]
+
+
+def write_board(board: str, table: np.ndarray) -> Path:
+    """Атомарная запись: читатели видят либо старую доску целиком, либо новую."""
+    path = board_path(board)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, table, allow_pickle=False)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+def refresh_board(board: str) -> int:
+    table = fetch_quotes(board)
+    write_board(board, table)
+    return len(table)
+
+
+def _to_rows(table: np.ndarray) -> List[Dict[str, Any]]:
+    cols = {name: table[name].tolist() for name in QUOTE_FIELDS}
+    rows = []
+    for values in zip(*(cols[name] for name in QUOTE_FIELDS)):
+        # NaN → None: шаблоны и JSON ждут «нет значения»
+        rows.append({name: (None if v != v else v) for name, v in zip(QUOTE_FIELDS, values)})
+    return rows
+
+
+def read_board(board: str) -> Optional[QuoteBoard]:
+    """Последняя доска от поллера или None, если поллер её ещё не писал."""
+    board = board.upper()
+    try:
+        f = open(board_path(board), "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        # fstat открытого файла: ключ и данные — от одной и той же версии, даже если поллер уже подменил файл
+        st = os.fstat(f.fileno())
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        hit = _loaded.get(board)
+        if hit is not None and hit[0] == key:
+            return hit[1]
+
+        fmt = np.lib.format
+        read_header = fmt.read_array_header_1_0 if fmt.read_magic(f) == (1, 0) else fmt.read_array_header_2_0
+        shape, _, dtype = read_header(f)
+        table = np.memmap(f, dtype=dtype, mode="r", offset=f.tell(), shape=shape) if shape[0] else np.empty(0, dtype)
+        rows = _to_rows(table)
+
+    ts = dt.datetime.fromtimestamp(st.st_mtime_ns / 1e9, dt.timezone.utc)
+    quotes = QuoteBoard(board, ts, rows)
+    _loaded[board] = (key, quotes)
+    return quotes
+
+
+def current_board(board: str, max_age: Optional[float] = None) -> Optional[QuoteBoard]:
+    """
+    Доска для страниц и API. Поллер держит её свежей; если его нет (dev) или он отстал
+    больше чем на max_age — доску обновляет один процесс под межпроцессным локом,
+    остальные отдают то, что есть. Так ISS дёргается не чаще раза в max_age на всех.
+    """
+    board = board.upper()
+    max_age = settings.QUOTES_STALE_SEC if max_age is None else max_age
+    quotes = read_board(board)
+    age = (dt.datetime.now(dt.timezone.utc) - quotes.ts).total_seconds() if quotes else None
+    if quotes is not None and age <= max_age:
+        return quotes
+    if board not in BOARD_MAP:
+        return quotes
+    with try_lock(f"quotes:{board}", lock_ttl=60) as locked:
+        if not locked:
+            return quotes
+        try:
+            refresh_board(board)
+        except Exception:
+            if quotes is None:
+                raise
+            logger.exception("Quote refresh failed for %s, serving board from %s", board, quotes.ts)
+            return quotes
+    return read_board(board)
@@ -0,0 +1,187 @@
+# Project/mm08/services/resample.py
+from __future__ import annotations
+import datetime as dt
+import re
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from mm08.models import Candle, CandleSeries
+
+# Внутридневные бары выравниваем по открытию основной сессии MOEX
+SESSION_OPEN = dt.time(10, 0)
+DAY_MIN = 24 * 60
+WEEK_MIN = 7 * DAY_MIN
+RESAMPLE_CACHE_TTL = 300  # 5 минут; плюс версия ряда в ключе — устаревшее не отдаём
+
+_INTERVAL_RE = re.compile(r"^([MHDW])(\d+)$")
+_UNIT_MIN = {"M": 1, "H": 60, "D": DAY_MIN, "W": WEEK_MIN}
+
+# Массивы баров: ts — epoch-секунды UTC начала бара
+Bars = Dict[str, np.ndarray]
+
+
+def parse_interval(value) -> Optional[int]:
+    """'M1'/'M5'/'H1'/'H4'/'D1'/'W1' или число минут ('60') → минуты; мусор → None."""
+    s = str(value or "").strip().upper()
+    if s.isdigit():
+        return int(s) or None
+    m = _INTERVAL_RE.match(s)
+    if not m or not int(m.group(2)):
+        return None
+    return _UNIT_MIN[m.group(1)] * int(m.group(2))
+
+
+def pick_base_interval(stored: Iterable[int], target: int) -> Optional[int]:
+    """Самый крупный из хранимых интервалов, из которого target собирается без остатка."""
+    fits = [int(b) for b in stored if b <= target and target % b == 0]
+    return max(fits) if fits else None
+
+
+def _local_offsets(ts: np.ndarray) -> np.ndarray:
+    """Смещение локального времени (TIME_ZONE) от UTC в секундах для каждого бара; считаем по дням."""
+    tz = timezone.get_default_timezone()
+    days, inverse = np.unique(ts // 86400, return_inverse=True)
+    per_day = np.array(
+        [dt.datetime.fromtimestamp(int(d) * 86400 + 43200, tz).utcoffset().total_seconds() for d in days],
+        dtype=np.int64,
+    )
+    return per_day[inverse]
+
+
+def bucket_starts(ts: np.ndarray, minutes: int) -> np.ndarray:
+    """
+    Начало корзины (epoch UTC) для каждого бара.
+    < суток — сетка шага minutes от SESSION_OPEN локального дня;
+    сутки и кратные — по локальным дням; недели — с понедельника.
+    """
+    offsets = _local_offsets(ts)
+    local = ts + offsets
+    width = minutes * 60
+    if minutes < DAY_MIN:
+        day = (local // 86400) * 86400
+        anchor = day + (SESSION_OPEN.hour * 3600 + SESSION_OPEN.minute * 60)
+        start = anchor + ((local - anchor) // width) * width
+    elif minutes % WEEK_MIN == 0:
+        monday = 3 * 86400  # 1970-01-01 — четверг, сдвигаем сетку на понедельник
+        start = ((local - monday) // width) * width + monday
+    else:
+        start = (local // width) * width
+    return start - offsets
+
+
+def resample_arrays(bars: Bars, minutes: int) -> Bars:
+    """
+    OHLCV-агрегация отсортированных по времени баров в корзины minutes:
+    open — первый, close — последний, high/low — экстремумы, volume — сумма.
+    """
+    ts = bars["ts"]
+    if ts.size == 0:
+        return {k: v[:0] for k, v in bars.items()}
+    keys = bucket_starts(ts, minutes)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+    ends = np.concatenate((starts[1:], [ts.size])) - 1
+    return {
+        "ts": keys[starts],
+        "open": bars["open"][starts],
+        "high": np.maximum.reduceat(bars["high"], starts),
+        "low": np.minimum.reduceat(bars["low"], starts),
+        "close": bars["close"][ends],
+        "volume": np.add.reduceat(bars["volume"], starts),
+    }
+
+
+def bars_columns(bars: Bars) -> Dict[str, list]:
+    """Столбцовый вид для графика: t — epoch-секунды, o/h/l/c/v — по массиву на поле."""
+    return {
+        "t": bars["ts"].tolist(),
+        "o": bars["open"].tolist(),
+        "h": bars["high"].tolist(),
+        "l": bars["low"].tolist(),
+        "c": bars["close"].tolist(),
+        "v": bars["volume"].tolist(),
+    }
+
+
+def _query_bars(qs) -> Bars:
+    rows = list(qs.values_list("dt", "open", "high", "low", "close", "volume"))
+    if not rows:
+        return {
+            "ts": np.empty(0, dtype=np.int64),
+            **{k: np.empty(0, dtype=np.float64) for k in ("open", "high", "low", "close")},
+            "volume": np.empty(0, dtype=np.int64),
+        }
+    dts, o, h, l, c, v = zip(*rows)
+    return {
+        "ts": np.fromiter((int(d.timestamp()) for d in dts), dtype=np.int64, count=len(dts)),
+        "open": np.asarray(o, dtype=np.float64),
+        "high": np.asarray(h, dtype=np.float64),
+        "low": np.asarray(l, dtype=np.float64),
+        "close": np.asarray(c, dtype=np.float64),
+        "volume": np.asarray(v, dtype=np.int64),
+    }
+
+
+def get_bars(
+    instrument_id: int,
+    interval: int,
+    *,
+    dt_from: Optional[dt.datetime] = None,
+    dt_to: Optional[dt.datetime] = None,
+    limit: Optional[int] = None,
+) -> Optional[Bars]:
+    """
+    Бары интервала interval (минуты) за диапазон; последние limit штук, по возрастанию времени.
+    Если такой интервал не хранится — собираем из самого подходящего хранимого.
+    Результат кэшируется по (инструмент, интервал, диапазон, версия исходного ряда).
+    None — собрать не из чего.
+    """
+    stored = dict(
+        CandleSeries.objects.filter(instrument_id=instrument_id).values_list("interval", "updated_at")
+    )
+    if not stored:
+        # ряды, загруженные до появления отметок
+        stored = {i: None for i in
+                  Candle.objects.filter(instrument_id=instrument_id).values_list("interval", flat=True).distinct()}
+    base = pick_base_interval(stored, interval)
+    if base is None:
+        return None
+
+    version = stored[base].timestamp() if stored[base] else 0
+    key = "candles:rs:{}:{}:{}:{}:{}:{}:{}".format(
+        instrument_id, base, interval,
+        dt_from.isoformat() if dt_from else "", dt_to.isoformat() if dt_to else "",
+        limit or "", version,
+    )
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    qs = Candle.objects.filter(instrument_id=instrument_id, interval=base)
+    if dt_from:
+        qs = qs.filter(dt__gte=dt_from)
+    if dt_to:
+        qs = qs.filter(dt__lte=dt_to)
+
+    ratio = interval // base
+    if limit:
+        # в корзине не больше ratio исходных баров → (limit + 1) * ratio строк хватит на limit корзин;
+        # лишняя корзина — на случай, если первая попала неполной
+        want = (limit + 1) * ratio if ratio > 1 else limit
+        bars = {k: v[::-1] for k, v in _query_bars(qs.order_by("-dt")[:want]).items()}
+        truncated = ratio > 1 and bars["ts"].size == want
+    else:
+        bars = _query_bars(qs.order_by("dt"))
+        truncated = False
+
+    if ratio > 1:
+        bars = resample_arrays(bars, interval)
+        if truncated and bars["ts"].size > 1:
+            bars = {k: v[1:] for k, v in bars.items()}
+    if limit:
+        bars = {k: v[-limit:] for k, v in bars.items()}
+
+    cache.set(key, bars, timeout=RESAMPLE_CACHE_TTL)
+    return bars
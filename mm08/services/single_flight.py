@@ -0,0 +1,113 @@
+# Project/mm08/services/single_flight.py
+from __future__ import annotations
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional, TypeVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+T = TypeVar("T")
+
+POLL_SEC = 0.05
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Значения нет, а процесс с локом не успел его посчитать за wait секунд."""
+
+
+def _lock_path(key: str) -> Path:
+    root = Path(getattr(settings, "SINGLE_FLIGHT_DIR", Path(settings.BASE_DIR) / ".cache" / "locks"))
+    root.mkdir(parents=True, exist_ok=True)
+    return root / (hashlib.sha1(key.encode()).hexdigest() + ".lock")
+
+
+def _acquire(key: str, lock_ttl: float) -> bool:
+    """
+    Межпроцессный лок: атомарное создание файла (O_EXCL) — работает одинаково
+    на Linux и Windows и не зависит от атомарности add() у бэкенда кэша.
+    Лок старше lock_ttl считаем брошенным (воркер упал) и перехватываем.
+    """
+    path = _lock_path(key)
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - path.stat().st_mtime < lock_ttl:
+                    return False
+                path.unlink()
+            except FileNotFoundError:
+                pass  # лок только что отпустили — пробуем ещё раз
+    return False
+
+
+def _release(key: str) -> None:
+    try:
+        _lock_path(key).unlink()
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def try_lock(key: str, lock_ttl: float = 60.0) -> Iterator[bool]:
+    """
+    Неблокирующий межпроцессный лок по ключу: внутри блока True — лок наш (отпустится
+    на выходе), False — его держит другой процесс. Тот же лок, что у single_flight.
+    """
+    acquired = _acquire(key, lock_ttl)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            _release(key)
+
+
+def single_flight(
+    key: str,
+    fill: Callable[[], T],
+    *,
+    ttl: int,
+    stale_ttl: Optional[int] = None,
+    wait: float = 10.0,
+    lock_ttl: float = 60.0,
+) -> T:
+    """
+    Значение из общего кэша; при промахе его пересчитывает ровно один процесс.
+
+    Свежее значение (моложе ttl) — сразу из кэша. Устаревшее, но ещё хранимое
+    (ttl + stale_ttl) — пересчитывает тот, кто взял лок, остальные отдают старое.
+    Если значения нет вовсе — остальные ждут до wait секунд, затем SingleFlightTimeout:
+    не устраивать толпу запросов к источнику, который и так не отвечает держателю лока.
+    """
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+    entry = cache.get(key)
+    if entry is not None and entry[0] > time.time():
+        return entry[1]
+
+    deadline = time.time() + wait
+    while True:
+        if _acquire(key, lock_ttl):
+            try:
+                # пока ждали лок, значение мог обновить другой процесс
+                entry = cache.get(key)
+                if entry is not None and entry[0] > time.time():
+                    return entry[1]
+                value = fill()
+                cache.set(key, (time.time() + ttl, value), timeout=ttl + stale_ttl)
+                return value
+            finally:
+                _release(key)
+
+        if entry is not None:
+            return entry[1]  # отдаём устаревшее, пока другой процесс обновляет
+        if time.time() >= deadline:
+            raise SingleFlightTimeout(f"{key}: no value after {wait:g}s")
+        time.sleep(POLL_SEC)
+        entry = cache.get(key)
+        if entry is not None and entry[0] > time.time():
+            return entry[1]
@@ -0,0 +1,125 @@
+# Project/mm08/services/snapshot_cache.py
+from __future__ import annotations
+import datetime as dt
+import hashlib
+import time
+from typing import Callable, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from mm08.models import HeatSnapshot
+
+# Прошлые даты пересобирают редко (refresh с date=, load_heatmap --date), но могут —
+# поэтому не immutable, а короткий max-age: после пересборки клиент увидит её через минуты
+PAST_MAX_AGE = 5 * 60
+
+# Страницы теплокарты в кэше: ключ несёт версию доски, TTL — только страховка от правок в обход сервисов
+HEATMAP_PAGE_TTL = 10 * 60
+_VERSION_KEY = "heatmap:ver:{board}"
+
+# (updated_at, число плиток, дата снапшота)
+SnapshotState = Tuple[dt.datetime, int, dt.date]
+
+
+def snapshot_state(snapshot_id) -> Optional[SnapshotState]:
+    """Версия снапшота одним запросом: updated_at + число плиток (+ дата для политики кэша)."""
+    return (
+        HeatSnapshot.objects.filter(pk=snapshot_id)
+        .annotate(n=Count("tiles"))
+        .values_list("updated_at", "n", "date")
+        .first()
+    )
+
+
+def touch_snapshot(snapshot: HeatSnapshot) -> None:
+    """Плитки снапшота переписаны — сдвигаем updated_at (версию для ETag)."""
+    snapshot.save(update_fields=["updated_at"])
+
+
+def query_tag(request: HttpRequest) -> str:
+    """Короткий отпечаток query string: разные страницы/параметры — разные ETag."""
+    qs = request.GET.urlencode()
+    return "-" + hashlib.md5(qs.encode(), usedforsecurity=False).hexdigest()[:10] if qs else ""
+
+
+def snapshot_etag(snapshot_id, state: SnapshotState, extra: str = "") -> str:
+    updated_at, tiles, _ = state
+    return quote_etag(f"s{snapshot_id}-{int(updated_at.timestamp() * 1_000_000)}-{tiles}{extra}")
+
+
+def conditional_response(
+    request: HttpRequest,
+    etag: str,
+    last_modified: dt.datetime,
+    render: Callable[[], HttpResponse],
+    *,
+    max_age: Optional[int] = None,
+    private: bool = False,
+) -> HttpResponse:
+    """
+    Conditional GET: при совпадении If-None-Match / If-Modified-Since — 304 без рендера,
+    иначе render(). В оба ответа кладём ETag, Last-Modified и Cache-Control:
+    max_age — кэшировать столько секунд без ревалидации, иначе no-cache (каждый раз ревалидация, но дешёвая).
+    """
+    ts = int(last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=ts)
+    if response is None:
+        response = render()
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(ts)
+    if max_age:
+        patch_cache_control(response, public=True, max_age=max_age)
+    else:
+        patch_cache_control(response, no_cache=True, **({"private": True} if private else {"public": True}))
+    return response
+
+
+def is_past(state: SnapshotState) -> bool:
+    """Снапшот прошлой даты: обычные обновления пишут в сегодняшний, прошлый меняет только ручная пересборка."""
+    return state[2] < timezone.localdate()
+
+
+def heatmap_version(board: str) -> int:
+    """
+    Текущая версия данных доски (только кэш, без БД). Начальное значение — время в нс:
+    после вытеснения ключа новая версия не совпадёт ни с одной из старых.
+    """
+    key = _VERSION_KEY.format(board=board)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_heatmap_version(board: str) -> None:
+    """Снапшоты доски изменились: все закэшированные страницы доски становятся недостижимы."""
+    def bump() -> None:
+        key = _VERSION_KEY.format(board=board)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+    # после коммита: иначе читатель успеет закэшировать старые данные под новой версией
+    transaction.on_commit(bump)
+
+
+def heatmap_labels(board: str) -> List[str]:
+    """Метки снапшотов доски — из кэша под версией доски (новая метка появится вместе с версией)."""
+    key = f"heatmap:labels:{board}:{heatmap_version(board)}"
+    labels = cache.get(key)
+    if labels is None:
+        labels = sorted(set(HeatSnapshot.objects.filter(board=board).values_list("label", flat=True)))
+        cache.set(key, labels, timeout=HEATMAP_PAGE_TTL)
+    return labels
+
+
+def heatmap_page_key(board: str, label: str, page: int, per: int) -> str:
+    """Ключ страницы; board/label/page/per уже нормализованы вызывающим — иначе ключей без счёта."""
+    return f"heatmap:page:{board}:{label}:{heatmap_version(board)}:{page}:{per}"
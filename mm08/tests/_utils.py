@@ -1,3 +1,93 @@
 # MM/mm08/tests/_utils.py
+import datetime as dt
+
+
 def html(resp) -> str:
     return resp.content.decode("utf-8")
+
+
+class FakeIssBoard:
+    """
+    Синтетическая доска ISS для тестов: отвечает на securities.json так же, как биржа —
+    с учётом iss.only, <block>.columns и постраничного start (если он передан).
+    """
+    SEC_COLUMNS = ["SECID", "BOARDID", "SHORTNAME", "LOTSIZE"]
+    MD_COLUMNS = ["SECID", "LAST", "OPEN", "HIGH", "LOW", "PREVPRICE", "CHANGE", "LASTCHANGEPRC",
+                  "LASTTOPREVPRICE", "VOLUME", "VALTODAY", "VOLTODAY", "NUMTRADES"]
+
+    def __init__(self, size: int = 250, board: str = "TQBR", pagesize: int = 100):
+        self.board, self.pagesize = board, pagesize
+        self.securities = [[f"T{i:04d}", board, f"Бумага {i}", 10] for i in range(size)]
+        self.marketdata = [
+            [f"T{i:04d}", 100.0 + i, 100.0, 101.0 + i, 99.0, 100.0, float(i), i / 100,
+             i / 100, 10 * i, 1000 * i, 10 * i, i]
+            for i in range(size)
+        ]
+        self.calls = []
+
+    def _block(self, columns, rows, wanted):
+        if not wanted:
+            return {"columns": list(columns), "data": [list(r) for r in rows]}
+        idx = [columns.index(c) for c in wanted.split(",") if c in columns]
+        return {"columns": [columns[i] for i in idx], "data": [[r[i] for i in idx] for r in rows]}
+
+    def get(self, url, params, timeout):
+        params = dict(params or {})
+        self.calls.append((url, params))
+        only = (params.get("iss.only") or "securities,marketdata").split(",")
+        start = int(params.get("start") or 0)
+        paged = "start" in params
+        end = start + self.pagesize if paged else len(self.securities)
+
+        out = {}
+        if "securities" in only:
+            out["securities"] = self._block(
+                self.SEC_COLUMNS, self.securities[start:end], params.get("securities.columns"))
+        if "marketdata" in only:
+            out["marketdata"] = self._block(
+                self.MD_COLUMNS, self.marketdata[start:end], params.get("marketdata.columns"))
+        if "securities.cursor" in only:
+            out["securities.cursor"] = {"columns": ["INDEX", "TOTAL", "PAGESIZE"],
+                                        "data": [[start, len(self.securities), self.pagesize]]}
+        return out
+
+
+class FakeIssCandles:
+    """
+    Синтетический candles.json: бары каждые interval минут с 10:00 до 18:50 по каждому дню
+    диапазона from..till, страницами по pagesize (как у ISS — без курсора).
+    """
+    ISS_MINUTES = {1: 1, 10: 10, 60: 60, 24: 24 * 60}
+
+    def __init__(self, pagesize: int = 500):
+        self.pagesize = pagesize
+        self.calls = []
+
+    def bars(self, secid, date_from, date_till, minutes):
+        out = []
+        since = dt.datetime.fromisoformat(date_from)  # from — дата или «дата время», как у ISS
+        day = since.date()
+        till = dt.date.fromisoformat(date_till)
+        base = sum(map(ord, secid)) % 100
+        while day <= till:
+            t = dt.datetime.combine(day, dt.time(10, 0))
+            end = dt.datetime.combine(day, dt.time(18, 50))
+            while t <= end:
+                if t < since:
+                    t += dt.timedelta(minutes=minutes)
+                    continue
+                price = base + t.hour + t.minute / 100
+                out.append([t.isoformat(sep=" "), price, price + 1, price - 1, price + 0.5, t.minute + 1])
+                t += dt.timedelta(minutes=minutes)
+            day += dt.timedelta(days=1)
+        return out
+
+    def get(self, url, params, timeout):
+        params = dict(params or {})
+        self.calls.append((url, params))
+        secid = url.rsplit("/securities/", 1)[1].split("/")[0]
+        minutes = self.ISS_MINUTES[int(params["interval"])]
+        rows = self.bars(secid, params["from"], params["till"], minutes)
+        start = int(params.get("start") or 0)
+        return {"candles": {"columns": ["begin", "open", "high", "low", "close", "volume"],
+                            "data": rows[start:start + self.pagesize]}}
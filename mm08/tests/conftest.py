@@ -1,14 +1,43 @@
 # MM/mm08/tests/conftest.py
 import pytest
 from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test.utils import override_settings
 from mixer.backend.django import mixer as _mixer
 from allusers.models import User
+from mm08.services import iss_client
+from mm08.services.iss_client import IssClient
+from ._utils import FakeIssBoard
 
 @pytest.fixture(autouse=True)
 def _db(db):
     """Автоматически включаем БД для всех тестов в этом пакете."""
     pass
 
+# Кэш в памяти на весь прогон: файловый из settings — рабочий (.cache/ в репозитории).
+# Включается при загрузке conftest, до сбора модулей: сбор уже обращается к `cache`.
+_local_cache = override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "mm08-tests"}}
+)
+
+
+def pytest_configure(config):
+    _local_cache.enable()
+
+
+def pytest_unconfigure(config):
+    _local_cache.disable()
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache(settings, tmp_path):
+    """Пустой кэш и свои каталоги локов single-flight и доски котировок на каждый тест."""
+    settings.SINGLE_FLIGHT_DIR = tmp_path / "locks"
+    settings.QUOTES_DIR = tmp_path / "quotes"
+    cache.clear()
+    yield
+
+
 @pytest.fixture
 def mixer():
     """Удобный алиас, чтобы писать mixer.blend(...) в тестах."""
@@ -31,3 +60,13 @@ def manager() -> User:
 def logged_client(client, analyst):
     client.login(username="analyst", password="p")
     return client
+
+@pytest.fixture
+def iss_board(monkeypatch):
+    """Фабрика фейковой доски ISS вместо сети: iss_board(5) → FakeIssBoard на 5 бумаг."""
+    def _use(size: int) -> FakeIssBoard:
+        cache.clear()  # справка доски в кэше — от прежней фейковой доски
+        board = FakeIssBoard(size=size)
+        monkeypatch.setattr(iss_client, "_client", IssClient(board))
+        return board
+    return _use
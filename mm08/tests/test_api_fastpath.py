@@ -0,0 +1,54 @@
+# MM/mm08/tests/test_api_fastpath.py
+import datetime as dt
+import io
+import json
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from mm08.models import Candle, HeatTile
+from mm08.renderers import FastJSONRenderer
+from mm08.serializers import CandleSerializer, HeatTileSerializer
+
+
+def _as_json(data):
+    return json.loads(JSONRenderer().render(data))
+
+
+def test_candle_endpoints_match_serializer(mixer):
+    inst = mixer.blend("mm08.Instrument", ticker="SBER")
+    start = timezone.make_aware(dt.datetime(2025, 3, 3, 10, 0, 0, 250_000))
+    for i in range(7):
+        Candle.objects.create(instrument=inst, interval=1, dt=start + dt.timedelta(minutes=i),
+                              open=1.5, high=2.25, low=1.0, close=2.0, volume=i)
+    expected = _as_json(CandleSerializer(Candle.objects.order_by("-dt"), many=True).data)
+
+    client = APIClient()
+    assert client.get("/api/candles/?page_size=50").json()["results"] == expected
+    assert client.get("/api/candles/latest/?instrument=SBER&limit=3").json() == expected[:3]
+
+
+def test_tile_endpoints_match_serializer(mixer):
+    snap = mixer.blend("mm08.HeatSnapshot", board="TQBR", label="fast")
+    for i, pct in enumerate([Decimal("1.5"), None, Decimal("-0.125")]):
+        HeatTile.objects.create(snapshot=snap, ticker=f"T{i}", shortname="Тест ", last=Decimal("12.3"),
+                                change_pct=pct)
+    qs = HeatTile.objects.filter(snapshot=snap).order_by("-change_pct")
+    expected = _as_json(HeatTileSerializer(qs, many=True).data)
+
+    client = APIClient()
+    assert client.get(f"/api/heat/snapshots/{snap.id}/tiles/").json()["results"] == expected
+    assert client.get("/api/heat/tiles/").json()["results"] == expected
+    assert FastJSONRenderer().render(expected) == JSONRenderer().render(expected)
+
+
+def test_bench_api_reports_variants():
+    out = io.StringIO()
+    call_command("bench_api", "--rows", "30", stdout=out)
+    text = out.getvalue()
+    for name in ("candles/serializer", "candles/fast", "tiles/serializer", "tiles/fast"):
+        assert name in text
+    assert not Candle.objects.exists()
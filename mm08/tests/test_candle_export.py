@@ -0,0 +1,48 @@
+# MM/mm08/tests/test_candle_export.py
+import datetime as dt
+import io
+
+import numpy as np
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from mm08.models import Candle
+
+
+def _seed(mixer):
+    start = timezone.make_aware(dt.datetime(2025, 3, 3, 10, 0))
+    for n, ticker in enumerate(("GAZP", "SBER")):
+        inst = mixer.blend("mm08.Instrument", ticker=ticker)
+        Candle.objects.bulk_create([
+            Candle(instrument=inst, interval=1, dt=start + dt.timedelta(days=d, minutes=i),
+                   open=n + i, high=n + i + 1, low=n + i - 1, close=n + i + 0.5, volume=i)
+            for d in range(3) for i in range(10)
+        ])
+    return int(start.timestamp())
+
+
+def test_export_command_writes_npz_in_chunks(mixer, tmp_path):
+    first = _seed(mixer)
+    out = tmp_path / "candles.npz"
+    call_command("export_candles", "--tickers", "SBER,GAZP", "--interval", "M1", "--from", "2025-03-04",
+                 "--to", "2025-03-05", "--out", str(out), "--chunk", "7", stdout=io.StringIO())
+
+    data = np.load(out)
+    assert data["tickers"].tolist() == ["GAZP", "SBER"]
+    assert data["t"].size == 2 * 2 * 10
+    assert data["t"].dtype == np.int64 and data["open"].dtype == np.float64
+    assert data["t"][0] == first + 86400
+    sber = data["instrument"] == 1
+    assert data["open"][sber][:3].tolist() == [1.0, 2.0, 3.0]
+    assert data["volume"].sum() == 4 * sum(range(10))
+
+
+def test_export_endpoint(mixer):
+    _seed(mixer)
+    resp = APIClient().get("/api/candles/export/?tickers=SBER&interval=M1&compress=1")
+    assert resp.status_code == 200
+    data = np.load(io.BytesIO(b"".join(resp.streaming_content)))
+    assert data["t"].size == 30 and set(data["instrument"].tolist()) == {0}
+
+    assert APIClient().get("/api/candles/export/?interval=M1").status_code == 400
@@ -0,0 +1,57 @@
+# MM/mm08/tests/test_candles_api.py
+import base64
+import datetime as dt
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from mm08.models import Candle
+
+
+def _blend_candles(mixer, count: int):
+    """Два инструмента с одинаковыми dt — ключи dt повторяются, порядок держит id."""
+    start = timezone.make_aware(dt.datetime(2025, 3, 3, 10, 0))
+    for ticker in ("SBER", "GAZP"):
+        inst = mixer.blend("mm08.Instrument", ticker=ticker)
+        Candle.objects.bulk_create([
+            Candle(instrument=inst, interval=1, dt=start + dt.timedelta(minutes=i),
+                   open=1, high=1, low=1, close=1, volume=1)
+            for i in range(count)
+        ])
+
+
+def test_candles_keyset_pagination_walks_forward_and_back(mixer):
+    _blend_candles(mixer, 12)
+    client = APIClient()
+
+    seen, pages = [], []
+    url = "/api/candles/?page_size=5"
+    while url:
+        with CaptureQueriesContext(connection) as queries:
+            payload = client.get(url).json()
+        assert not any("COUNT(" in q["sql"].upper() for q in queries.captured_queries)
+        assert "count" not in payload
+        pages.append(payload)
+        seen.extend((c["instrument"], c["dt"]) for c in payload["results"])
+        url = payload["next"]
+
+    assert len(seen) == len(set(seen)) == 24
+    assert [len(p["results"]) for p in pages] == [5, 5, 5, 5, 4]
+    assert pages[0]["previous"] is None
+    assert seen == sorted(seen, key=lambda k: k[1], reverse=True)
+
+    back = client.get(pages[2]["previous"]).json()
+    assert back["results"] == pages[1]["results"]
+
+    assert client.get("/api/candles/?cursor=garbage").status_code == 404
+    bad_date = base64.urlsafe_b64encode(b'{"d":"yesterday","i":1,"r":0}').decode()
+    assert client.get(f"/api/candles/?cursor={bad_date}").status_code == 404
+
+
+def test_candles_interval_filter(mixer):
+    _blend_candles(mixer, 3)
+    client = APIClient()
+    assert len(client.get("/api/candles/?interval=M1").json()["results"]) == 6
+    assert client.get("/api/candles/?interval=H1").json()["results"] == []
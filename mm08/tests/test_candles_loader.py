@@ -0,0 +1,78 @@
+# MM/mm08/tests/test_candles_loader.py
+import datetime as dt
+import io
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from mm08.models import Candle, CandleSeries, Instrument
+from mm08.services import iss_client
+from mm08.services.candles import date_chunks, sync_candles
+from mm08.services.iss_client import IssClient
+from ._utils import FakeIssCandles
+
+
+def test_date_chunks_cover_range_without_gaps():
+    chunks = date_chunks(dt.date(2025, 1, 1), dt.date(2025, 1, 9), Candle.Interval.M1)
+    assert chunks[0] == (dt.date(2025, 1, 1), dt.date(2025, 1, 2))
+    assert chunks[-1] == (dt.date(2025, 1, 9), dt.date(2025, 1, 9))
+    assert len(chunks) == 5
+
+
+def test_load_moex_batch_loads_candles_idempotently(monkeypatch):
+    iss = FakeIssCandles(pagesize=500)
+    monkeypatch.setattr(iss_client, "_client", IssClient(iss))
+    args = ("load_moex_batch", "--tickers", "SBER,GAZP", "--from", "2025-01-01", "--to", "2025-01-03",
+            "--interval", "1", "--workers", "3")
+
+    call_command(*args, stdout=io.StringIO())
+    per_day = 8 * 60 + 51  # 10:00..18:50 по минуте
+    assert Candle.objects.filter(instrument__ticker="SBER", interval=1).count() == 3 * per_day
+    assert Candle.objects.count() == 2 * 3 * per_day
+    assert set(Instrument.objects.values_list("ticker", flat=True)) == {"SBER", "GAZP"}
+    # пагинация: в каждом куске больше 500 баров → несколько страниц
+    assert any(p["start"] == "500" for _, p in iss.calls)
+
+    first = Candle.objects.filter(instrument__ticker="GAZP").order_by("dt").first()
+    assert timezone.localtime(first.dt).strftime("%H:%M") == "10:00"
+
+    # повторный запуск ничего не дублирует
+    call_command(*args, stdout=io.StringIO())
+    assert Candle.objects.count() == 2 * 3 * per_day
+
+
+def test_sync_candles_fetches_only_after_high_water_mark(monkeypatch):
+    iss = FakeIssCandles()
+    monkeypatch.setattr(iss_client, "_client", IssClient(iss))
+    call_command("load_moex_batch", "--tickers", "SBER", "--from", "2025-01-01", "--to", "2025-01-03",
+                 "--interval", "60", stdout=io.StringIO())
+    series = CandleSeries.objects.get(instrument__ticker="SBER", interval=60)
+    assert timezone.localtime(series.last_dt) == timezone.make_aware(dt.datetime(2025, 1, 3, 18, 0))
+
+    iss.calls.clear()
+    saved = sync_candles(["SBER"], Candle.Interval.H1, overlap_bars=2, till=dt.date(2025, 1, 5))
+    # запрашиваем только с отметки минус перекрытие, а не весь диапазон заново
+    assert {p["from"] for _, p in iss.calls} == {"2025-01-03 16:00:00"}
+    # 16:00, 17:00, 18:00 (перекрытие) + по 9 баров за 4 и 5 января
+    assert saved == {"SBER": 3 + 2 * 9}
+    series.refresh_from_db()
+    assert timezone.localtime(series.last_dt).date() == dt.date(2025, 1, 5)
+    assert Candle.objects.filter(instrument__ticker="SBER", interval=60).count() == 5 * 9
+
+
+def test_sync_candles_sends_mark_time_as_iss_from(monkeypatch):
+    iss = FakeIssCandles(pagesize=100)
+    monkeypatch.setattr(iss_client, "_client", IssClient(iss))
+    call_command("load_moex_batch", "--tickers", "SBER", "--from", "2025-01-03", "--to", "2025-01-03",
+                 "--interval", "10", stdout=io.StringIO())
+    # отметка посреди дня: последний бар 14:30
+    mark = timezone.make_aware(dt.datetime(2025, 1, 3, 14, 30))
+    Candle.objects.filter(instrument__ticker="SBER", dt__gt=mark).delete()
+    CandleSeries.objects.filter(instrument__ticker="SBER").update(last_dt=mark)
+
+    iss.calls.clear()
+    saved = sync_candles(["SBER"], Candle.Interval.M10, overlap_bars=2, till=dt.date(2025, 1, 3))
+    assert [p["from"] for _, p in iss.calls] == ["2025-01-03 14:10:00", "2025-01-03 14:10:00"]  # 1 страница + пустая
+    # 14:10..18:50 — бары с начала перекрытия, без утренних
+    assert saved == {"SBER": 29}
+    assert Candle.objects.filter(instrument__ticker="SBER", interval=10).count() == 54  # день целиком
@@ -0,0 +1,77 @@
+# MM/mm08/tests/test_decimate.py
+import datetime as dt
+
+import numpy as np
+from django.core.cache import cache
+from django.urls import reverse
+
+from mm08 import views
+from mm08.models import Candle
+from mm08.services.candles import upsert_candles
+from mm08.services.decimate import lttb_indices, minmax_ohlc
+
+
+def _bars(size: int):
+    rng = np.random.default_rng(7)
+    close = 100 + np.cumsum(rng.normal(size=size))
+    close[size // 3] += 50  # выброс, который должен пережить прореживание
+    return {
+        "ts": np.arange(size, dtype=np.int64) * 60,
+        "open": close - 0.1,
+        "high": close + 0.5,
+        "low": close - 0.5,
+        "close": close,
+        "volume": np.ones(size, dtype=np.int64),
+    }
+
+
+def test_minmax_keeps_extremes_and_volume():
+    bars = _bars(10_000)
+    small = minmax_ohlc(bars, 100)
+    assert small["ts"].size == 100
+    assert small["high"].max() == bars["high"].max()
+    assert small["low"].min() == bars["low"].min()
+    assert small["volume"].sum() == 10_000
+    assert small["open"][0] == bars["open"][0] and small["close"][-1] == bars["close"][-1]
+
+
+def test_lttb_keeps_endpoints_and_spike():
+    bars = _bars(10_000)
+    idx = lttb_indices(bars["ts"], bars["close"], 200)
+    assert idx.size == 200
+    assert idx[0] == 0 and idx[-1] == 9_999
+    assert np.all(np.diff(idx) > 0)
+    assert 10_000 // 3 in idx
+    assert lttb_indices(bars["ts"][:50], bars["close"][:50], 200).size == 50
+    assert lttb_indices(bars["ts"], bars["close"], 1).tolist()[::2] == [0, 9_999]
+
+
+def test_chart_data_points_mode(logged_client, mixer):
+    cache.clear()
+    inst = mixer.blend("mm08.Instrument", ticker="SBER")
+    start = dt.datetime(2025, 3, 3, 10, 0)
+    bars = [((start + dt.timedelta(minutes=i)).isoformat(), 1.0, 2.0 + i, 0.5, 1.5, 1) for i in range(500)]
+    upsert_candles(inst.id, Candle.Interval.M1, bars)
+
+    url = reverse("mm08:chart_data", kwargs={"ticker": "SBER"})
+    payload = logged_client.get(url + "?interval=M1&points=50").json()
+    assert payload["count"] == 50
+    assert payload["data"][-1]["h"] == 2.0 + 499
+    assert sum(d["v"] for d in payload["data"]) == 500
+
+    assert logged_client.get(url + "?points=20&mode=lttb").json()["count"] == 20
+    assert logged_client.get(url + "?points=20&mode=bogus").status_code == 400
+    assert logged_client.get(url + "?points=1&mode=lttb").json()["count"] == 3
+
+
+def test_chart_data_points_without_range_is_windowed(logged_client, mixer, monkeypatch):
+    monkeypatch.setattr(views, "DECIMATE_WINDOW", 100)
+    inst = mixer.blend("mm08.Instrument", ticker="GAZP")
+    start = dt.datetime(2025, 3, 3, 10, 0)
+    bars = [((start + dt.timedelta(minutes=i)).isoformat(), 1.0, 2.0 + i, 0.5, 1.5, 1) for i in range(500)]
+    upsert_candles(inst.id, Candle.Interval.M1, bars)
+
+    url = reverse("mm08:chart_data", kwargs={"ticker": "GAZP"})
+    payload = logged_client.get(url + "?points=50").json()
+    assert sum(d["v"] for d in payload["data"]) == 100  # только последние 100 баров
+    assert payload["data"][-1]["h"] == 2.0 + 499
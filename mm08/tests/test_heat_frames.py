@@ -0,0 +1,121 @@
+# MM/mm08/tests/test_heat_frames.py
+import datetime as dt
+import io
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from mm08.models import HeatFrame, HeatTile
+from mm08.services import heat_frames
+from mm08.services.heat_frames import frame_at, frame_times, record_frame
+from mm08.services.heatmap import build_snapshot
+
+T0 = timezone.make_aware(dt.datetime.combine(timezone.localdate(), dt.time(10, 0)))
+
+
+def at(minutes):
+    return T0 + dt.timedelta(minutes=minutes)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_tails():
+    heat_frames._tails.clear()  # кадры откатываются вместе с транзакцией теста
+    yield
+
+
+def test_deltas_replay_to_frame_at_or_before():
+    tickers = ["SBER", "GAZP", "LKOH"]
+    key = record_frame("TQBR", tickers, [300.0, 150.0, 7000.0], [1.0, -0.5, None], ts=at(0))
+    assert key.is_key and key.size == 3
+    delta = record_frame("TQBR", ["LKOH", "GAZP", "SBER"], [7010.0, 150.0, 300.0], [0.2, -0.5, 1.0], ts=at(1))
+    assert not delta.is_key and delta.size == 1  # изменилась одна бумага — в кадре только она
+    assert record_frame("TQBR", tickers, [300.0, 150.0, 7010.0], [1.0, -0.5, 0.2], ts=at(2)) is None  # без изменений
+    record_frame("TQBR", tickers, [301.0, 150.0, 7010.0], [1.3, -0.5, 0.2], ts=at(3))
+
+    assert frame_at("TQBR", at(0) - dt.timedelta(seconds=1)) is None
+    assert {r["ticker"]: r["last"] for r in frame_at("TQBR", at(0)).rows()}["LKOH"] == 7000.0
+    state = frame_at("TQBR", at(2))  # между кадрами — последний до T
+    assert state.ts == at(1)
+    assert state.rows()[2] == {"ticker": "LKOH", "last": 7010.0, "change_pct": 0.2}
+    assert frame_at("TQBR").rows()[0] == {"ticker": "SBER", "last": 301.0, "change_pct": 1.3}
+    assert [key for _, key in frame_times("TQBR")] == [True, False, False]
+
+
+def test_keyframe_on_new_ticker_and_period(monkeypatch):
+    monkeypatch.setattr(heat_frames, "KEYFRAME_EVERY", 3)
+    for i in range(4):
+        record_frame("TQBR", ["SBER"], [100.0 + i], [i], ts=at(i))
+    record_frame("TQBR", ["SBER", "NEW"], [200.0, 5.0], [0, 0], ts=at(10))
+    assert list(HeatFrame.objects.values_list("is_key", flat=True)) == [True, False, False, True, True]
+
+    heat_frames._tails.clear()  # другой процесс восстанавливает хвост из БД
+    record_frame("TQBR", ["SBER", "NEW"], [201.0, 5.0], [0, 0], ts=at(11))
+    assert frame_at("TQBR").rows() == [
+        {"ticker": "SBER", "last": 201.0, "change_pct": 0.0},
+        {"ticker": "NEW", "last": 5.0, "change_pct": 0.0},
+    ]
+
+
+def test_keyframe_when_ticker_leaves_board():
+    record_frame("TQBR", ["GONE", "SBER"], [50.0, 300.0], [1, 2], ts=at(0))
+    record_frame("TQBR", ["SBER"], [300.0], [2], ts=at(1))  # GONE делистинговали, SBER не менялся
+    assert list(HeatFrame.objects.values_list("is_key", flat=True)) == [True, True]
+    assert frame_at("TQBR").tickers == ["SBER"]
+    assert frame_at("TQBR", at(0)).tickers == ["GONE", "SBER"]
+
+
+def test_refresh_paths_append_frames(iss_board):
+    iss = iss_board(4)
+    build_snapshot(board="TQBR", label="fast")
+    assert HeatFrame.objects.filter(board="TQBR", is_key=True).count() == 1
+
+    iss.marketdata[2][1] = 1.0
+    call_command("poll_quotes", "--once", "--boards", "TQBR", stdout=io.StringIO())
+    iss.marketdata[3][1] = 2.0
+    tiles = HeatTile.objects.count()
+    call_command("load_heatmap", "--series", stdout=io.StringIO())
+    assert HeatTile.objects.count() == tiles  # --series: плитки не переписываются
+    assert HeatFrame.objects.count() == 3
+    last = {r["ticker"]: r["last"] for r in frame_at("TQBR").rows()}
+    assert last["T0002"] == 1.0 and last["T0003"] == 2.0
+
+
+def test_writers_build_the_same_frame(iss_board):
+    iss = iss_board(4)
+    iss.marketdata[1][1] = None  # нет цены — в кадре NaN у всех писателей, а не 0
+    build_snapshot(board="TQBR", label="fast")
+    # листинг днём: бумаги ещё нет в закэшированной справке, но в кадрах она уже есть у всех
+    iss.securities.append(["T9999", "TQBR", "Новая", 10])
+    iss.marketdata.append(["T9999", *iss.marketdata[3][1:]])
+    call_command("poll_quotes", "--once", "--boards", "TQBR", stdout=io.StringIO())
+    call_command("load_heatmap", "--series", stdout=io.StringIO())
+    build_snapshot(board="TQBR", label="fast")
+    assert HeatFrame.objects.count() == 2  # после нового ключевого кадра — ни одной пустой дельты
+
+    state = frame_at("TQBR")
+    assert state.tickers == ["T0000", "T0001", "T0002", "T0003", "T9999"]
+    assert state.rows()[1]["last"] is None
+
+
+def test_series_rejects_date_and_label():
+    for extra in (["--date", "2024-01-01"], ["--label", "close"]):
+        with pytest.raises(CommandError):
+            call_command("load_heatmap", "--series", *extra, stdout=io.StringIO())
+
+
+def test_frames_api(client):
+    record_frame("TQBR", ["SBER"], [300.0], [1.0], ts=at(0))
+    record_frame("TQBR", ["SBER"], [305.0], [2.5], ts=at(5))
+
+    listing = client.get("/api/heat/frames/?board=TQBR").json()
+    assert listing["count"] == 2 and listing["frames"][0]["key"] is True
+
+    resp = client.get("/api/heat/frames/at/", {"board": "TQBR", "at": at(3).isoformat()})
+    assert dt.datetime.fromisoformat(resp.json()["ts"]) == at(0) and resp.json()["rows"][0]["last"] == 300.0
+    again = client.get("/api/heat/frames/at/", {"board": "TQBR", "at": at(3).isoformat()}, HTTP_IF_NONE_MATCH=resp["ETag"])
+    assert again.status_code == 304
+    assert client.get("/api/heat/frames/at/").json()["rows"][0]["change_pct"] == 2.5
+    assert client.get("/api/heat/frames/at/", {"at": "2000-01-01T00:00:00"}).status_code == 404
+    assert client.get("/api/heat/frames/at/", {"at": "вчера"}).status_code == 400
+    assert client.get("/api/heat/frames/?board=XXXX").status_code == 400
@@ -0,0 +1,49 @@
+# MM/mm08/tests/test_heatmap_export.py
+import csv
+import datetime as dt
+import io
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+
+from mm08.models import HeatSnapshot, HeatTile
+
+
+def _snapshot(day: int, label: str = "fast", board: str = "TQBR"):
+    snap = HeatSnapshot.objects.create(date=dt.date(2025, 3, day), board=board, label=label)
+    HeatTile.objects.bulk_create([
+        HeatTile(snapshot=snap, ticker=t, shortname=t.title(), last=Decimal("10.5"), change_pct=pct)
+        for t, pct in (("SBER", Decimal("1.250")), ("GAZP", None))
+    ])
+    return snap
+
+
+def _rows(resp):
+    assert isinstance(resp, StreamingHttpResponse)
+    return list(csv.reader(io.StringIO(b"".join(resp.streaming_content).decode())))
+
+
+def test_export_latest_snapshot_by_default(logged_client):
+    _snapshot(3)
+    _snapshot(5)
+    _snapshot(7, board="TQTF")
+    resp = logged_client.get(reverse("mm08:heatmap_export"))
+    rows = _rows(resp)
+    assert rows[0] == ["date", "label", "ticker", "shortname", "last", "change_pct", "turnover", "volume"]
+    assert [r[:3] for r in rows[1:]] == [["2025-03-05", "fast", "GAZP"], ["2025-03-05", "fast", "SBER"]]
+    assert rows[1][5] == "" and rows[2][5] == "1.250"
+    assert "heatmap_TQBR_latest.csv" in resp["Content-Disposition"]
+
+
+def test_export_snapshot_range_and_all(logged_client):
+    first = _snapshot(3)
+    _snapshot(5)
+    _snapshot(9)
+    url = reverse("mm08:heatmap_export")
+
+    assert {r[0] for r in _rows(logged_client.get(url, {"snapshot": first.id}))[1:]} == {"2025-03-03"}
+    ranged = _rows(logged_client.get(url, {"date_from": "2025-03-04", "date_to": "2025-03-09"}))
+    assert [r[0] for r in ranged[1:]] == ["2025-03-05"] * 2 + ["2025-03-09"] * 2
+    assert len(_rows(logged_client.get(url, {"all": "1"}))) == 1 + 3 * 2
+    assert logged_client.get(url, {"date": "bogus"}).status_code == 400
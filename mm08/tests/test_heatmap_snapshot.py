@@ -0,0 +1,35 @@
+# MM/mm08/tests/test_heatmap_snapshot.py
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from mm08.models import HeatTile, Instrument
+from mm08.services.heatmap import build_snapshot
+
+
+def _count_queries(**kwargs) -> int:
+    with CaptureQueriesContext(connection) as ctx:
+        build_snapshot(board="TQBR", label="fast", **kwargs)
+    return len(ctx)
+
+
+def test_build_snapshot_query_count_is_constant(iss_board):
+    iss_board(20)
+    small = _count_queries(date="2025-10-01")
+    iss_board(80)
+    large = _count_queries(date="2025-10-02")
+    assert large == small
+    assert Instrument.objects.count() == 80
+    assert HeatTile.objects.filter(snapshot__date="2025-10-02").count() == 80
+
+
+def test_build_snapshot_updates_only_changed_instruments(iss_board, mixer):
+    mixer.blend(Instrument, ticker="T0000", shortname="старое имя", engine="stock", board="TQBR")
+    mixer.blend(Instrument, ticker="T0001", shortname="Бумага 1", engine="stock", board="SMAL", lot_size=7)
+    iss_board(3)
+    build_snapshot(board="TQBR", label="fast", date="2025-10-01")
+
+    by = {i.ticker: i for i in Instrument.objects.all()}
+    assert by["T0000"].shortname == "Бумага 0"
+    # существующий инструмент с другой доски: board и lot_size не трогаем
+    assert by["T0001"].board == "SMAL" and by["T0001"].lot_size == 7
+    assert by["T0002"].board == "TQBR" and by["T0002"].engine == "stock"
@@ -0,0 +1,42 @@
+# MM/mm08/tests/test_ingest_bench.py
+import pytest
+
+from mm08.models import HeatSnapshot, Instrument
+from mm08.services.iss_cassette import CassetteMiss, CassetteTransport, use_cassette
+from mm08.services.iss_client import fetch_tqbr_all
+from mm08.services.ingest_bench import STAGES, run_stages
+from ._utils import FakeIssBoard
+
+
+@pytest.fixture
+def cassette(tmp_path):
+    """Кассета, записанная один раз с синтетической доски (живой ISS не нужен)."""
+    path = tmp_path / "tqbr.json"
+    with use_cassette(path, record=True, inner=FakeIssBoard(size=250)):
+        run_stages(path, record=True)
+    return path
+
+
+def test_cassette_replays_without_network(cassette):
+    with use_cassette(cassette):
+        rows = fetch_tqbr_all()
+    assert [r["secid"] for r in rows][:3] == ["T0000", "T0001", "T0002"] and len(rows) == 250
+
+    tape = CassetteTransport(cassette)
+    with pytest.raises(CassetteMiss):
+        tape.get("https://iss.moex.com/iss/unknown.json", {}, 1)
+
+
+def test_bench_reports_every_stage(cassette):
+    results = run_stages(cassette)
+    assert [r["stage"] for r in results] == list(STAGES)
+    for r in results:
+        assert r["wall_ms"] >= 0 and r["peak_kb"] > 0
+    by = {r["stage"]: r for r in results}
+    assert by["fetch_tqbr_all"]["rows"] == 250
+    # сеть не ходит в БД: только savepoint-обвязка замера
+    assert by["fetch_tqbr_all"]["queries"] < by["build_snapshot"]["queries"]
+    assert by["build_snapshot"]["rows"] == 250
+    assert by["load_moex"]["rows"] == 250
+    # по умолчанию стадии откатываются
+    assert not HeatSnapshot.objects.exists() and not Instrument.objects.exists()
@@ -0,0 +1,61 @@
+# MM/mm08/tests/test_instrument_search.py
+from rest_framework.test import APIClient
+
+from mm08.models import Instrument
+from mm08.services import instrument_search, moex_catalog
+from mm08.services.instrument_search import SearchIndex
+from mm08.services.instrument_sync import sync_instruments
+
+
+def _index():
+    index = SearchIndex()
+    for key, ticker, name in [
+        (1, "SBER", "Сбербанк"), (2, "SBERP", "Сбербанк-п"), (3, "GAZP", "ГАЗПРОМ ао"),
+        (4, "MGNT", "Магнит ао"), (5, "AFLT", "Аэрофлот"),
+    ]:
+        index.upsert(key, ticker, ticker, name, ticker)
+    return index
+
+
+def test_ranking_prefix_substring_and_typos():
+    index = _index()
+    assert index.search("sber") == ["SBER", "SBERP"]      # точный код выше префикса
+    assert index.search("газпр") == ["GAZP"]              # префикс слова имени
+    assert index.search("ерба") == ["SBER", "SBERP"]      # подстрока
+    assert index.search("GZAP") == ["GAZP"]               # перестановка
+    assert index.search("аэрафлот") == ["AFLT"]           # замена буквы
+    assert index.search("xyz") == []
+
+    index.upsert(3, "GAZP", "GAZP", "Газпром", "GAZP*")   # переиндексация по ключу
+    index.remove(1)
+    assert index.search("газ") == ["GAZP*"]
+    assert index.search("sber") == ["SBERP"]
+    assert index.sync({5: ("AFLT", "AFLT", "Аэрофлот", "AFLT", None)}) == 3
+    assert index.search("сбер") == [] and len(index) == 1
+
+
+def test_instrument_api_search_follows_table_changes(mixer, django_capture_on_commit_callbacks):
+    client = APIClient()
+    with django_capture_on_commit_callbacks(execute=True):
+        mixer.blend("mm08.Instrument", ticker="SBER", secid="SBER", shortname="Сбербанк")
+        gazp = mixer.blend("mm08.Instrument", ticker="GAZP", secid="GAZP", shortname="Газпром")
+    assert [r["ticker"] for r in client.get("/api/instruments/?search=сбер").json()] == ["SBER"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        gazp.delete()
+        sync_instruments({"SBERP": {"shortname": "Сбербанк-п"}}, ["shortname"])
+    assert [r["ticker"] for r in client.get("/api/instruments/?search=sbre").json()] == ["SBER", "SBERP"]
+    assert client.get("/api/instruments/?search=газ").json() == []
+    assert set(instrument_search._local.stamps()) == set(Instrument.objects.values_list("id", flat=True))
+
+
+def test_catalog_search_ranked(settings, tmp_path, monkeypatch, client):
+    settings.SINGLE_FLIGHT_DIR = tmp_path
+    monkeypatch.setattr(instrument_search, "_catalogs", {})
+    monkeypatch.setattr(moex_catalog, "get_catalog_index", lambda *a: {})
+    monkeypatch.setattr(instrument_search, "get_catalog_index", lambda *a: {
+        "LKOH": {"secid": "LKOH", "shortname": "ЛУКОЙЛ", "label": "LKOH — ЛУКОЙЛ"},
+        "SBER": {"secid": "SBER", "shortname": "Сбербанк", "label": "SBER — Сбербанк"},
+    })
+    assert client.get("/api/moex/catalog/?search=лук").json() == [{"secid": "LKOH", "label": "LKOH — ЛУКОЙЛ"}]
+    assert client.get("/api/moex/catalog/?search=SBRE").json()[0]["secid"] == "SBER"
@@ -0,0 +1,161 @@
+# MM/mm08/tests/test_iss_client.py
+import time
+
+import numpy as np
+import pytest
+
+from mm08.services import board_reference, iss_client
+from mm08.services.iss_client import IssClient, iss_columns, iss_table, nan_to_none
+from mm08.services.heatmap_fetcher import change_pct_columns, fetch_board
+from mm08.services.moex_iss import MoexISSClient
+from ._utils import FakeIssBoard
+
+
+class FakeTransport:
+    """Транспорт-заглушка: отдаёт заготовленный JSON и запоминает запросы."""
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = []
+
+    def get(self, url, params, timeout):
+        self.calls.append((url, dict(params or {}), timeout))
+        return self.payload
+
+
+BOARD_JSON = {
+    "securities": {"columns": ["SECID", "SHORTNAME", "LOTSIZE"],
+                   "data": [["SBER", "Сбербанк", 10], ["GAZP", "Газпром", 10]]},
+    "marketdata": {"columns": ["SECID", "LAST", "PREVPRICE", "LASTCHANGEPRC", "VALTODAY", "NUMTRADES"],
+                   "data": [["SBER", 110.0, 100.0, None, 5000, 7], ["GAZP", 150.0, 150.0, 0.5, 0, 0]]},
+}
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    def _make(payload):
+        client = IssClient(FakeTransport(payload))
+        monkeypatch.setattr(iss_client, "_client", client)
+        return client
+    return _make
+
+
+def test_get_tables_projects_columns():
+    client = IssClient(FakeTransport(BOARD_JSON))
+    tables = client.get_tables(
+        "/engines/stock/markets/shares/boards/TQBR/securities.json",
+        ("securities", "marketdata"),
+        columns={"securities": ("SECID", "SHORTNAME")},
+        params={"start": "100"},
+    )
+    url, params, timeout = client.transport.calls[0]
+    assert url == "https://iss.moex.com/iss/engines/stock/markets/shares/boards/TQBR/securities.json"
+    assert params["iss.only"] == "securities,marketdata"
+    assert params["securities.columns"] == "SECID,SHORTNAME"
+    assert params["start"] == "100"
+    assert timeout == iss_client.DEFAULT_TIMEOUT
+    assert tables["securities"][1][0][0] == "SBER"
+
+
+def test_iss_table_extended_format():
+    extended = [{"charsetinfo": {"name": "utf-8"}}, {"securities": [{"SECID": "SBER", "LOTSIZE": 10}]}]
+    cols, rows = iss_table(extended, "securities")
+    assert cols == ["SECID", "LOTSIZE"]
+    assert rows == [["SBER", 10]]
+    assert iss_table(extended, "marketdata") == ([], [])
+
+
+def test_fetch_board_uses_shared_client(fake_client):
+    client = fake_client(BOARD_JSON)
+    engine, market, rows = fetch_board("TQBR")
+    assert (engine, market) == ("stock", "shares")
+    assert len(client.transport.calls) == 2  # справка доски + marketdata
+
+    fetch_board("TQBR")  # справка уже в кэше — с ISS только marketdata
+    assert len(client.transport.calls) == 3
+    assert client.transport.calls[-1][1]["iss.only"] == "marketdata"
+    by = {r["ticker"]: r for r in rows}
+    assert by["SBER"]["change_pct"] == pytest.approx(10.0)
+    assert by["GAZP"]["change_pct"] == pytest.approx(0.5)
+    assert by["SBER"]["turnover"] == 5000 and by["SBER"]["lot_size"] == 10
+
+
+class PagedTransport:
+    """Отдаёт доску по страницам с курсором; поздние страницы отвечают быстрее ранних."""
+    def __init__(self, total, pagesize):
+        self.total, self.pagesize = total, pagesize
+        self.starts, self.ref_starts = [], []
+
+    def get(self, url, params, timeout):
+        start = int(params.get("start") or 0)
+        (self.starts if "marketdata" in (params.get("iss.only") or "") else self.ref_starts).append(start)
+        time.sleep(0.01 * max(0, 5 - start // self.pagesize))
+        secids = [f"S{i:03d}" for i in range(start, min(start + self.pagesize, self.total))]
+        return {
+            "securities": {"columns": ["SECID", "SHORTNAME", "BOARDID"],
+                           "data": [[s, s, "TQBR"] for s in secids]},
+            "marketdata": {"columns": ["SECID", "LAST"], "data": [[s, 1.0] for s in secids]},
+            "securities.cursor": {"columns": ["INDEX", "TOTAL", "PAGESIZE"],
+                                  "data": [[start, self.total, self.pagesize]]},
+        }
+
+
+def test_fetch_board_all_fans_out_in_order(fake_client):
+    transport = PagedTransport(total=450, pagesize=100)
+    fake_client(None).transport = transport
+    rows = iss_client.fetch_board_all("stock", "shares", "TQBR", max_workers=4)
+    assert [r["secid"] for r in rows] == [f"S{i:03d}" for i in range(450)]
+    assert sorted(transport.starts) == [0, 100, 200, 300, 400]
+    assert sorted(transport.ref_starts) == [0, 100, 200, 300, 400]
+
+    transport.starts.clear()
+    rows = iss_client.fetch_board_all("stock", "shares", "TQBR", max_pages=2)
+    assert len(rows) == 200 and sorted(transport.starts) == [0, 100]
+    assert len(transport.ref_starts) == 5  # справка — из кэша
+    assert rows[150]["shortname"] == "S150" and rows[150]["board"] == "TQBR"
+
+
+def test_iter_securities_uses_cursor():
+    transport = PagedTransport(total=250, pagesize=100)
+    client = MoexISSClient(pause_sec=0.0, client=IssClient(transport))
+    secids = [r["SECID"] for r in client.iter_securities("stock", "shares", "TQBR")]
+    assert secids == [f"S{i:03d}" for i in range(250)]
+
+
+def test_board_reference_refetched_for_new_security(monkeypatch):
+    board = FakeIssBoard(size=3)
+    monkeypatch.setattr(iss_client, "_client", IssClient(board))
+    assert list(board_reference.board_reference("stock", "shares", "TQBR")) == ["T0000", "T0001", "T0002"]
+    assert board_reference.board_reference("stock", "shares", "TQBR", require=["T0001"])["T0001"]["LOTSIZE"] == 10
+    assert len(board.calls) == 1
+
+    board.securities.append(["NEW1", "TQBR", "Листинг", 1])
+    assert "NEW1" not in board_reference.board_reference("stock", "shares", "TQBR", require=["NEW1"])  # только что читали
+    monkeypatch.setattr(board_reference, "REF_RECHECK_SEC", 0)
+    assert board_reference.board_reference("stock", "shares", "TQBR", require=["NEW1"])["NEW1"]["SHORTNAME"] == "Листинг"
+    assert len(board.calls) == 2
+
+
+def test_iss_columns_typed_and_tolerant():
+    table = (["SECID", "LAST", "VALTODAY"], [["SBER", 300.5, 10], ["GAZP", None, "7"], ["BAD", "-"]])
+    cols = iss_columns(table, text=("SECID", "BOARDID"), numeric=("LAST", "VALTODAY", "OPEN"))
+    assert cols["SECID"].tolist() == ["SBER", "GAZP", "BAD"]
+    assert cols["BOARDID"].tolist() == [None, None, None]  # колонки нет в ответе
+    assert nan_to_none(cols["LAST"]) == [300.5, None, None]
+    assert nan_to_none(cols["VALTODAY"]) == [10.0, 7.0, None]  # короткая строка — None, не сдвиг
+    assert np.isnan(cols["OPEN"]).all()
+    assert iss_columns(([], []), text=("SECID",), numeric=("LAST",))["LAST"].shape == (0,)
+
+
+def test_change_pct_columns_priority():
+    nan = np.nan
+    md = {
+        "SECID": np.array(["A", "B", "C", "D", "E"], dtype=object),
+        "LASTCHANGEPRC": np.array([1.5, nan, nan, nan, nan]),
+        "LASTTOPREVPRICE": np.array([9.0, -1.02, nan, nan, nan]),
+        "CHANGE": np.array([nan, nan, 5.0, nan, nan]),
+        "PREVPRICE": np.array([100.0, 100.0, 100.0, 200.0, 0.0]),
+        "LAST": np.array([nan, nan, nan, 210.0, 10.0]),
+    }
+    pct = change_pct_columns(md)
+    assert pct[:4] == pytest.approx([1.5, -1.02, 5.0, 5.0])  # LASTTOPREVPRICE — уже проценты
+    assert np.isnan(pct[4])  # PREVPRICE = 0 — процент не определён
@@ -0,0 +1,87 @@
+# MM/mm08/tests/test_live.py
+import asyncio
+import json
+
+from mm08.services import live, quotes
+from mm08.services.heatmap import build_snapshot
+
+
+def _events(chunk: bytes):
+    return [json.loads(line[6:]) for line in chunk.decode().splitlines() if line.startswith("data: ")]
+
+
+def test_quotes_poll_sends_only_changed_tickers(iss_board):
+    iss = iss_board(4)
+    quotes.refresh_board("TQBR")
+    feed = live.LiveFeed()
+    [(topic, chunk, state)] = feed.poll(["quotes:TQBR"])
+    assert topic == "quotes:TQBR" and len(_events(state)[0]["d"]) == 4
+    assert feed.poll(["quotes:TQBR"]) == []  # доска не менялась
+
+    iss.marketdata[0][1] = 1.0
+    quotes.refresh_board("TQBR")
+    [(_, chunk, state)] = feed.poll(["quotes:TQBR"])
+    [event] = _events(chunk)
+    assert event["d"] == [["T0000", 1.0, event["d"][0][2]]]
+    assert _events(state)[0]["full"] is True and len(_events(state)[0]["d"]) == 4
+
+
+def test_heatmap_poll_follows_version(iss_board, django_capture_on_commit_callbacks):
+    iss = iss_board(4)
+    with django_capture_on_commit_callbacks(execute=True):
+        snapshot, _ = build_snapshot(board="TQBR", label="fast")
+    feed = live.LiveFeed()
+    [(_, chunk, _)] = feed.poll(["heatmap:TQBR"])
+    [event] = _events(chunk)
+    assert event["snapshot"] == snapshot.pk and event["label"] == "fast" and len(event["d"]) == 4
+    assert feed.poll(["heatmap:TQBR"]) == []  # версия та же — в БД не ходим
+
+    iss.marketdata[1][1] = 2.0
+    with django_capture_on_commit_callbacks(execute=True):
+        build_snapshot(board="TQBR", label="fast")
+    [(_, chunk, _)] = feed.poll(["heatmap:TQBR"])
+    assert [row[:2] for row in _events(chunk)[0]["d"]] == [["T0001", 2.0]]
+
+
+def test_broadcaster_shares_bytes_and_drops_slow_subscriber():
+    async def scenario():
+        hub = live.Broadcaster(queue_size=2)
+        fast, slow = hub.subscribe(["quotes:TQBR"]), hub.subscribe(["quotes:TQBR"])
+        chunk = live.encode_event("quotes", {"d": [["SBER", 300.0, 1.5]]})
+        assert hub.publish("quotes:TQBR", chunk, state=b"full") == 2
+        assert (await fast.get()) is chunk
+
+        hub.publish("quotes:TQBR", chunk)
+        hub.publish("quotes:TQBR", chunk)  # у slow очередь полна — отключаем
+        assert len(hub) == 1 and (await slow.get()) is None
+
+        late = hub.subscribe(["quotes:TQBR"])
+        assert (await late.get()) == b"full"  # новый подписчик начинает с полного состояния
+
+    asyncio.run(scenario())
+
+
+def test_event_stream_retry_state_heartbeat_and_unsubscribe():
+    class Feed(live.LiveFeed):
+        def poll(self, topics):
+            return []
+
+    async def scenario():
+        feed = Feed(poll_sec=0.01)
+        feed.broadcaster._state["quotes:TQBR"] = b"event: quotes\ndata: {}\n\n"
+        feed.broadcaster._topics["quotes:TQBR"] = set()
+        stream = live.event_stream(feed, ["quotes:TQBR"], heartbeat=0.01)
+        assert await stream.__anext__() == live.RETRY
+        assert await stream.__anext__() == b"event: quotes\ndata: {}\n\n"
+        assert await stream.__anext__() == live.PING
+        assert len(feed.broadcaster) == 1
+        await stream.aclose()  # клиент отключился
+        assert len(feed.broadcaster) == 0
+
+    asyncio.run(scenario())
+
+
+def test_live_view_validates_and_requires_asgi(client):
+    assert client.get("/api/live/?board=XXXX").status_code == 400
+    assert client.get("/api/live/?channels=nope").status_code == 400
+    assert client.get("/api/live/").status_code == 501
@@ -0,0 +1,69 @@
+# MM/mm08/tests/test_load_moex.py
+import io
+
+import pytest
+from django.core.management import call_command
+
+from mm08.models import IngestCheckpoint, Instrument
+from mm08.services import iss_client
+from mm08.services.iss_client import IssClient
+from ._utils import FakeIssBoard
+
+
+class FlakyBoard(FakeIssBoard):
+    """Доска, которая один раз падает на заданной странице."""
+    def __init__(self, *args, fail_at=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_at = fail_at
+
+    def get(self, url, params, timeout):
+        if self.fail_at is not None and int(params.get("start") or 0) == self.fail_at:
+            self.fail_at = None
+            raise ConnectionError("ISS недоступен")
+        return super().get(url, params, timeout)
+
+
+def _load(*extra):
+    out = io.StringIO()
+    call_command("load_moex", "--engine", "stock", "--market", "shares", "--board", "TQBR",
+                 "--chunk", "50", *extra, stdout=out)
+    return out.getvalue()
+
+
+def test_load_moex_commits_chunks_and_resumes(monkeypatch):
+    board = FlakyBoard(size=350, fail_at=200)
+    monkeypatch.setattr(iss_client, "_client", IssClient(board))
+
+    with pytest.raises(ConnectionError):
+        _load()
+    # страницы до сбоя уже закоммичены, точка возобновления — после них
+    assert Instrument.objects.count() == 200
+    cp = IngestCheckpoint.objects.get(job="load_moex", board="TQBR")
+    assert (cp.cursor, cp.rows, cp.finished) == (200, 200, False)
+
+    board.calls.clear()
+    out = _load("--resume")
+    assert "строк/с" in out
+    assert min(int(p["start"]) for _, p in board.calls) == 200
+    assert Instrument.objects.count() == 350
+    cp.refresh_from_db()
+    assert (cp.cursor, cp.rows, cp.finished) == (350, 350, True)
+
+    inst = Instrument.objects.get(ticker="T0042")
+    assert (inst.secid, inst.board, inst.lot_size) == ("T0042", "TQBR", 10)
+
+
+def test_load_moex_counts_overlapping_secids_once(monkeypatch):
+    class OverlappingBoard(FakeIssBoard):
+        """Страницы перекрываются: каждая повторяет последнюю бумагу предыдущей."""
+        def get(self, url, params, timeout):
+            start = int(params.get("start") or 0)
+            if start:
+                params = {**params, "start": str(start - 1)}
+            return super().get(url, params, timeout)
+
+    monkeypatch.setattr(iss_client, "_client", IssClient(OverlappingBoard(size=120, pagesize=50)))
+    out = _load()
+    assert Instrument.objects.count() == 120
+    cp = IngestCheckpoint.objects.get(job="load_moex", board="TQBR")
+    assert cp.rows == 120 and "сохранено/обновлено 120" in out
@@ -0,0 +1,51 @@
+# MM/mm08/tests/test_quotes.py
+import io
+import os
+import time
+
+from django.core.management import call_command
+
+from mm08.services import quotes
+
+
+def test_poller_writes_board_read_via_mmap(iss_board):
+    iss = iss_board(5)
+    out = io.StringIO()
+    call_command("poll_quotes", "--once", "--boards", "TQBR", stdout=out)
+    assert "TQBR: 5" in out.getvalue()
+
+    board = quotes.read_board("TQBR")
+    assert [r["SECID"] for r in board.rows] == ["T0004", "T0003", "T0002", "T0001", "T0000"]  # по убыванию %
+    assert board.rows[0]["LAST"] == 104.0 and board.rows[0]["SHORTNAME"] == "Бумага 4"
+    assert quotes.read_board("TQBR") is board  # файл не менялся — тот же разобранный объект
+
+    iss.marketdata[0][1] = 1.0
+    quotes.refresh_board("TQBR")
+    assert quotes.read_board("TQBR").rows[-1]["LAST"] == 1.0
+
+
+def test_views_and_api_read_board_without_iss(iss_board, logged_client):
+    iss = iss_board(5)
+    quotes.refresh_board("TQBR")
+    calls = len(iss.calls)
+
+    resp = logged_client.post("/stocks/", {"action": "fetch"})
+    assert "T0004" in resp.content.decode() and resp.context["error"] is None
+    api = logged_client.get("/api/quotes/?secid=T0001,T0002")
+    assert [r["SECID"] for r in api.json()["rows"]] == ["T0002", "T0001"]
+    assert logged_client.get("/api/quotes/?secid=T0001,T0002", HTTP_IF_NONE_MATCH=api["ETag"]).status_code == 304
+    assert logged_client.get("/api/quotes/?board=XXXX").status_code == 400
+    assert len(iss.calls) == calls
+
+
+def test_stale_board_refreshed_once_without_poller(iss_board):
+    iss = iss_board(5)
+    assert quotes.current_board("TQBR").rows  # доски нет — собрали сами
+    calls = len(iss.calls)
+    assert quotes.current_board("TQBR") is not None
+    assert len(iss.calls) == calls
+
+    old = time.time() - 3600
+    os.utime(quotes.board_path("TQBR"), (old, old))
+    quotes.current_board("TQBR")
+    assert len(iss.calls) == calls + 1
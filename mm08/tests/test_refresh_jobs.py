@@ -0,0 +1,100 @@
+# MM/mm08/tests/test_refresh_jobs.py
+import datetime as dt
+import io
+import time
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from mm08.models import HeatTile, RefreshJob
+from mm08.services import jobs
+from mm08.services.jobs import (
+    MAX_ATTEMPTS, claim_next, enqueue_heatmap_refresh, heartbeat, requeue_stale, run_job, run_pending,
+)
+
+
+def test_refresh_enqueues_and_deduplicates(logged_client):
+    first = logged_client.post("/heatmaps/refresh/", {"board": "TQBR", "label": "fast"})
+    second = logged_client.post("/heatmaps/refresh/", {"board": "TQBR", "label": "fast"})
+    assert first.status_code == second.status_code == 202
+    assert first.json()["created"] is True and second.json()["created"] is False
+    assert first.json()["job_id"] == second.json()["job_id"]
+    assert RefreshJob.objects.count() == 1
+    assert not HeatTile.objects.exists()  # веб-запрос ничего не собирал
+
+    status = logged_client.get(first.json()["status_url"]).json()
+    assert status["status"] == "queued" and status["progress"] == 0
+    assert logged_client.post("/heatmaps/refresh/", {"board": "XXXX"}).status_code == 400
+
+
+def test_worker_runs_job_and_reports_status(logged_client, iss_board):
+    iss_board(5)
+    job_id = logged_client.post("/heatmaps/refresh/", {"board": "TQBR", "label": "fast"}).json()["job_id"]
+
+    out = io.StringIO()
+    call_command("run_jobs", "--once", stdout=out)
+    assert "Выполнено задач: 1" in out.getvalue()
+
+    status = logged_client.get(f"/heatmaps/jobs/{job_id}/").json()
+    assert status["status"] == "done" and status["progress"] == 100
+    assert HeatTile.objects.filter(snapshot_id=status["snapshot_id"]).count() == 5
+
+    # завершённая задача не мешает поставить новую
+    job, created = enqueue_heatmap_refresh("TQBR", "fast")
+    assert created and job.pk != job_id
+
+
+def test_failed_job_and_single_claim(monkeypatch):
+    job, _ = enqueue_heatmap_refresh("TQBR", "fast")
+    assert claim_next("w1").pk == job.pk
+    assert claim_next("w2") is None  # уже захвачена
+
+    def boom(*a, **kw):
+        raise RuntimeError("ISS down")
+    monkeypatch.setattr("mm08.services.heatmap._fetch_board_data", boom)
+    enqueue_heatmap_refresh("TQBR", "fresh")
+    assert run_pending("w1") == 1
+    failed = RefreshJob.objects.get(label="fresh")
+    assert failed.status == "failed" and "ISS down" in failed.error and failed.progress == 10
+
+
+def test_job_that_keeps_losing_its_worker_fails():
+    job, _ = enqueue_heatmap_refresh("TQBR", "fast")
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        assert claim_next("w1").attempts == attempt
+        # воркер упал посреди сборки: отметок нет, задача протухла
+        RefreshJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - dt.timedelta(hours=1))
+        requeue_stale()
+    job.refresh_from_db()
+    assert job.status == RefreshJob.Status.FAILED and job.attempts == MAX_ATTEMPTS
+    assert claim_next("w1") is None
+
+
+def test_running_job_with_recent_heartbeat_is_not_requeued():
+    enqueue_heatmap_refresh("TQBR", "fast")
+    job = claim_next("w1")
+    # сборка идёт дольше STALE_AFTER_SEC без отметок прогресса, но воркер шлёт heartbeat
+    RefreshJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - dt.timedelta(hours=1))
+    assert heartbeat(job)
+    assert requeue_stale() == 0
+    job.refresh_from_db()
+    assert job.status == RefreshJob.Status.RUNNING and job.worker == "w1" and job.attempts == 1
+
+    # задачу забрал другой воркер — heartbeat старого её не продлевает
+    RefreshJob.objects.filter(pk=job.pk).update(worker="w2")
+    assert not heartbeat(job)
+
+
+def test_run_job_beats_while_building(monkeypatch):
+    beats = []
+    monkeypatch.setattr(jobs, "heartbeat", lambda job: beats.append(job.pk) or True)
+
+    def slow_build(**kwargs):
+        while len(beats) < 2:
+            time.sleep(0.01)
+        raise RuntimeError("stop")
+    monkeypatch.setattr(jobs, "build_snapshot", slow_build)
+
+    enqueue_heatmap_refresh("TQBR", "fast")
+    job = run_job(claim_next("w1"), heartbeat_sec=0.01)
+    assert job.status == RefreshJob.Status.FAILED and set(beats) == {job.pk}
@@ -0,0 +1,107 @@
+# MM/mm08/tests/test_resample.py
+import datetime as dt
+
+import numpy as np
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+
+from mm08.models import Candle
+from mm08.services.candles import upsert_candles
+from mm08.services.resample import get_bars, parse_interval, pick_base_interval, resample_arrays
+
+
+def _minute_bars(day: dt.date, count: int):
+    """count минутных баров с 10:00; цена растёт на 1 каждую минуту."""
+    start = dt.datetime.combine(day, dt.time(10, 0))
+    return [
+        ((start + dt.timedelta(minutes=i)).isoformat(), 100.0 + i, 100.5 + i, 99.5 + i, 100.2 + i, 10)
+        for i in range(count)
+    ]
+
+
+def test_parse_interval_codes_and_minutes():
+    assert parse_interval("M5") == 5
+    assert parse_interval("h4") == 240
+    assert parse_interval("D1") == 1440
+    assert parse_interval("W1") == 7 * 1440
+    assert parse_interval("60") == 60
+    assert parse_interval("X1") is None
+    assert parse_interval("M0") is None
+    assert pick_base_interval([1, 10, 60], 240) == 60
+    assert pick_base_interval([10], 15) is None
+
+
+def test_resample_arrays_ohlcv_aligned_to_session_open():
+    bars = {k: np.asarray(v) for k, v in zip(
+        ("ts", "open", "high", "low", "close", "volume"),
+        zip(*[
+            (int(timezone.make_aware(dt.datetime.fromisoformat(b)).timestamp()), o, h, l, c, v)
+            for b, o, h, l, c, v in _minute_bars(dt.date(2025, 3, 3), 130)
+        ]),
+    )}
+    h1 = resample_arrays(bars, 60)
+    starts = [timezone.localtime(dt.datetime.fromtimestamp(t, dt.timezone.utc)).strftime("%H:%M") for t in h1["ts"]]
+    assert starts == ["10:00", "11:00", "12:00"]
+    assert h1["open"].tolist() == [100.0, 160.0, 220.0]
+    assert h1["close"].tolist() == [159.2, 219.2, 229.2]
+    assert h1["high"].tolist() == [159.5, 219.5, 229.5]
+    assert h1["low"].tolist() == [99.5, 159.5, 219.5]
+    assert h1["volume"].tolist() == [600, 600, 100]
+
+
+def test_get_bars_limit_and_cache_version(mixer):
+    cache.clear()
+    inst = mixer.blend("mm08.Instrument", ticker="SBER")
+    upsert_candles(inst.id, Candle.Interval.M1, _minute_bars(dt.date(2025, 3, 3), 120))
+
+    m5 = get_bars(inst.id, 5, limit=3)
+    assert m5["ts"].size == 3
+    assert m5["open"].tolist() == [205.0, 210.0, 215.0]
+    assert m5["close"].tolist() == [209.2, 214.2, 219.2]
+
+    # новая запись в исходный ряд меняет версию → кэш не отдаёт старое
+    upsert_candles(inst.id, Candle.Interval.M1, [("2025-03-03T12:00:00", 1.0, 1.0, 1.0, 1.0, 1)])
+    assert get_bars(inst.id, 5, limit=1)["open"].tolist() == [1.0]
+    assert get_bars(inst.id, Candle.Interval.D1) is not None
+    assert get_bars(inst.id, 7) is not None
+    assert get_bars(mixer.blend("mm08.Instrument", ticker="GAZP").id, 60) is None
+
+
+def test_chart_data_builds_unstored_interval(logged_client, mixer):
+    cache.clear()
+    inst = mixer.blend("mm08.Instrument", ticker="SBER")
+    upsert_candles(inst.id, Candle.Interval.M1, _minute_bars(dt.date(2025, 3, 3), 180))
+
+    url = reverse("mm08:chart_data", kwargs={"ticker": "SBER"})
+    payload = logged_client.get(url + "?interval=H1").json()
+    assert payload["count"] == 3
+    assert [d["o"] for d in payload["data"]] == [100.0, 160.0, 220.0]
+    assert payload["data"][0]["t"].startswith("2025-03-03T10:00:00")
+
+    assert logged_client.get(url + "?interval=bogus").status_code == 400
+
+
+def test_columns_layout_for_chart_and_latest(logged_client, mixer):
+    cache.clear()
+    inst = mixer.blend("mm08.Instrument", ticker="SBER")
+    upsert_candles(inst.id, Candle.Interval.M1, _minute_bars(dt.date(2025, 3, 3), 120))
+    first = int(timezone.make_aware(dt.datetime(2025, 3, 3, 10, 0)).timestamp())
+
+    url = reverse("mm08:chart_data", kwargs={"ticker": "SBER"})
+    payload = logged_client.get(url + "?interval=H1&layout=columns").json()
+    assert payload["count"] == 2
+    assert payload["columns"]["t"] == [first, first + 3600]
+    assert payload["columns"]["o"] == [100.0, 160.0]
+    assert logged_client.get(url + "?layout=bogus").status_code == 400
+
+    stored = logged_client.get("/api/candles/latest/?instrument=SBER&limit=2&layout=columns").json()
+    assert (stored["ticker"], stored["interval"], stored["count"]) == ("SBER", "M1", 2)
+    assert stored["columns"]["t"] == [first + 119 * 60, first + 118 * 60]
+    assert set(stored["columns"]) == set("tohlcv")
+
+    built = logged_client.get("/api/candles/latest/?instrument=SBER&interval=H1&layout=columns").json()
+    assert (built["ticker"], built["interval"], built["layout"]) == ("SBER", "H1", "columns")
+    assert built["columns"]["t"] == [first + 3600, first]
+    assert built["columns"]["o"] == [160.0, 100.0]
+    assert logged_client.get("/api/candles/latest/?layout=columns").status_code == 400
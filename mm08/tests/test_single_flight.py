@@ -0,0 +1,114 @@
+# MM/mm08/tests/test_single_flight.py
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+
+from mm08.services import moex_catalog
+from mm08.services.single_flight import SingleFlightTimeout, single_flight, try_lock
+
+
+def test_concurrent_misses_fill_once(settings, tmp_path):
+    settings.SINGLE_FLIGHT_DIR = tmp_path
+    calls = []
+
+    def fill():
+        calls.append(1)
+        time.sleep(0.2)
+        return ["SBER"]
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(single_flight("sf:test", fill, ttl=60)))
+        for _ in range(6)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [["SBER"]] * 6
+
+
+def test_stale_value_served_while_other_process_refills(settings, tmp_path):
+    settings.SINGLE_FLIGHT_DIR = tmp_path
+    cache.set("sf:stale", (time.time() - 1, "old"), timeout=60)
+    with try_lock("sf:stale") as locked:  # «другой воркер» уже обновляет
+        assert locked
+        assert single_flight("sf:stale", lambda: "new", ttl=60) == "old"
+        with try_lock("sf:stale") as again:
+            assert not again
+    assert single_flight("sf:stale", lambda: "new", ttl=60) == "new"
+    assert single_flight("sf:stale", lambda: "newer", ttl=60) == "new"
+
+
+def test_waiter_times_out_instead_of_filling(settings, tmp_path):
+    settings.SINGLE_FLIGHT_DIR = tmp_path
+    with try_lock("sf:slow"):  # держатель лока не успевает
+        with pytest.raises(SingleFlightTimeout):
+            single_flight("sf:slow", lambda: pytest.fail("waiter must not fill"), ttl=60, wait=0.1)
+
+
+def test_catalog_list_cached_across_calls(settings, tmp_path, monkeypatch):
+    settings.SINGLE_FLIGHT_DIR = tmp_path
+    pulls = []
+
+    class FakeClient:
+        def __init__(self, *a, **kw):
+            pass
+
+        def iter_securities(self, **kw):
+            pulls.append(kw)
+            yield {"SECID": "GAZP", "SHORTNAME": "Газпром"}
+            yield {"SECID": "SBER", "SHORTNAME": ""}
+
+    monkeypatch.setattr(moex_catalog, "MoexISSClient", FakeClient)
+    monkeypatch.setattr(moex_catalog, "is_valid_combo", lambda *a: True)
+    first = moex_catalog.get_moex_list("stock", "shares", "TQBR")
+    assert first == [("GAZP", "GAZP — Газпром"), ("SBER", "SBER")]
+    assert moex_catalog.get_moex_list("stock", "shares", "TQBR") == first
+    assert len(pulls) == 1
+
+
+def test_catalog_index_serves_info_without_iss(settings, tmp_path, monkeypatch, client):
+    settings.SINGLE_FLIGHT_DIR = tmp_path
+    pulls = []
+
+    class FakeClient:
+        def __init__(self, *a, **kw):
+            pass
+
+        def iter_securities(self, **kw):
+            pulls.append(kw)
+            yield {"SECID": "sber", "SHORTNAME": "Сбербанк", "LOTSIZE": "10", "BOARDID": "TQBR"}
+            yield {"SECID": "GAZP", "SHORTNAME": "Газпром", "LOTSIZE": "10", "BOARDID": "TQBR"}
+
+    monkeypatch.setattr(moex_catalog, "MoexISSClient", FakeClient)
+    assert moex_catalog.get_moex_list("stock", "shares", "TQBR")[0] == ("GAZP", "GAZP — Газпром")
+    info = moex_catalog.get_moex_info("stock", "shares", "TQBR", " Sber ")
+    assert info["ticker"] == "SBER" and info["lot_size"] == 10 and "label" not in info
+    assert moex_catalog.get_moex_info("stock", "shares", "TQBR", "LKOH") is None
+
+    resp = client.get("/api/moex/instrument-info/?ticker=sber")
+    assert resp.status_code == 200 and resp.json()["shortname"] == "Сбербанк"
+    assert client.get("/api/moex/instrument-info/?secid=LKOH").status_code == 404
+    assert client.get("/api/moex/catalog/?search=газ").json() == [{"secid": "GAZP", "label": "GAZP — Газпром"}]
+    assert len(pulls) == 1
+
+
+def test_empty_catalog_is_not_cached(monkeypatch):
+    answers = [[], [{"SECID": "SBER", "SHORTNAME": "Сбербанк"}]]
+
+    class FakeClient:
+        def __init__(self, *a, **kw):
+            pass
+
+        def iter_securities(self, **kw):
+            yield from answers.pop(0)
+
+    monkeypatch.setattr(moex_catalog, "MoexISSClient", FakeClient)
+    monkeypatch.setattr(moex_catalog, "is_valid_combo", lambda *a: True)
+    assert moex_catalog.get_moex_list("stock", "shares", "TQBR") == []
+    assert moex_catalog.get_moex_list("stock", "shares", "TQBR") == [("SBER", "SBER — Сбербанк")]
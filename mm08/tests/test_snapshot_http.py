@@ -0,0 +1,101 @@
+# MM/mm08/tests/test_snapshot_http.py
+import datetime as dt
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from mm08 import views
+from mm08.models import HeatSnapshot, HeatTile
+from mm08.services.snapshot_cache import bump_heatmap_version, heatmap_page_key, touch_snapshot
+
+
+def _snapshot(date):
+    snap = HeatSnapshot.objects.create(date=date, board="TQBR", label="fast")
+    HeatTile.objects.bulk_create([
+        HeatTile(snapshot=snap, ticker=f"T{i}", last=Decimal("1"), change_pct=Decimal(i)) for i in range(3)
+    ])
+    return snap
+
+
+def test_snapshot_api_conditional_get():
+    snap = _snapshot(timezone.localdate())
+    client = APIClient()
+    url = f"/api/heat/snapshots/{snap.id}/"
+
+    first = client.get(url, HTTP_ACCEPT="application/json")
+    assert first.status_code == 200
+    etag = first["ETag"]
+    assert "no-cache" in first["Cache-Control"] and first["Last-Modified"]
+
+    again = client.get(url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=etag)
+    assert again.status_code == 304 and again["ETag"] == etag
+
+    # пересборка плиток меняет версию
+    HeatTile.objects.create(snapshot=snap, ticker="NEW", last=Decimal("1"))
+    touch_snapshot(snap)
+    assert client.get(url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    tiles_url = f"/api/heat/snapshots/{snap.id}/tiles/"
+    tiles_etag = client.get(tiles_url, HTTP_ACCEPT="application/json")["ETag"]
+    assert tiles_etag != etag
+    assert client.get(tiles_url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=tiles_etag).status_code == 304
+    assert client.get("/api/heat/snapshots/999999/tiles/").status_code == 404
+
+
+def test_past_snapshot_gets_short_max_age():
+    snap = _snapshot(timezone.localdate() - dt.timedelta(days=3))
+    resp = APIClient().get(f"/api/heat/snapshots/{snap.id}/tiles/", HTTP_ACCEPT="application/json")
+    assert "max-age=300" in resp["Cache-Control"]
+    assert "immutable" not in resp["Cache-Control"]  # прошлый день ещё могут пересобрать
+
+
+def test_heatmap_page_conditional_get(logged_client):
+    cache.clear()
+    _snapshot(timezone.localdate())
+    url = reverse("mm08:heatmap") + "?board=TQBR"
+    first = logged_client.get(url)
+    assert first.status_code == 200 and "private" in first["Cache-Control"]
+    assert logged_client.get(url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 304
+    assert logged_client.get(url + "&page=2", HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 200
+
+
+def test_heatmap_page_cache_is_versioned(logged_client, django_capture_on_commit_callbacks):
+    cache.clear()
+    snap = _snapshot(timezone.localdate())
+    url = reverse("mm08:heatmap") + "?board=TQBR&per=21"
+    with CaptureQueriesContext(connection) as cold:
+        assert logged_client.get(url).content.decode().count('class="heat-tile"') == 3
+    assert any("mm08_heat" in q["sql"] for q in cold.captured_queries)
+
+    with CaptureQueriesContext(connection) as warm:
+        assert logged_client.get(url).status_code == 200
+    assert not any("mm08_heat" in q["sql"] for q in warm.captured_queries)
+
+    # новые плитки без сдвига версии не видны, со сдвигом — видны
+    HeatTile.objects.create(snapshot=snap, ticker="TOP", last=Decimal("1"), change_pct=Decimal("99"))
+    assert "TOP" not in logged_client.get(url).content.decode()
+    with django_capture_on_commit_callbacks(execute=True):
+        bump_heatmap_version("TQBR")
+    assert "TOP" in logged_client.get(url).content.decode()
+
+
+def test_heatmap_page_keys_are_normalized(logged_client, monkeypatch):
+    _snapshot(timezone.localdate())
+    keys = []
+    monkeypatch.setattr(views, "heatmap_page_key", lambda *args: keys.append(args) or heatmap_page_key(*args))
+    url = reverse("mm08:heatmap")
+    for query in ("?per=999", "?per=abc", "?per=42&page=0", "?label=fast&per=42", "?per=10"):
+        assert logged_client.get(url + query).content.decode().count('class="heat-tile"') == 3
+    assert logged_client.get(url + "?per=2").content.decode().count('class="heat-tile"') == 2
+    assert logged_client.get(url + "?label=nope").content.decode().count('class="heat-tile"') == 0
+    assert logged_client.get(url + "?board=XXXX").status_code == 200
+    # per — 1..84 (произвольный в этих пределах сохраняется), page ≥ 1;
+    # неизвестные метка и доска в кэш не попадают
+    assert set(keys) == {
+        ("TQBR", "", 1, 84), ("TQBR", "", 1, 42), ("TQBR", "fast", 1, 42), ("TQBR", "", 1, 10), ("TQBR", "", 1, 2),
+    }
@@ -32,6 +32,7 @@ urlpatterns = [
     path("heatmaps/", views.HeatmapView.as_view(), name="heatmap"),
     path("heatmaps/snapshot/<int:pk>/", views.HeatmapView.as_view(), name="heatmap_by_pk"),
     path("heatmaps/refresh/", views.HeatmapRefreshView.as_view(), name="heatmap_refresh"),
+    path("heatmaps/jobs/<int:pk>/", views.HeatmapJobView.as_view(), name="heatmap_job"),
     path("heatmaps/export.csv", views.HeatmapExportView.as_view(), name="heatmap_export"),
 
     path("heatmap/stocks/", views.StocksHeatmapView.as_view(), name="heatmap_stocks"),  # страница "Теплокарта Акции"
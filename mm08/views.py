@@ -2,30 +2,47 @@
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.contrib.auth.views import redirect_to_login
-from django.core.paginator import Paginator, EmptyPage
-from django.http import JsonResponse, HttpResponseRedirect, HttpResponse, HttpRequest
+from django.core.cache import cache
+from django.core.paginator import Paginator, EmptyPage, Page
+from django.http import JsonResponse, HttpResponseRedirect, HttpResponse, HttpRequest, StreamingHttpResponse
 from django.urls import reverse, reverse_lazy
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.decorators import method_decorator
+from django.middleware.csrf import get_token
 from django.views.decorators.csrf import csrf_exempt
 from django.views import View
 from django.views.generic import TemplateView, ListView, FormView, DetailView
 from django.shortcuts import redirect, render
-from django.db.models import Max, Prefetch, Subquery
+from django.db.models import Max, Subquery
 from django.db import transaction
 
 from typing import Any, Dict, List
 
 
 
+from datetime import datetime, time
 from decimal import Decimal
+import csv
+import hashlib
 import json
 
-from .models import Instrument, Candle, HeatSnapshot, HeatTile
+from .models import Instrument, Candle, HeatSnapshot, HeatTile, RefreshJob
 from .forms import InstrumentCreateForm, CandleFilterForm
 from .services.pagination import window_numbers
-from .services.heatmap import build_snapshot  #  функция сборки
-from mm08.services.iss_client import fetch_tqbr_all
+from .services.snapshot_cache import (
+    HEATMAP_PAGE_TTL,
+    conditional_response,
+    heatmap_labels,
+    heatmap_page_key,
+    query_tag,
+    snapshot_etag,
+)
+from .services.decimate import MODES as DECIMATE_MODES, WINDOW_BARS as DECIMATE_WINDOW, decimate
+from .services.resample import bars_columns, get_bars, parse_interval
+from .services.jobs import enqueue_heatmap_refresh, job_state  # фоновая сборка снапшотов
+from .services.quotes import current_board
+from .services.heatmap import BOARD_MAP
 
 
 # ---------- MIXINS ----------
@@ -148,6 +165,13 @@ class CandleListView(LoginRequiredMixin, InstrumentByTickerMixin, ListView):
         ctx["title"] = f"Свечи {self.instrument.ticker}"
         return ctx
 
+# Форматы ответа ChartDataView: список объектов или по массиву на поле
+LAYOUTS = ("rows", "columns")
+
+# Интервалы графика; нехранимые собираются на сервере (services.resample)
+CHART_INTERVALS = ["M1", "M5", "M10", "M15", "M30", "H1", "H4", "D1", "W1"]
+
+
 class ChartView(LoginRequiredMixin, InstrumentByTickerMixin, TemplateView):
     # шаблон страницы графика
     template_name = "mm08/chart.html"
@@ -159,106 +183,195 @@ class ChartView(LoginRequiredMixin, InstrumentByTickerMixin, TemplateView):
         ctx["ticker"] = self.instrument.ticker            # тикер для фронта/JS
         # можно прокидывать интервал в график через GET (?interval=M1)
         ctx["interval"] = self.request.GET.get("interval") or "M1"
+        ctx["intervals"] = CHART_INTERVALS                # варианты для селектора
         return ctx
 
+def _parse_bound(value: str, *, end: bool = False):
+    """YYYY-MM-DD (день целиком) или ISO datetime → aware datetime; мусор → None."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        if len(value) == 10:
+            d = datetime.fromisoformat(value).date()
+            parsed = datetime.combine(d, time.max if end else time.min)
+        else:
+            parsed = parse_datetime(value)
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
 class ChartDataView(LoginRequiredMixin, InstrumentByTickerMixin, View):
     """
     Отдаёт данные свечей по инструменту в JSON для графика.
     Параметры (GET):
-      - interval: строка, например M1/M5/H1/D1 (по умолчанию M1)
+      - interval: строка, например M1/M5/H1/D1 или число минут (по умолчанию M1);
+        если такой интервал не хранится — собираем на сервере из более мелкого
       - limit: количество точек (1..5000), по умолчанию 500
       - date_from / date_to: ISO-строки (YYYY-MM-DD или ISO datetime), опционально
+      - points: свести весь диапазон (без диапазона — последние 50 000 баров) к N точкам (1..5000)
+        вместо последних limit; mode=minmax (по умолчанию, OHLC-корзины) или mode=lttb (линия по close)
+      - layout: rows (по умолчанию) или columns
+    Ответ: {"ticker", "interval", "count", "data": [{t, o, h, l, c, v}, ...]} по возрастанию t;
+    с layout=columns — {"ticker", "interval", "count", "layout", "columns": {"t": [epoch, ...], "o": [...], ...}}.
     """
     def get(self, request, *args, **kwargs):
-        interval = (request.GET.get("interval") or "M1").strip()
-        limit_s  = (request.GET.get("limit") or "500").strip()
-        date_from = (request.GET.get("date_from") or "").strip()
-        date_to   = (request.GET.get("date_to") or "").strip()
-
-        # безопасно парсим limit
+        interval_s = (request.GET.get("interval") or "M1").strip()
+        limit_s = (request.GET.get("limit") or "500").strip()
+        points_s = (request.GET.get("points") or "").strip()
+        mode = (request.GET.get("mode") or "minmax").strip().lower()
+        layout = (request.GET.get("layout") or "rows").strip().lower()
+
+        minutes = parse_interval(interval_s)
+        if minutes is None:
+            return JsonResponse({"error": f"Unknown interval: {interval_s}"}, status=400)
+        if mode not in DECIMATE_MODES:
+            return JsonResponse({"error": f"Unknown mode: {mode}"}, status=400)
+        if layout not in LAYOUTS:
+            return JsonResponse({"error": f"Unknown layout: {layout}"}, status=400)
+
+        # безопасно парсим limit/points
         try:
             limit = max(1, min(int(limit_s), 5000))
-        except Exception:
+        except ValueError:
             limit = 500
+        try:
+            points = max(1, min(int(points_s), 5000)) if points_s else None
+        except ValueError:
+            points = None
+
+        dt_from = _parse_bound(request.GET.get("date_from"))
+        dt_to = _parse_bound(request.GET.get("date_to"), end=True)
+        if points:
+            # с points прореживаем весь заданный диапазон, а без диапазона — последние WINDOW_BARS баров
+            limit = None if dt_from or dt_to else DECIMATE_WINDOW
+        bars = get_bars(self.instrument.id, minutes, dt_from=dt_from, dt_to=dt_to, limit=limit)
+        if bars is not None and points:
+            bars = decimate(bars, points, mode)
+
+        if layout == "columns":
+            columns = bars_columns(bars) if bars is not None else {k: [] for k in "tohlcv"}
+            payload = {
+                "ticker": self.instrument.ticker,
+                "interval": interval_s,
+                "count": len(columns["t"]),
+                "layout": layout,
+                "columns": columns,
+            }
+            return JsonResponse(payload, json_dumps_params={"ensure_ascii": False})
+
+        data: List[Dict[str, Any]] = []
+        if bars is not None:
+            tz = timezone.get_current_timezone()
+            data = [
+                {"t": datetime.fromtimestamp(t, tz).isoformat(), "o": o, "h": h, "l": l, "c": c, "v": v}
+                for t, o, h, l, c, v in zip(
+                    bars["ts"].tolist(), bars["open"].tolist(), bars["high"].tolist(),
+                    bars["low"].tolist(), bars["close"].tolist(), bars["volume"].tolist(),
+                )
+            ]
 
-        qs = (Candle.objects
-              .filter(instrument=self.instrument)
-              .select_related("instrument"))
-
-        if interval:
-            qs = qs.filter(interval=interval)
-
-        # фильтры по дате при наличии
-        from django.utils.dateparse import parse_datetime
-        from datetime import datetime as _dt
-
-        if date_from:
-            try:
-                dt_from = _dt.fromisoformat(date_from + " 00:00:00") if len(date_from) == 10 else parse_datetime(date_from)
-                if dt_from:
-                    qs = qs.filter(dt__gte=dt_from)
-            except Exception:
-                pass
-
-        if date_to:
-            try:
-                dt_to = _dt.fromisoformat(date_to + " 23:59:59") if len(date_to) == 10 else parse_datetime(date_to)
-                if dt_to:
-                    qs = qs.filter(dt__lte=dt_to)
-            except Exception:
-                pass
-
-        # берём последние limit штук, сортируем по возрастанию времени для корректного графика
-        candles = list(
-            qs.order_by("-dt")[:limit]
-              .values("dt", "interval", "open", "high", "low", "close", "volume")
-        )
-        candles.reverse()
-
-        data = {
+        payload = {
             "ticker": self.instrument.ticker,
-            "interval": interval,
-            "count": len(candles),
-            "candles": candles,
+            "interval": interval_s,
+            "count": len(data),
+            "data": data,
         }
-        return JsonResponse(data, json_dumps_params={"ensure_ascii": False})
+        return JsonResponse(payload, json_dumps_params={"ensure_ascii": False})
 
 
 # ---------- HEATMAP ----------
+HEATMAP_PER_CHOICES = (21, 42, 84)  # варианты для селектора на странице
+HEATMAP_PER = 42
+HEATMAP_MAX_PER = 84
+HEATMAP_MAX_PAGE = 1000
+
+
 class HeatmapView(LoginRequiredMixin, TemplateView):
     template_name = "mm08/heatmaps.html"
 
-    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
-        ctx = super().get_context_data(**kwargs)
-
+    def _params(self):
+        """board/label/per/page из запроса, зажатые в ограниченные диапазоны (это ключ кэша)."""
         board = (self.request.GET.get("board") or "TQBR").upper()
         label = (self.request.GET.get("label") or "").strip()
-        per = int(self.request.GET.get("per") or 42)
+        try:
+            per = max(1, min(int(self.request.GET.get("per") or HEATMAP_PER), HEATMAP_MAX_PER))
+        except ValueError:
+            per = HEATMAP_PER
+        try:
+            page = max(1, min(int(self.request.GET.get("page") or 1), HEATMAP_MAX_PAGE))
+        except ValueError:
+            page = 1
+        return board, label, per, page
+
+    def _page_entry(self) -> Dict[str, Any]:
+        """
+        Страница плиток последнего снапшота из кэша. Ключ — (доска, метка, версия доски, page, per);
+        версию сдвигают build_snapshot / load_heatmap, так что попадание в кэш не ходит в БД.
+        """
+        board, label, per, page = self._params()
+        # неизвестные доска/метка — пустая страница без кэша, чтобы мусор в query string не плодил ключей
+        if board not in BOARD_MAP or (label and label not in heatmap_labels(board)):
+            return {"snapshot": None, "tiles": [], "count": 0, "number": 1}
+        key = heatmap_page_key(board, label, page, per)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
 
         # берем последний снимок по доске/метке (если метка не задана — любой)
         snap_qs = HeatSnapshot.objects.filter(board=board)
         if label:
             snap_qs = snap_qs.filter(label=label)
+        snapshot = (
+            snap_qs.order_by("-date", "-created_at")
+            .values("id", "date", "label", "created_at", "updated_at")
+            .first()
+        )
+
+        tiles, count, number = [], 0, 1
+        if snapshot:
+            tiles_qs = HeatTile.objects.filter(snapshot_id=snapshot["id"]).order_by("-change_pct", "ticker")
+            page_obj = Paginator(tiles_qs, per).get_page(page)
+            tiles, count, number = list(page_obj.object_list), page_obj.paginator.count, page_obj.number
 
-        last_id_sq = snap_qs.order_by("-date", "-created_at").values("id")[:1]
+        entry = {"snapshot": snapshot, "tiles": tiles, "count": count, "number": number}
+        cache.set(key, entry, timeout=HEATMAP_PAGE_TTL)
+        return entry
 
-        tiles_qs = (
-            HeatTile.objects.filter(snapshot_id=Subquery(last_id_sq))
-            .order_by("-change_pct", "ticker")
+    def get(self, request, *args, **kwargs):
+        """Conditional GET: пока снапшот не пересобран, повторный запрос страницы — 304 без рендера."""
+        self.entry = self._page_entry()
+        snapshot = self.entry["snapshot"]
+        if snapshot is None:
+            return super().get(request, *args, **kwargs)
+
+        # страница персональная (меню пользователя, CSRF-токен формы) — учитываем их в ETag
+        get_token(request)  # секрет CSRF заводится до расчёта ETag, а не во время рендера
+        csrf = hashlib.md5(request.META["CSRF_COOKIE"].encode(), usedforsecurity=False).hexdigest()[:6]
+        state = (snapshot["updated_at"], self.entry["count"], snapshot["date"])
+        etag = snapshot_etag(snapshot["id"], state, f"{query_tag(request)}-u{request.user.pk}-{csrf}")
+        return conditional_response(
+            request, etag, state[0], lambda: super(HeatmapView, self).get(request, *args, **kwargs), private=True,
         )
 
-        from django.core.paginator import Paginator
-        paginator = Paginator(tiles_qs, per)
-        page = int(self.request.GET.get("page") or 1)
-        page_obj = paginator.get_page(page)
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        ctx = super().get_context_data(**kwargs)
+        board, label, per, _ = self._params()
+        entry = self.entry
 
-        # вытаскиваем метаданные снапшота лёгкими подзапросами (без отдельного SELECT *)
-        snapshot_date = (
-            HeatSnapshot.objects.filter(id=Subquery(last_id_sq)).values_list("date", flat=True).first()
-        )
+        # пагинатор без запросов: число плиток уже известно из кэша
+        paginator = Paginator([], per)
+        paginator.count = entry["count"]
+        page_obj = Page(entry["tiles"], entry["number"], paginator)
+
+        snap = entry["snapshot"]
         snapshot_obj = None
-        if snapshot_date:
-            snapshot_obj = HeatSnapshot(id=None, date=snapshot_date, board=board, label=label or "")
+        if snap:
+            snapshot_obj = HeatSnapshot(id=snap["id"], date=snap["date"], board=board, label=snap["label"],
+                                        created_at=snap["created_at"])
 
         ctx.update(
             board=board,
@@ -268,116 +381,124 @@ class HeatmapView(LoginRequiredMixin, TemplateView):
             page_obj=page_obj,
             page_numbers=window_numbers(page_obj.number, paginator.num_pages, 5),
             per=per,
-            per_choices=[21, 42, 84],
-            date=snapshot_date or "",
+            per_choices=HEATMAP_PER_CHOICES,
+            date=snap["date"] if snap else "",
+            job_id=self.request.GET.get("job", "") if self.request.GET.get("job", "").isdigit() else "",  # после refresh
         )
         return ctx
 
 class HeatmapRefreshView(LoginRequiredMixin, View):
-    """POST: подтянуть данные с MOEX, собрать/обновить снимок, вернуть JSON или редирект."""
+    """
+    POST: поставить пересборку снимка в очередь (собирает manage.py run_jobs) и сразу
+    вернуть id задачи — JSON 202 или редирект. Такая же задача в работе не дублируется.
+    """
     def post(self, request, *args, **kwargs):
         board = (request.POST.get("board") or request.GET.get("board") or "TQBR").strip().upper()
         label = (request.POST.get("label") or request.GET.get("label") or "fast").strip()
         date_s = (request.POST.get("date") or request.GET.get("date") or "").strip()
-        replace = True  # пересобираем плитки, чтобы получить свежие котировки
 
         try:
-            snapshot, created = build_snapshot(board=board, label=label, date=date_s or None, replace=replace)
-        except Exception as exc:
-            return JsonResponse(
-                {
-                    "status": "error",
-                    "board": board,
-                    "label": label,
-                    "error": f"build_snapshot failed: {exc}",
-                },
-                status=500,
-            )
+            date = datetime.strptime(date_s, "%Y-%m-%d").date() if date_s else None
+            job, created = enqueue_heatmap_refresh(board, label, date, user=request.user)
+        except ValueError as exc:
+            return JsonResponse({"status": "error", "board": board, "label": label, "error": str(exc)}, status=400)
 
         # Если в форме есть скрытый redirect=1 — вернёмся на список
         if request.POST.get("redirect") == "1" or request.GET.get("redirect") == "1":
-            return HttpResponseRedirect(f"/heatmaps/?board={board}&label={label}")
+            return HttpResponseRedirect(f"/heatmaps/?board={board}&label={label}&job={job.pk}")
 
         return JsonResponse(
-            {
-                "status": "ok",
-                "board": board,
-                "label": label,
-                "replace": replace,
-                "created": created,
-                "snapshot_id": snapshot.id,
-                "date": str(snapshot.date),
-            }
+            job_state(job) | {"created": created, "status_url": reverse("mm08:heatmap_job", args=[job.pk])},
+            status=202,
         )
 
-    
+
+class HeatmapJobView(LoginRequiredMixin, View):
+    """GET: статус/прогресс задачи пересборки снимка (для polling'а после refresh)."""
+    def get(self, request, pk: int, *args, **kwargs):
+        job = RefreshJob.objects.filter(pk=pk).first()
+        if job is None:
+            return JsonResponse({"error": "job not found"}, status=404)
+        response = JsonResponse(job_state(job))
+        response["Cache-Control"] = "no-store"
+        return response
+
+
+class _Echo:
+    """Псевдо-буфер для csv.writer: write() просто возвращает строку (для стриминга)."""
+    def write(self, value):
+        return value
+
+
+# Столбцы CSV экспорта теплокарты
+EXPORT_HEADER = ("date", "label", "ticker", "shortname", "last", "change_pct", "turnover", "volume")
+EXPORT_CHUNK = 2000
+
+
 class HeatmapExportView(LoginRequiredMixin, View):
     """
-    Экспорт текущего снапшота теплокарты в CSV.
+    Потоковый экспорт снапшотов теплокарты в CSV (память не зависит от объёма).
     GET-параметры:
       - board: код доски, по умолчанию 'TQBR'
       - label: метка снапшота (например: 'fast'/'fresh'/'close'), опционально
-      - date:  YYYY-MM-DD — если нужен снапшот конкретной даты (опционально)
-    Столбцы CSV: ticker, shortname, last, change_pct, turnover, volume.
-    Если нужного поля нет — пишем пустое значение.
+      - snapshot: id — один конкретный снапшот
+      - date: YYYY-MM-DD — снапшоты этой даты
+      - date_from / date_to: YYYY-MM-DD — снапшоты за диапазон дат
+      - all=1 — все снапшоты доски
+    Без snapshot/date/all — последний снапшот доски (как на странице теплокарты).
+    Столбцы CSV: date, label, ticker, shortname, last, change_pct, turnover, volume.
     """
     def get(self, request, *args, **kwargs):
-        board = (request.GET.get("board") or "TQBR").strip()
+        board = (request.GET.get("board") or "TQBR").strip().upper()
         label = (request.GET.get("label") or "").strip()
+        snapshot_s = (request.GET.get("snapshot") or "").strip()
         date_s = (request.GET.get("date") or "").strip()
-
-        # Локальная функция: получить снапшот примерно так же, как в HeatmapView.get_snapshot()
-        def _get_snapshot():
-            qs = HeatSnapshot.objects.filter(board=board).order_by("-created_at")
-            if label:
-                qs = qs.filter(label=label)
-
-            if date_s:
-                try:
-                    # если пришла только дата (YYYY-MM-DD) — используем день целиком
-                    if len(date_s) == 10:
-                        from datetime import datetime, time
-                        d = datetime.fromisoformat(date_s).date()
-                        start = datetime.combine(d, time.min)
-                        end = datetime.combine(d, time.max)
-                        qs = qs.filter(created_at__range=(start, end))
-                    else:
-                        # иначе доверяем ISO-датавремени и фильтруем "после"
-                        from django.utils.dateparse import parse_datetime
-                        dt = parse_datetime(date_s)
-                        if dt:
-                            qs = qs.filter(created_at__gte=dt)
-                except Exception:
-                    pass
-
-            # Важно: НЕ урезаем поля у плиток, чтобы не словить ленивые догрузки
-            tiles_qs = HeatTile.objects.order_by("-change_pct")
-            return qs.only("id", "board", "label", "created_at") \
-                    .prefetch_related(Prefetch("tiles", queryset=tiles_qs)) \
-                    .first()
+        date_from = (request.GET.get("date_from") or date_s).strip()
+        date_to = (request.GET.get("date_to") or date_s).strip()
 
         snap_qs = HeatSnapshot.objects.filter(board=board)
         if label:
             snap_qs = snap_qs.filter(label=label)
 
-        # если есть date_s — оставляем твою текущую логику фильтрации по дате,
-        # только применяем её к snap_qs (код парсинга даты не дублирую здесь)
-
-        last_id_sq = snap_qs.order_by("-created_at").values("id")[:1]
+        try:
+            if snapshot_s:
+                snap_qs = snap_qs.filter(id=int(snapshot_s))
+                suffix = f"snapshot{snapshot_s}"
+            elif date_from or date_to:
+                if date_from:
+                    snap_qs = snap_qs.filter(date__gte=datetime.fromisoformat(date_from).date())
+                if date_to:
+                    snap_qs = snap_qs.filter(date__lte=datetime.fromisoformat(date_to).date())
+                suffix = f"{date_from or 'start'}_{date_to or 'end'}"
+            elif request.GET.get("all") == "1":
+                suffix = "all"
+            else:
+                snap_qs = HeatSnapshot.objects.filter(
+                    id=Subquery(snap_qs.order_by("-date", "-created_at").values("id")[:1])
+                )
+                suffix = "latest"
+        except ValueError:
+            return JsonResponse({"error": "snapshot must be an id, dates — YYYY-MM-DD"}, status=400)
 
-        tiles_qs = (
+        tiles = (
             HeatTile.objects
-            .filter(snapshot_id=Subquery(last_id_sq))
-            .values_list("ticker", "shortname", "last", "change_pct", "turnover", "volume")
-            .order_by("ticker")
+            .filter(snapshot_id__in=snap_qs.values("id"))
+            .order_by("snapshot__date", "snapshot_id", "ticker")
+            .values_list("snapshot__date", "snapshot__label", *EXPORT_HEADER[2:])
+            .iterator(chunk_size=EXPORT_CHUNK)
         )
 
-        # Формируем HTTP-ответ
-        filename = f"heatmap_{board}_{tiles_qs or 'latest'}.csv"
-        resp = HttpResponse(csv_text, content_type="text/csv; charset=utf-8")
-        resp["Content-Disposition"] = f'attachment; filename="{filename}"'
+        def rows():
+            writer = csv.writer(_Echo())
+            yield writer.writerow(EXPORT_HEADER)
+            for row in tiles:
+                yield writer.writerow(["" if v is None else v for v in row])
+
+        resp = StreamingHttpResponse(rows(), content_type="text/csv; charset=utf-8")
+        resp["Content-Disposition"] = f'attachment; filename="heatmap_{board}_{suffix}.csv"'
         return resp
-    
+
+
 def custom_permission_denied(request, exception=None):
     """
     Кастомный обработчик 403 Forbidden.
@@ -403,13 +524,16 @@ class StocksHeatmapView(LoginRequiredMixin, TemplateView):
         return ctx                                      # отдаём контекст
 
     def post(self, request: HttpRequest, *args: Any, **kwargs: Any):
-        # POST: тянем данные с ISS, собираем таблицу и формируем строку "Срез: ..."
+        # POST: берём доску котировок от поллера (без запроса к ISS) и формируем строку "Срез: ..."
         context = self.get_context_data(**kwargs)       # получаем базовый контекст
-        rows: List[dict] = fetch_tqbr_all()             # тянем все страницы по TQBR
-        now = timezone.localtime()                      # локализованное текущее время
+        quotes = current_board("TQBR")                  # общая доска котировок (mmap)
+        if quotes is None:
+            context["snapshot_text"] = "Котировки ещё не получены"
+            return self.render_to_response(context)
+        ts = timezone.localtime(quotes.ts)              # когда поллер записал доску
         # Формируем строку "Срез: TQBR на DD.MM.YYYY HH:MM"
-        context["snapshot_text"] = f"Срез: TQBR на {now.strftime('%d.%m.%Y %H:%M')}"  # человекочитаемая дата
-        context["rows"] = rows                          # кладём данные для таблицы
+        context["snapshot_text"] = f"Срез: TQBR на {ts.strftime('%d.%m.%Y %H:%M')}"  # человекочитаемая дата
+        context["rows"] = quotes.rows                   # кладём данные для таблицы
         return self.render_to_response(context)         # рендерим шаблон
     
 
@@ -424,7 +548,6 @@ class StocksListView(LoginRequiredMixin, TemplateView):
         return ctx
 
     def post(self, request: HttpRequest, *args: Any, **kwargs: Any):
-        from .services.iss_client import fetch_tqbr_all  # локальный импорт
         from .models import HeatSnapshot
 
         ctx = self.get_context_data()
@@ -473,28 +596,17 @@ class StocksListView(LoginRequiredMixin, TemplateView):
                 }
                 return self.render_to_response(ctx)
 
-            # ---------- fetch/save: тянем ISS и (при save) сохраняем снапшот ----------
-            raw: List[dict] = fetch_tqbr_all()
-            rows: List[Dict[str, Any]] = [{
-                "SECID": r.get("secid"),
-                "SHORTNAME": r.get("shortname"),
-                "BOARD": r.get("board"),
-                "LAST": r.get("last"),
-                "OPEN": r.get("open"),
-                "LOW": r.get("low"),
-                "HIGH": r.get("high"),
-                "VOLUME": r.get("volume"),
-                "VALTODAY": r.get("valtoday"),
-                "CHANGE_PCT": r.get("change_pct"),
-            } for r in raw]
-
-            rows.sort(key=lambda x: (x["CHANGE_PCT"] is None, -(x["CHANGE_PCT"] or 0)))
-            snapshot_ts = timezone.localtime()
+            # ---------- fetch/save: доска котировок от поллера и (при save) снапшот в очередь ----------
+            quotes = current_board("TQBR")
+            if quotes is None:
+                raise RuntimeError("Котировки TQBR ещё не получены (manage.py poll_quotes)")
+            rows = quotes.rows  # уже отсортированы по CHANGE_PCT, как раньше здесь
+            snapshot_ts = timezone.localtime(quotes.ts)
 
             if action == "save":
-                snap, _ = build_snapshot(board="TQBR", label="stocks", date=None, replace=True)
-                snapshot_ts = timezone.localtime(snap.created_at)
-                ctx["snapshot"] = {"board": "TQBR", "ts": snapshot_ts, "saved": True}
+                # сохранение — в фоне (run_jobs): страница не ждёт транзакцию сборки
+                job, _ = enqueue_heatmap_refresh("TQBR", "stocks", user=request.user)
+                ctx["snapshot"] = {"board": "TQBR", "ts": snapshot_ts, "saved": False, "job": job}
             else:
                 ctx["snapshot"] = {"board": "TQBR", "ts": snapshot_ts, "saved": False}
 
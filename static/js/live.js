@@ -0,0 +1,54 @@
+// MM/static/js/live.js
+// Живые обновления по SSE (/api/live/): контейнер с data-live-board / data-live-channel,
+// внутри — элементы с data-ticker и ячейки data-live="last" / data-live="pct".
+// Событие несёт только изменившиеся тикеры: {"d": [[тикер, last, change_pct], ...]}.
+// Элемент с data-job-url — задача пересборки (после «Обновить»): опрашиваем её статус,
+// по готовности перезагружаем страницу уже без ?job.
+document.addEventListener("DOMContentLoaded", () => {
+  const fmt = (x, suffix) => (x === null || x === undefined ? "—" + suffix : x.toFixed(2) + suffix);
+
+  document.querySelectorAll("[data-live-board][data-live-channel]").forEach((box) => {
+    if (!window.EventSource) return;
+    const channel = box.dataset.liveChannel;
+    const snapshot = box.dataset.liveSnapshot;
+    const items = new Map();
+    box.querySelectorAll("[data-ticker]").forEach((el) => items.set(el.dataset.ticker, el));
+    if (!items.size) return;
+
+    const url = "/api/live/?board=" + encodeURIComponent(box.dataset.liveBoard) + "&channels=" + channel;
+    const source = new EventSource(url);
+    source.addEventListener(channel, (e) => {
+      const msg = JSON.parse(e.data);
+      // теплокарта: дельты других снапшотов (другой label/дата) не наши
+      if (snapshot && String(msg.snapshot) !== snapshot) return;
+      for (const [ticker, last, pct] of msg.d) {
+        const el = items.get(ticker);
+        if (!el) continue;
+        const lastEl = el.querySelector('[data-live="last"]');
+        const pctEl = el.querySelector('[data-live="pct"]');
+        if (lastEl) lastEl.textContent = fmt(last, "");
+        if (pctEl) pctEl.textContent = fmt(pct, "%");
+      }
+    });
+  });
+
+  document.querySelectorAll("[data-job-url]").forEach((el) => {
+    const poll = () =>
+      fetch(el.dataset.jobUrl, { credentials: "same-origin" })
+        .then((r) => r.json())
+        .then((job) => {
+          if (job.status === "done") {
+            const url = new URL(window.location.href);
+            url.searchParams.delete("job");
+            window.location.replace(url);
+          } else if (job.status === "failed") {
+            el.textContent = "· обновление не удалось: " + (job.error || "ошибка");
+          } else {
+            el.textContent = "· обновление: " + (job.status === "queued" ? "в очереди" : (job.stage || "") + " " + job.progress + "%");
+            setTimeout(poll, 2000);
+          }
+        })
+        .catch(() => setTimeout(poll, 5000));
+    poll();
+  });
+});